@@ -0,0 +1,78 @@
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from core.constants import UserRole
+
+
+CACHE_KEY = 'accounts:access:{user_id}'
+CACHE_TIMEOUT = 60 * 60
+
+# Apps whose models a role can view (read-only) without explicit permissions
+ROLE_VIEW_APPS = {
+    UserRole.ANALYST: ['crm', 'sales', 'solar', 'alerts', 'tickets', 'monitoring', 'reports'],
+    UserRole.VIEWER: ['solar', 'alerts', 'tickets'],
+}
+
+# Apps an admin role fully manages
+ADMIN_APPS = ['crm', 'sales', 'solar', 'alerts', 'tickets', 'monitoring', 'reports', 'accounts']
+
+
+@dataclass(frozen=True)
+class Access:
+    """
+    Compiled authorization data of a single user
+    """
+    role: str
+    installer_id: int | None
+    permissions: frozenset
+
+    @property
+    def is_scoped(self):
+        return self.installer_id is not None
+
+
+def compile_access(user):
+    """
+    Build the access of a user from the profile role, user permissions and group permissions.
+    Runs a fixed number of queries regardless of the number of permissions.
+    """
+    from django.contrib.auth.models import Permission
+    from django.db.models import Q
+    from .models import Profile
+
+    profile = Profile.objects.filter(user=user).values('role', 'installer_id').first() or {}
+    role = UserRole.ADMIN if user.is_superuser else profile.get('role', UserRole.VIEWER)
+
+    if user.is_superuser:
+        perms = Permission.objects.all()
+    else:
+        role_q = Q(content_type__app_label__in=ADMIN_APPS) if role == UserRole.ADMIN else Q(
+            content_type__app_label__in=ROLE_VIEW_APPS.get(role, []),
+            codename__startswith='view_',
+        )
+        perms = Permission.objects.filter(role_q | Q(user=user) | Q(group__user=user))
+
+    permissions = frozenset(
+        f'{app_label}.{codename}'
+        for app_label, codename in perms.values_list('content_type__app_label', 'codename').distinct()
+    )
+    return Access(role=role, installer_id=profile.get('installer_id'), permissions=permissions)
+
+
+def get_access(user):
+    """
+    Return the cached access of a user.
+    Memoized on the user instance, so a request hits the cache once and the DB only on a miss.
+    """
+    if not hasattr(user, '_access_cache'):
+        key = CACHE_KEY.format(user_id=user.pk)
+        access = cache.get(key)
+        if access is None:
+            access = compile_access(user)
+            cache.set(key, access, CACHE_TIMEOUT)
+        user._access_cache = access
+    return user._access_cache
+
+
+def invalidate_access(*user_ids):
+    cache.delete_many([CACHE_KEY.format(user_id=user_id) for user_id in user_ids])
@@ -1,3 +1,26 @@
 from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
+from .models import Profile
 
-# Register your models here.
+
+class ProfileInline(admin.StackedInline):
+    model = Profile
+    can_delete = False
+    fields = ['role', 'installer']
+    raw_id_fields = ['installer']
+
+
+admin.site.unregister(get_user_model())
+
+
+@admin.register(get_user_model())
+class ProfileUserAdmin(UserAdmin):
+    inlines = [ProfileInline]
+    list_display = UserAdmin.list_display + ('role',)
+    list_select_related = ['profile']
+
+    @admin.display(description='תפקיד')
+    def role(self, obj):
+        profile = getattr(obj, 'profile', None)
+        return profile.get_role_display() if profile else '-'
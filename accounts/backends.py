@@ -0,0 +1,20 @@
+from django.contrib.auth.backends import ModelBackend
+from .access import get_access
+
+
+class RoleBackend(ModelBackend):
+    """
+    Authentication backend that answers permission checks from the cached access of the user
+    instead of querying user and group permissions on every request
+    """
+
+    def get_user_permissions(self, user_obj, obj=None):
+        return self.get_all_permissions(user_obj, obj)
+
+    def get_group_permissions(self, user_obj, obj=None):
+        return set()
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        return get_access(user_obj).permissions
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('crm', '0002_alter_contact_options_remove_contact_name_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('role', models.CharField(choices=[('admin', 'אדמין'), ('analyst', 'אנליסט'), ('viewer', 'צופה')], default='viewer', max_length=20, verbose_name='תפקיד')),
+                ('installer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='users', to='crm.installer', verbose_name='מתקין')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL, verbose_name='משתמש')),
+            ],
+            options={
+                'verbose_name': 'פרופיל משתמש',
+                'verbose_name_plural': 'פרופילי משתמשים',
+            },
+        ),
+    ]
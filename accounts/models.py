@@ -1,3 +1,40 @@
+from django.conf import settings
 from django.db import models
+from core.models import BaseModel
+from core.constants import UserRole
+from core.labels import choice_label
 
-# Create your models here.
+
+class Profile(BaseModel):
+    """
+    Role and data scope of a system user
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='profile',
+        verbose_name='משתמש'
+    )
+    role = models.CharField(
+        max_length=20,
+        choices=UserRole.choices,
+        default=UserRole.VIEWER,
+        verbose_name='תפקיד'
+    )
+
+    # Installer users only see the sites (and related records) of their company
+    installer = models.ForeignKey(
+        'crm.Installer',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='users',
+        verbose_name='מתקין'
+    )
+
+    class Meta:
+        verbose_name = 'פרופיל משתמש'
+        verbose_name_plural = 'פרופילי משתמשים'
+
+    def __str__(self):
+        return f'{self.user} | {choice_label(UserRole, self.role)}'
@@ -0,0 +1,54 @@
+from django.db.models import Q
+from .access import get_access
+
+
+# Lookup from each scoped model to the installer that owns its records
+INSTALLER_SCOPE = {
+    'solar.site': 'installer',
+    'alerts.alert': 'site__installer',
+    'tickets.ticket': 'installer',
+    'crm.installer': 'pk',
+    'crm.installerscorecard': 'installer',
+    'sales.lead': 'referred_by_installer',
+}
+
+# Models scoped through a customer of the installer's sites
+CUSTOMER_SCOPE = {
+    'crm.customer': 'pk',
+    'sales.contract': 'customer',
+    'sales.invoice': 'customer',
+}
+
+
+def scope_queryset(queryset, user):
+    """
+    Limit a queryset to the records the user is allowed to see.
+    Installer users only get records of their own company, models without a scope rule are hidden from them.
+    """
+    access = get_access(user)
+    if not access.is_scoped:
+        return queryset
+
+    label = queryset.model._meta.label_lower
+    # Customers are scoped through their sites, a subquery avoids duplicate rows of a join
+    from solar.models import Site
+    site_customers = Site.objects.filter(installer_id=access.installer_id).values('customer_id')
+    if label in CUSTOMER_SCOPE:
+        return queryset.filter(**{f'{CUSTOMER_SCOPE[label]}__in': site_customers})
+    if label == 'crm.contact':
+        # Contacts of the installer company and of its customers
+        return queryset.filter(Q(installer_id=access.installer_id) | Q(customer__in=site_customers))
+
+    lookup = INSTALLER_SCOPE.get(label)
+    if lookup is None:
+        return queryset.none()
+    return queryset.filter(Q(**{lookup: access.installer_id}))
+
+
+class ScopedAdminMixin:
+    """
+    ModelAdmin mixin that filters the changelist and object lookups by the user scope
+    """
+
+    def get_queryset(self, request):
+        return scope_queryset(super().get_queryset(request), request.user)
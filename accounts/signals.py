@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .access import invalidate_access
+from .models import Profile
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    invalidate_access(instance.user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, created, **kwargs):
+    # is_superuser and is_active affect the compiled permissions, a login (last_login only) does not.
+    # A new user is invalidated too, the shared cache may still hold an entry of a reused id.
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    invalidate_access(instance.pk)
+
+
+def user_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        # A permission or group was changed, invalidate all of its users
+        invalidate_access(*instance.user_set.values_list('pk', flat=True))
+    else:
+        invalidate_access(instance.pk)
+
+
+def group_permissions_changed(sender, instance, action, reverse, **kwargs):
+    if not action.startswith('post_'):
+        return
+    groups = instance.group_set.all() if reverse else [instance]
+    user_ids = get_user_model().objects.filter(groups__in=groups).values_list('pk', flat=True)
+    invalidate_access(*user_ids)
+
+
+def connect_signals():
+    user_model = get_user_model()
+    m2m_changed.connect(user_permissions_changed, sender=user_model.groups.through)
+    m2m_changed.connect(user_permissions_changed, sender=user_model.user_permissions.through)
+    m2m_changed.connect(group_permissions_changed, sender=Group.permissions.through)
@@ -1,3 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission, update_last_login
+from django.core.cache import cache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
 from django.test import TestCase
+from core.constants import UserRole
+from .access import CACHE_KEY, get_access
+from .models import Profile
 
-# Create your tests here.
+
+class AccessCacheTest(TestCase):
+    """ The cached access follows role and permission changes """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('viewer', password='password', is_staff=True)
+        self.profile = Profile.objects.create(user=self.user, role=UserRole.VIEWER)
+
+    def access(self):
+        # A fresh instance, like the next request
+        return get_access(get_user_model().objects.get(pk=self.user.pk))
+
+    def test_cache_is_shared_between_processes(self):
+        # A process-local cache would keep revoked permissions in the other web and worker processes
+        self.assertNotIsInstance(cache, (LocMemCache, DummyCache))
+
+    def test_role_change(self):
+        self.assertNotIn('crm.view_customer', self.access().permissions)
+        self.profile.role = UserRole.ANALYST
+        self.profile.save()
+        self.assertIn('crm.view_customer', self.access().permissions)
+
+    def test_group_permission_change(self):
+        group = Group.objects.create(name='מכירות')
+        self.user.groups.add(group)
+        self.assertNotIn('sales.change_lead', self.access().permissions)
+        group.permissions.add(Permission.objects.get(content_type__app_label='sales', codename='change_lead'))
+        self.assertIn('sales.change_lead', self.access().permissions)
+
+    def test_login_keeps_the_cached_access(self):
+        self.access()
+        update_last_login(None, self.user)
+        self.assertIsNotNone(cache.get(CACHE_KEY.format(user_id=self.user.pk)))
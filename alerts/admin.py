@@ -1,3 +1,12 @@
 from django.contrib import admin
+from accounts.scoping import ScopedAdminMixin
+from .models import Alert
 
-# Register your models here.
+
+@admin.register(Alert)
+class AlertAdmin(ScopedAdminMixin, admin.ModelAdmin):
+    list_display = ['title', 'site', 'customer', 'priority', 'status', 'created_at']
+    list_filter = ['priority', 'status', 'kind', 'is_active']
+    search_fields = ['title', 'site__site_number', 'customer__customer_number']
+    readonly_fields = ['created_at', 'updated_at', 'resolved_at']
+    raw_id_fields = ['site', 'customer']
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('crm', '0002_alter_contact_options_remove_contact_name_and_more'),
+        ('solar', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Alert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('title', models.CharField(max_length=200, verbose_name='כותרת')),
+                ('description', models.TextField(blank=True, verbose_name='תיאור')),
+                ('priority', models.CharField(choices=[('low', 'נמוכה'), ('medium', 'בינונית'), ('high', 'גבוהה'), ('critical', 'קריטי')], default='medium', max_length=20, verbose_name='עדיפות')),
+                ('status', models.CharField(choices=[('new', 'חדשה'), ('acknowledge', 'אושרה'), ('in_progress', 'בטיפול'), ('resolved', 'נפתרה'), ('closed', 'נסגרה')], default='new', max_length=20, verbose_name='סטטוס')),
+                ('resolved_at', models.DateTimeField(blank=True, null=True, verbose_name='נפתרה בתאריך')),
+                ('customer', models.ForeignKey(blank=True, on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='crm.customer', verbose_name='לקוח')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='solar.site', verbose_name='מערכת')),
+            ],
+            options={
+                'verbose_name': 'התראה',
+                'verbose_name_plural': 'התראות',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['site', 'status'], name='alert_site_status_idx'), models.Index(fields=['customer', 'status'], name='alert_customer_status_idx')],
+            },
+        ),
+    ]
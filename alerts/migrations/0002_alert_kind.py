@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='kind',
+            field=models.CharField(blank=True, max_length=50, verbose_name='סוג'),
+        ),
+    ]
@@ -1,3 +1,65 @@
 from django.db import models
+from core.models import ActiveModel, ActiveManager, ChangeFeedQuerySet
+from core.constants import AlertPriority, AlertStatus
+from core.labels import choice_label
 
-# Create your models here.
+
+OPEN_ALERT_STATUSES = [AlertStatus.NEW, AlertStatus.ACKNOWLEDGE, AlertStatus.IN_PROGRESS]
+
+
+class Alert(ActiveModel):
+    """
+    Alert raised on a site by monitoring rules or manually
+    """
+    site = models.ForeignKey(
+        'solar.Site',
+        on_delete=models.CASCADE,
+        related_name='alerts',
+        verbose_name='מערכת'
+    )
+    customer = models.ForeignKey(
+        'crm.Customer',
+        on_delete=models.CASCADE,
+        blank=True,
+        related_name='alerts',
+        verbose_name='לקוח'
+    )
+
+    # Machine readable type of the alert, used to avoid raising the same alert twice
+    kind = models.CharField(max_length=50, blank=True, verbose_name='סוג')
+    title = models.CharField(max_length=200, verbose_name='כותרת')
+    description = models.TextField(blank=True, verbose_name='תיאור')
+    priority = models.CharField(
+        max_length=20,
+        choices=AlertPriority.choices,
+        default=AlertPriority.MEDIUM,
+        verbose_name='עדיפות'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=AlertStatus.choices,
+        default=AlertStatus.NEW,
+        verbose_name='סטטוס'
+    )
+    resolved_at = models.DateTimeField(null=True, blank=True, verbose_name='נפתרה בתאריך')
+
+    objects = ChangeFeedQuerySet.as_manager()
+    active = ActiveManager.from_queryset(ChangeFeedQuerySet)()
+
+    class Meta:
+        verbose_name = 'התראה'
+        verbose_name_plural = 'התראות'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['site', 'status'], name='alert_site_status_idx'),
+            models.Index(fields=['customer', 'status'], name='alert_customer_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{choice_label(AlertPriority, self.priority)} | {self.title}'
+
+    def save(self, *args, **kwargs):
+        # Customer is denormalized from the site so customer views don't need a join
+        if not self.customer_id and self.site_id:
+            self.customer_id = self.site.customer_id
+        super().save(*args, **kwargs)
@@ -29,12 +29,14 @@ INSTALLED_APPS = [
 
     # My Apps
     'core',
+    'accounts',
     'alerts',
     'crm',
     'monitoring',
     'reports',
     'sales',
     'solar',
+    'tickets',
 ]
 
 MIDDLEWARE = [
@@ -67,6 +69,28 @@ TEMPLATES = [
 WSGI_APPLICATION = 'config.wsgi.application'
 
 
+# Authentication
+# Permission checks are answered from a per-user cache, see accounts.access
+
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.RoleBackend',
+]
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Shared by every web and worker process, so invalidating a user's access (accounts.access)
+# reaches all of them. The table is created with `python manage.py createcachetable`; redis or
+# memcached are shared as well and can replace it.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache',
+    }
+}
+
+
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
@@ -113,3 +137,22 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+
+
+# Uploaded files
+# Uploads above FILE_UPLOAD_MAX_MEMORY_SIZE are streamed to a temporary file instead of memory
+
+MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_URL = 'media/'
+
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024
+
+# Set to 'X-Sendfile' (Apache) or 'X-Accel-Redirect' (nginx) to let the web server send downloads
+SENDFILE_HEADER = None
+
+# Import time budget of booting config.settings_worker, enforced by `manage.py startup_profile` and
+# core.tests - the fastest of several runs takes about 200-240 ms, the margin absorbs slower machines
+STARTUP_IMPORT_BUDGET_MS = 400
+
+# Render the monthly reports as PDF, needs the optional weasyprint package (HTML otherwise)
+REPORTS_PDF = False
@@ -0,0 +1,28 @@
+"""
+Slim settings for cron and worker processes - management commands that don't serve requests.
+
+    DJANGO_SETTINGS_MODULE=config.settings_worker python manage.py detect_anomalies
+
+Drops the admin and the request-only contrib apps, so booting does not autodiscover and import
+every admin module. Run `python manage.py startup_profile` to measure the boot time.
+
+django.contrib.admin itself (about 8 ms, not the app admin modules) is still imported: the models
+use django_countries' CountryField, and django_countries.fields imports the admin's list filters.
+Replacing the field is not worth a schema change for it.
+"""
+from .settings import *  # noqa: F401,F403
+
+
+WEB_ONLY_APPS = [
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in WEB_ONLY_APPS]
+
+MIDDLEWARE = []
+
+# Workers never render admin pages, only the reports
+TEMPLATES = [{**TEMPLATES[0], 'OPTIONS': {'context_processors': []}}]
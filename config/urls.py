@@ -14,9 +14,18 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
-from django.urls import path
+from django.apps import apps
+from django.urls import include, path
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    path('core/', include('core.urls')),
+    path('sales/', include('sales.urls')),
+    path('monitoring/', include('monitoring.urls')),
+    path('tickets/', include('tickets.urls')),
 ]
+
+# Not installed in the worker settings (config.settings_worker)
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns.append(path('admin/', admin.site.urls))
@@ -1,3 +1,85 @@
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
+from .constants import BulkJobStatus
+from .bulk import admin_action
+from .models import BulkActionJob, ChangeEvent, ChangeFeedCursor, DataQualityFinding
+from .pagination import KeysetPaginationMixin
 
-# Register your models here.
+
+@admin.register(ChangeEvent)
+class ChangeEventAdmin(KeysetPaginationMixin, admin.ModelAdmin):
+    list_display = ['seq', 'entity', 'object_id', 'operation', 'created_at']
+    list_filter = ['entity', 'operation']
+    search_fields = ['=object_id']
+    keyset_ordering = ('-seq',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ChangeFeedCursor)
+class ChangeFeedCursorAdmin(admin.ModelAdmin):
+    list_display = ['name', 'position', 'updated_at']
+
+
+@admin.register(BulkActionJob)
+class BulkActionJobAdmin(admin.ModelAdmin):
+    list_display = ['description', 'status', 'progress', 'changed', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['status']
+    readonly_fields = [
+        'action', 'description', 'total', 'processed', 'changed', 'status', 'attempts', 'error',
+        'created_by', 'started_at', 'finished_at', 'created_at',
+    ]
+    exclude = ['ranges']
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_urls(self):
+        urls = [
+            path('<int:object_id>/progress/', self.admin_site.admin_view(self.progress_view), name='core_bulkactionjob_progress'),
+        ]
+        return urls + super().get_urls()
+
+    def progress_view(self, request, object_id):
+        """ Progress of a job, refreshed until it ends """
+        job = get_object_or_404(BulkActionJob, pk=object_id)
+        if not self.has_view_permission(request, job) and job.created_by_id != request.user.pk:
+            raise PermissionDenied
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.opts,
+            'title': job.description or job.action,
+            'job': job,
+            'running': job.status in (BulkJobStatus.PENDING, BulkJobStatus.RUNNING),
+        }
+        return TemplateResponse(request, 'admin/core/bulkactionjob/progress.html', context)
+
+    @admin.display(description='התקדמות')
+    def progress(self, obj):
+        return format_html(
+            '<a href="{}"><progress max="{}" value="{}"></progress> {}%</a>',
+            reverse('admin:core_bulkactionjob_progress', args=[obj.pk]), obj.total, obj.processed, obj.percent,
+        )
+
+
+@admin.register(DataQualityFinding)
+class DataQualityFindingAdmin(admin.ModelAdmin):
+    list_display = ['entity', 'object_id', 'field', 'rule', 'value', 'suggestion', 'fixed_at']
+    list_filter = ['entity', 'rule', ('fixed_at', admin.EmptyFieldListFilter)]
+    search_fields = ['=object_id', 'value']
+    readonly_fields = ['entity', 'object_id', 'field', 'rule', 'value', 'fixed_at', 'created_at']
+    actions = [admin_action('core.dataqualityfinding.apply_suggestions')]
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,262 @@
+"""
+Data quality audit of the crm and sales tables.
+
+Every table is read in primary key chunks into numpy columns, and each rule is a vectorized test
+over a whole column - Israeli ID check digits, phone and email format, record numbering, foreign
+keys that point to missing rows and the single relation rule of contacts. Only the failing rows
+are handled one by one, to write a DataQualityFinding with a suggested fix where one is safe.
+"""
+import re
+from collections import defaultdict
+
+import numpy as np
+from django.apps import apps
+from django.db import models, transaction
+from django.utils import timezone
+from .constants import DataQualityRule
+from .models import DataQualityFinding
+from .utils import normalize_email, normalize_phone
+from .validators import israeli_id_checksum
+
+
+CHUNK_SIZE = 50_000
+AUDITED_APPS = ['crm', 'sales']
+
+# Text fields checked per model, numbers are (field, prefix) of generate_unique_number
+FIELD_RULES = {
+    'crm.customer': {'israeli_id': ['id_number'], 'phone': ['phone', 'mobile'], 'email': ['email'], 'number': [('customer_number', 'CUS')]},
+    'crm.installer': {'phone': ['phone'], 'email': ['email']},
+    'crm.supplier': {'phone': ['phone'], 'email': ['email']},
+    'crm.contact': {'phone': ['phone'], 'email': ['email']},
+    'sales.lead': {'phone': ['phone'], 'email': ['email'], 'number': [('lead_number', 'LED')]},
+    'sales.contract': {'number': [('contract_number', 'CON')]},
+}
+
+CONTACT_RELATIONS = ['customer_id', 'installer_id', 'supplier_id']
+
+# (entity, field): (field derived from it on save, function)
+DERIVED_FIELDS = {
+    ('crm.customer', 'phone'): ('normalized_phone', normalize_phone),
+    ('crm.customer', 'mobile'): ('normalized_mobile', normalize_phone),
+    ('crm.customer', 'email'): ('normalized_email', normalize_email),
+}
+
+ID_WEIGHTS = np.array([1, 2, 1, 2, 1, 2, 1, 2, 1])
+PHONE_RE = re.compile(r'^05\d{8}$')
+
+
+# Vectorized rules - a numpy str array in, a bool array (valid) out
+
+def israeli_id_valid(values):
+    valid = np.strings.isdigit(values) & (np.strings.str_len(values) == 9)
+    ids = values[valid].astype('U9')
+    if len(ids):
+        # A U9 element is 9 UTF-32 code points
+        digits = ids.view(np.uint32).reshape(-1, 9) - ord('0')
+        products = digits * ID_WEIGHTS
+        valid[valid] = (products // 10 + products % 10).sum(axis=1) % 10 == 0
+    return valid
+
+
+def phone_valid(values):
+    return (np.strings.str_len(values) == 10) & np.strings.isdigit(values) & np.strings.startswith(values, '05')
+
+
+def email_valid(values):
+    local, _, domain = np.strings.partition(values, '@')
+    return (
+        (np.strings.count(values, '@') == 1)
+        & (np.strings.str_len(local) > 0)
+        & (np.strings.find(domain, '.') > 0)
+        & ~np.strings.endswith(domain, '.')
+        & (np.strings.count(values, ' ') == 0)
+        & (np.strings.strip(values) == values)
+    )
+
+
+def number_valid(values, prefix):
+    return np.strings.startswith(values, f'{prefix}-') & np.strings.isdigit(np.strings.slice(values, len(prefix) + 1, None))
+
+
+# Suggested fixes of single values, '' when there is no safe one
+
+def suggest_israeli_id(value):
+    digits = ''.join(c for c in value if c.isdigit())
+    # IDs are often written without their leading zeros
+    if 0 < len(digits) < 9 and israeli_id_checksum(digits.zfill(9)):
+        return digits.zfill(9)
+    return ''
+
+
+def suggest_phone(value):
+    phone = normalize_phone(value)
+    return phone if PHONE_RE.match(phone) and phone != value else ''
+
+
+def suggest_email(value):
+    email = normalize_email(''.join(value.split()))
+    return email if email != value and email_valid(np.array([email]))[0] else ''
+
+
+def suggest_number(value, prefix):
+    # Prefixes written twice, e.g. CUS-CUS-000012
+    number = re.sub(rf'^(?:{prefix}-)+', f'{prefix}-', value)
+    return number if number != value and number_valid(np.array([number]), prefix)[0] else ''
+
+
+TEXT_RULES = {
+    'israeli_id': (DataQualityRule.ISRAELI_ID, israeli_id_valid, suggest_israeli_id),
+    'phone': (DataQualityRule.PHONE, phone_valid, suggest_phone),
+    'email': (DataQualityRule.EMAIL, email_valid, suggest_email),
+}
+
+
+def audited_models():
+    return [model for app_label in AUDITED_APPS for model in apps.get_app_config(app_label).get_models()]
+
+
+def foreign_keys(model):
+    return [field for field in model._meta.concrete_fields if isinstance(field, models.ForeignKey)]
+
+
+class Audit:
+    """ One audit run, target primary keys are loaded once and shared by all tables """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, log=print):
+        self.chunk_size = chunk_size
+        self.log = log
+        self.target_pks = {}
+        self.counts = defaultdict(int)
+        # Numbers suggested so far, by (entity, field) - two broken rows never get the same one
+        self.suggested = defaultdict(set)
+
+    def pks_of(self, model):
+        if model not in self.target_pks:
+            pks = model._base_manager.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=100_000)
+            self.target_pks[model] = np.fromiter(pks, dtype=np.int64)
+        return self.target_pks[model]
+
+    def chunks(self, model, fields):
+        """ Rows of (pk, *fields) in primary key order, chunk_size at a time """
+        queryset = model._base_manager.order_by('pk').values_list('pk', *fields)
+        last = None
+        while True:
+            rows = list((queryset.filter(pk__gt=last) if last is not None else queryset)[:self.chunk_size])
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield rows
+
+    def audit_model(self, model):
+        entity = model._meta.label_lower
+        rules = FIELD_RULES.get(entity, {})
+        text_fields = [field for kind in ('israeli_id', 'phone', 'email') for field in rules.get(kind, [])]
+        number_fields = rules.get('number', [])
+        fks = foreign_keys(model)
+        fields = list(dict.fromkeys(
+            text_fields + [field for field, _ in number_fields] + [fk.attname for fk in fks]
+        ))
+        if not fields:
+            return 0
+
+        scanned = 0
+        for rows in self.chunks(model, fields):
+            columns = dict(zip(['pk'] + fields, zip(*rows)))
+            pks = np.array(columns['pk'], dtype=np.int64)
+            findings = []
+
+            for kind in ('israeli_id', 'phone', 'email'):
+                rule, is_valid, suggest = TEXT_RULES[kind]
+                for field in rules.get(kind, []):
+                    values = np.array(columns[field], dtype=str)
+                    failed = (values != '') & ~is_valid(values)
+                    findings += [
+                        self.finding(entity, pks[i], field, rule, values[i], suggest(str(values[i])))
+                        for i in np.flatnonzero(failed)
+                    ]
+
+            for field, prefix in number_fields:
+                values = np.array(columns[field], dtype=str)
+                failed = np.flatnonzero(~number_valid(values, prefix))
+                suggestions = {i: suggest_number(str(values[i]), prefix) for i in failed}
+                taken = set(model._base_manager.filter(**{f'{field}__in': [s for s in suggestions.values() if s]}).values_list(field, flat=True))
+                suggested = self.suggested[(entity, field)]
+                for i, suggestion in suggestions.items():
+                    if suggestion in taken or suggestion in suggested:
+                        suggestion = ''
+                    elif suggestion:
+                        suggested.add(suggestion)
+                    findings.append(self.finding(entity, pks[i], field, DataQualityRule.NUMBER, values[i], suggestion))
+
+            for fk in fks:
+                # NULL is NaN
+                values = np.array(columns[fk.attname], dtype=np.float64)
+                set_ = ~np.isnan(values)
+                targets = self.pks_of(fk.related_model)
+                ids = values[set_].astype(np.int64)
+                found = np.zeros(len(ids), dtype=bool)
+                if len(targets):
+                    found = targets[np.minimum(np.searchsorted(targets, ids), len(targets) - 1)] == ids
+                missing = np.flatnonzero(set_)[~found]
+                findings += [
+                    self.finding(entity, pks[i], fk.name, DataQualityRule.ORPHAN, str(int(values[i])), '')
+                    for i in missing
+                ]
+
+            if entity == 'crm.contact':
+                related = np.stack([np.array(columns[name], dtype=np.float64) for name in CONTACT_RELATIONS])
+                failed = (~np.isnan(related)).sum(axis=0) != 1
+                findings += [
+                    self.finding(entity, pks[i], 'customer', DataQualityRule.CONTACT_RELATION, '', '')
+                    for i in np.flatnonzero(failed)
+                ]
+
+            DataQualityFinding.objects.bulk_create(findings, batch_size=1000)
+            for finding in findings:
+                self.counts[(entity, finding.rule)] += 1
+            scanned += len(rows)
+        return scanned
+
+    def finding(self, entity, object_id, field, rule, value, suggestion):
+        return DataQualityFinding(
+            entity=entity, object_id=int(object_id), field=field, rule=rule, value=str(value)[:255], suggestion=suggestion
+        )
+
+    def run(self, models=None):
+        """ Audit the models (all crm and sales models by default), returns the number of rows scanned """
+        models = models or audited_models()
+        # Findings of a previous run are replaced, fixed ones are kept as history
+        DataQualityFinding.objects.filter(
+            entity__in=[model._meta.label_lower for model in models], fixed_at__isnull=True
+        ).delete()
+        scanned = 0
+        for model in models:
+            rows = self.audit_model(model)
+            scanned += rows
+            self.log(f'{model._meta.label}: {rows} rows')
+        return scanned
+
+
+def apply_suggestions(findings):
+    """ Write the suggested values of findings to their records, returns the number of fixed records """
+    groups = defaultdict(dict)
+    pending = findings.filter(fixed_at__isnull=True).exclude(suggestion='')
+    for pk, entity, object_id, field, suggestion in pending.values_list('pk', 'entity', 'object_id', 'field', 'suggestion'):
+        groups[(entity, field)][object_id] = (pk, suggestion)
+
+    fixed = []
+    with transaction.atomic():
+        for (entity, field), rows in groups.items():
+            model = apps.get_model(entity)
+            # Keys derived on save (crm.Customer dedup keys) are derived here as well
+            derived = DERIVED_FIELDS.get((entity, field))
+            fields = [field] + ([derived[0]] if derived else [])
+            objs = list(model._base_manager.filter(pk__in=list(rows)).only('pk', *fields))
+            for obj in objs:
+                setattr(obj, field, rows[obj.pk][1])
+                if derived:
+                    setattr(obj, derived[0], derived[1](rows[obj.pk][1]))
+            model._default_manager.bulk_update(objs, fields)
+            fixed += [rows[obj.pk][0] for obj in objs]
+        DataQualityFinding.objects.filter(pk__in=fixed).update(fixed_at=timezone.now())
+    return len(fixed)
@@ -0,0 +1,208 @@
+"""
+Bulk admin actions in PK-range chunks.
+
+A single UPDATE over a large selection holds the write lock (all of SQLite) for the whole statement
+and times the admin request out. A bulk action processes the selection in chunks of consecutive
+primary keys, each in a short transaction of its own, and applies the side effects a save would
+have (numbering, change events, scorecards, cache invalidation) once per chunk.
+Small selections run in the request, large ones are queued as a BulkActionJob for the
+run_bulk_actions worker and followed on a progress page.
+
+A job's progress is written in the transaction of each chunk, and doubles as the heartbeat of its
+worker (updated_at). A running job without a heartbeat for STALE_AFTER - its worker died - is
+queued again and resumes after the chunks it finished, up to MAX_ATTEMPTS runs before it fails.
+
+Actions are registered in the bulk module of an app, so the worker finds them without the admin:
+    @bulk.register('sales.Lead', 'סמן כ"אבוד"')
+    def mark_as_lost(queryset):
+        return queryset.update(status=LeadStatus.LOST)
+
+    class LeadAdmin(admin.ModelAdmin):
+        actions = [bulk.admin_action('sales.lead.mark_as_lost')]
+"""
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+from .constants import BulkJobStatus
+from .models import BulkActionJob
+
+
+CHUNK_SIZE = 500
+
+# Selections larger than this run in the background
+BACKGROUND_THRESHOLD = 2000
+
+STALE_AFTER = timedelta(seconds=getattr(settings, 'BULK_JOB_STALE_SECONDS', 600))
+MAX_ATTEMPTS = 3
+
+ACTIONS = {}
+
+
+class JobLost(Exception):
+    """ The job was queued again for another worker, this one stops """
+
+
+class BulkAction:
+
+    def __init__(self, name, model, func, description, chunk_size):
+        self.name = name
+        self.model = model
+        self.func = func
+        self.description = description
+        self.chunk_size = chunk_size
+
+    def get_model(self):
+        return apps.get_model(self.model)
+
+
+def register(model, description, chunk_size=CHUNK_SIZE):
+    """
+    Register func(queryset) -> number of rows changed as a bulk action of model ('app.Model').
+    func gets the queryset of one chunk and runs in its transaction.
+    """
+    def decorator(func):
+        name = f'{model.lower()}.{func.__name__}'
+        ACTIONS[name] = BulkAction(name, model, func, description, chunk_size)
+        return func
+    return decorator
+
+
+def autodiscover():
+    autodiscover_modules('bulk')
+
+
+def compress(pks):
+    """ Sorted primary keys as [[first, last], ...] runs of consecutive keys """
+    ranges = []
+    for pk in pks:
+        if ranges and pk == ranges[-1][1] + 1:
+            ranges[-1][1] = pk
+        else:
+            ranges.append([pk, pk])
+    return ranges
+
+
+def chunk_filters(ranges, chunk_size):
+    """ Filters of chunks of up to chunk_size keys, a single pk range where the keys are consecutive """
+    chunk = []
+    for first, last in ranges:
+        while first <= last:
+            if not chunk and last - first + 1 >= chunk_size:
+                yield {'pk__range': (first, first + chunk_size - 1)}, chunk_size
+                first += chunk_size
+                continue
+            take = min(last - first + 1, chunk_size - len(chunk))
+            chunk.extend(range(first, first + take))
+            first += take
+            if len(chunk) == chunk_size:
+                yield {'pk__in': chunk}, len(chunk)
+                chunk = []
+    if chunk:
+        yield {'pk__in': chunk}, len(chunk)
+
+
+def run(name, ranges, job=None):
+    """
+    Run a bulk action over the keys of ranges chunk by chunk, with the progress kept on job.
+    The chunks job already processed are skipped.
+    returns the number of rows changed
+    """
+    action = ACTIONS[name]
+    model = action.get_model()
+    total = 0
+    done = job.processed if job is not None else 0
+    for filters, size in chunk_filters(ranges, action.chunk_size):
+        if done >= size:
+            done -= size
+            continue
+        with transaction.atomic():
+            changed = action.func(model._default_manager.filter(**filters)) or 0
+            if job is not None and not running(job).update(
+                processed=F('processed') + size, changed=F('changed') + changed, updated_at=timezone.now()
+            ):
+                # Rolls the chunk back, the worker that took the job over runs it
+                raise JobLost(job.pk)
+        total += changed
+    return total
+
+
+def running(job):
+    """ The job while this run of it holds it """
+    return BulkActionJob.objects.filter(pk=job.pk, status=BulkJobStatus.RUNNING, attempts=job.attempts)
+
+
+def run_job(job):
+    """ Run a claimed job to the end """
+    try:
+        run(job.action, job.ranges, job)
+    except JobLost:
+        raise
+    except Exception as e:
+        running(job).update(status=BulkJobStatus.FAILED, error=repr(e), finished_at=timezone.now(), updated_at=timezone.now())
+        raise
+    running(job).update(status=BulkJobStatus.DONE, finished_at=timezone.now(), updated_at=timezone.now())
+
+
+def requeue_stale():
+    """
+    Queue again the running jobs without a heartbeat for STALE_AFTER, failing those that were
+    claimed MAX_ATTEMPTS times. returns the number of jobs queued again
+    """
+    now = timezone.now()
+    stale = BulkActionJob.objects.filter(status=BulkJobStatus.RUNNING, updated_at__lt=now - STALE_AFTER)
+    stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=BulkJobStatus.FAILED, error=f'העבודה נעצרה ללא סיום {MAX_ATTEMPTS} פעמים', finished_at=now, updated_at=now
+    )
+    return stale.update(status=BulkJobStatus.PENDING, updated_at=now)
+
+
+def claim_next():
+    """ The oldest pending job, marked as running - None when there is none """
+    requeue_stale()
+    for job in BulkActionJob.objects.filter(status=BulkJobStatus.PENDING).order_by('pk')[:10]:
+        # Claimed by whoever flips the status first
+        now = timezone.now()
+        if BulkActionJob.objects.filter(pk=job.pk, status=BulkJobStatus.PENDING).update(
+            status=BulkJobStatus.RUNNING, attempts=F('attempts') + 1, started_at=now, updated_at=now
+        ):
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def admin_action(name, permissions=('change',)):
+    """ ModelAdmin action of a registered bulk action """
+    # The worker settings run without the admin
+    from django.contrib import admin, messages
+    from django.http import HttpResponseRedirect
+    from django.urls import reverse
+
+    action = ACTIONS[name]
+
+    def bulk_admin_action(modeladmin, request, queryset):
+        ranges = compress(queryset.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=10_000))
+        total = sum(last - first + 1 for first, last in ranges)
+        if total <= BACKGROUND_THRESHOLD:
+            changed = run(name, ranges)
+            modeladmin.message_user(request, f'{action.description}: {changed} רשומות עודכנו')
+            return None
+
+        job = BulkActionJob.objects.create(
+            action=name, description=action.description, ranges=ranges, total=total, created_by=request.user
+        )
+        modeladmin.message_user(request, f'{action.description}: {total} רשומות יעודכנו ברקע', messages.INFO)
+        return HttpResponseRedirect(reverse('admin:core_bulkactionjob_progress', args=[job.pk]))
+
+    bulk_admin_action.__name__ = name.replace('.', '_')
+    return admin.action(description=action.description, permissions=list(permissions))(bulk_admin_action)
+
+
+@register('core.DataQualityFinding', 'החל תיקונים מוצעים')
+def apply_suggestions(queryset):
+    from .audit import apply_suggestions
+    return apply_suggestions(queryset)
@@ -0,0 +1,212 @@
+"""
+Change data capture feed of the CRM, sales and field service records.
+
+Every change to a tracked model is written to ChangeEvent in the transaction of the change - saves
+and deletes through signals (core.signals), update(), bulk_create() and bulk_update() through
+ChangeFeedQuerySet. An event carries the record after the change, so a consumer never has to read
+the source tables and the feed can be compacted to the latest event of every record.
+
+Consumers read in seq order from a cursor:
+    consumer = Consumer('warehouse')
+    for events in consumer.batches():
+        ...  # the position is saved when the next batch is requested
+"""
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Min, OuterRef
+from django.utils import timezone
+from .constants import ChangeOperation
+from .models import ChangeEvent, ChangeFeedCursor
+
+
+TRACKED_MODELS = ['crm.Customer', 'crm.Contact', 'sales.Lead', 'sales.Contract', 'tickets.Ticket', 'alerts.Alert']
+
+BATCH_SIZE = 1000
+
+# A seq is taken on insert but is visible only after commit, so a gap in the sequence may be a
+# transaction still in flight. Readers wait for it this long - longer than any transaction that
+# writes tracked records - before they treat it as rolled back.
+GAP_TIMEOUT = timedelta(seconds=getattr(settings, 'CHANGEFEED_GAP_TIMEOUT', 60))
+
+_local = threading.local()
+
+
+def entity_of(model):
+    return model._meta.label_lower
+
+
+def snapshot(instance):
+    """ The loaded fields of an instance as stored in the database """
+    return {
+        field.attname: field.get_prep_value(field.value_from_object(instance))
+        for field in instance._meta.concrete_fields
+        if field.attname in instance.__dict__
+    }
+
+
+def _write(events, using):
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is not None:
+        buffer.extend(events)
+    elif events:
+        ChangeEvent.objects.using(using).bulk_create(events, batch_size=BATCH_SIZE)
+
+
+@contextmanager
+def batch(using='default'):
+    """
+    Buffer the events of a block and insert them at its end in one bulk insert, in a transaction
+    with the changes. For imports that save records one by one.
+    Events of a savepoint rolled back inside the block are not dropped, let errors propagate.
+    """
+    if getattr(_local, 'buffer', None) is not None:
+        yield
+        return
+    _local.buffer = []
+    try:
+        with transaction.atomic(using=using):
+            yield
+            events, _local.buffer = _local.buffer, None
+            # Stamped at the end of the transaction, the gap timeout starts from here
+            now = timezone.now()
+            for event in events:
+                event.created_at = now
+            ChangeEvent.objects.using(using).bulk_create(events, batch_size=BATCH_SIZE)
+    finally:
+        _local.buffer = None
+
+
+def record_instances(instances, operation, fields=(), using='default'):
+    """ Events of saved instances """
+    _write([
+        ChangeEvent(
+            entity=entity_of(type(instance)),
+            object_id=instance.pk,
+            operation=operation,
+            fields=sorted(fields),
+            data=None if operation == ChangeOperation.DELETE else snapshot(instance),
+        )
+        # Backends that don't return the ids of bulk inserts leave pk empty
+        for instance in instances if instance.pk is not None
+    ], using)
+
+
+def record_rows(model, pks, operation, fields=(), using='default'):
+    """ Events of rows changed in SQL, their data is read back in chunks """
+    attnames = [field.attname for field in model._meta.concrete_fields]
+    pk_name = model._meta.pk.attname
+    entity = entity_of(model)
+    for start in range(0, len(pks), BATCH_SIZE):
+        rows = model._base_manager.using(using).filter(pk__in=pks[start:start + BATCH_SIZE]).order_by('pk')
+        _write([
+            ChangeEvent(entity=entity, object_id=row[pk_name], operation=operation, fields=sorted(fields), data=row)
+            for row in rows.values(*attnames)
+        ], using)
+
+
+def settled_position(after=0):
+    """ The newest seq after `after` older than the gap timeout, no transaction in flight below it """
+    settled = timezone.now() - GAP_TIMEOUT
+    seq = ChangeEvent.objects.filter(seq__gt=after, created_at__lte=settled).order_by('-seq').values_list('seq', flat=True).first()
+    return after if seq is None else seq
+
+
+def readable_position(after=0):
+    """
+    The newest seq that can be read up to - the last one before a gap a transaction in flight
+    may still fill. Gaps below the settled position are rolled back transactions, above it the
+    position runs on to the end of the first run of consecutive seqs, found in SQL.
+    """
+    position = settled_position(after)
+    recent = ChangeEvent.objects.filter(seq__gt=position)
+    if not recent.filter(seq=position + 1).exists():
+        return position
+    last = recent.exclude(Exists(ChangeEvent.objects.filter(seq=OuterRef('seq') + 1))).order_by('seq')
+    return last.values_list('seq', flat=True).first()
+
+
+def read(after=0, limit=BATCH_SIZE, entities=None):
+    """
+    Up to limit events of entities after seq `after`, in seq order, filtered in SQL.
+    returns (events, position) - position is the seq to continue after. It passes the events of
+    other entities, and stops before a recent gap.
+    """
+    # An empty batch would pass every event up to the ceiling
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    ceiling = readable_position(after)
+    events = ChangeEvent.objects.filter(seq__gt=after, seq__lte=ceiling)
+    if entities:
+        events = events.filter(entity__in=entities)
+    events = list(events.order_by('seq')[:limit])
+    position = events[-1].seq if events and len(events) == limit else ceiling
+    return events, position
+
+
+class Consumer:
+    """ Reads the feed from a saved position """
+
+    def __init__(self, name, entities=None):
+        self.name = name
+        self.entities = entities
+        self.cursor, _ = ChangeFeedCursor.objects.get_or_create(name=name)
+
+    @property
+    def position(self):
+        return self.cursor.position
+
+    def read(self, limit=BATCH_SIZE):
+        return read(self.cursor.position, limit, self.entities)
+
+    def commit(self, position):
+        self.cursor.position = position
+        self.cursor.save(update_fields=['position', 'updated_at'])
+
+    def batches(self, limit=BATCH_SIZE):
+        """
+        Batches of events until the feed is drained. The position of a batch is saved when the
+        next one is requested, so a failure processing a batch reads it again.
+        """
+        while True:
+            events, position = self.read(limit)
+            if position == self.cursor.position:
+                return
+            if events:
+                yield events
+            self.commit(position)
+
+
+def compact(before, tombstones_before=None, chunk_size=50_000, log=print):
+    """
+    Delete events of records that have a later event, created before `before` - consumers that
+    start from the beginning still get the latest state of every record.
+    Deletes older than tombstones_before are dropped as well, but never before every consumer
+    has read them.
+    returns the number of deleted events
+    """
+    horizon = ChangeEvent.objects.filter(created_at__lt=before).order_by('-seq').values_list('seq', flat=True).first()
+    if horizon is None:
+        return 0
+
+    superseded = ChangeEvent.objects.filter(
+        Exists(ChangeEvent.objects.filter(entity=OuterRef('entity'), object_id=OuterRef('object_id'), seq__gt=OuterRef('seq')))
+    )
+    deleted = 0
+    first = ChangeEvent.objects.aggregate(first=Min('seq'))['first']
+    for start in range(first, horizon + 1, chunk_size):
+        deleted += superseded.filter(seq__gte=start, seq__lt=start + chunk_size, seq__lte=horizon).delete()[0]
+        log(f'{deleted} events compacted up to {min(start + chunk_size, horizon + 1) - 1}')
+
+    if tombstones_before:
+        # Earlier events of a record go before its delete, they are only compacted up to before
+        tombstones_before = min(tombstones_before, before)
+        read_by_all = ChangeFeedCursor.objects.aggregate(position=Min('position'))['position']
+        tombstones = ChangeEvent.objects.filter(operation=ChangeOperation.DELETE, created_at__lt=tombstones_before)
+        if read_by_all is not None:
+            tombstones = tombstones.filter(seq__lte=read_by_all)
+        deleted += tombstones.delete()[0]
+    return deleted
@@ -7,6 +7,7 @@ class CustomerType(models.TextChoices):
 
 class LeadStatus(models.TextChoices):
     NEW = 'new', 'חדש'
+    CONTACTED = 'contacted', 'נוצר קשר'
     QUOTE = 'quote', 'הצעת מחיר'
     WON = 'won', 'הומר'
     LOST = 'lost', 'אבוד'
@@ -73,3 +74,25 @@ class SupplierType(models.TextChoices):
     EQUIPMENT = 'equipment', 'ציוד'
     SERVICE = 'service', 'שירות'
     OTHER = 'other', 'אחר'
+
+
+class ChangeOperation(models.TextChoices):
+    CREATE = 'create', 'יצירה'
+    UPDATE = 'update', 'עדכון'
+    DELETE = 'delete', 'מחיקה'
+
+
+class BulkJobStatus(models.TextChoices):
+    PENDING = 'pending', 'ממתין'
+    RUNNING = 'running', 'רץ'
+    DONE = 'done', 'הסתיים'
+    FAILED = 'failed', 'נכשל'
+
+
+class DataQualityRule(models.TextChoices):
+    ISRAELI_ID = 'israeli_id', 'תעודת זהות לא תקינה'
+    PHONE = 'phone', 'טלפון לא תקין'
+    EMAIL = 'email', 'אימייל לא תקין'
+    NUMBER = 'number', 'מספור לא תקין'
+    ORPHAN = 'orphan', 'הפניה לרשומה שלא קיימת'
+    CONTACT_RELATION = 'contact_relation', 'איש קשר ללא שיוך יחיד'
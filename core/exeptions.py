@@ -10,6 +10,26 @@ class APIAdapterException(SolarMonitoringException):
     pass
 
 
+class APITimeoutException(APIAdapterException):
+    """ Manufacturer API did not answer in time """
+    pass
+
+
+class APIAuthenticationException(APIAdapterException):
+    """ Manufacturer API rejected the credentials """
+    pass
+
+
+class APIRateLimitException(APIAdapterException):
+    """ Manufacturer API request quota exceeded """
+    pass
+
+
+class APIResponseException(APIAdapterException):
+    """ Malformed manufacturer API response """
+    pass
+
+
 class SyncException(SolarMonitoringException):
     """ Sync Process Error """
     pass
@@ -17,4 +37,8 @@ class SyncException(SolarMonitoringException):
 
 class AlertProcessingException(SolarMonitoringException):
     """ Alert Proccess Error """
-    pass
\ No newline at end of file
+    pass
+
+class InvalidCursorException(SolarMonitoringException):
+    """ Malformed pagination cursor """
+    pass
@@ -0,0 +1,96 @@
+import csv
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from .utils import normalize_name
+
+
+DEFAULT_GAZETTEER = Path(__file__).resolve().parent / 'data' / 'il_gazetteer.csv'
+
+
+@dataclass(frozen=True)
+class GeocodeResult:
+    latitude: float
+    longitude: float
+    source: str
+
+
+def normalize_address(street='', city='', postal_code='', country='IL'):
+    """
+    Cache key of an address - same address written differently gives the same key.
+    Only the city and postal code are used, the offline gazetteer resolves to city level.
+    """
+    postal_code = ''.join(c for c in postal_code or '' if c.isdigit())
+    return '|'.join([str(country or '').upper(), normalize_name(city), postal_code])
+
+
+class Gazetteer:
+    """
+    Offline city / postal code lookup from a CSV file
+    (name, alt_names separated by |, latitude, longitude, postal_prefixes separated by |)
+    """
+
+    def __init__(self, path):
+        self.cities = {}
+        self.postal_prefixes = {}
+        with open(path, encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                point = (float(row['latitude']), float(row['longitude']))
+                for name in [row['name'], *row['alt_names'].split('|')]:
+                    if name:
+                        self.cities[normalize_name(name)] = point
+                for prefix in (row.get('postal_prefixes') or '').split('|'):
+                    if prefix:
+                        self.postal_prefixes[prefix] = point
+
+    def lookup(self, city='', postal_code=''):
+        point = self.cities.get(normalize_name(city))
+        if point:
+            return GeocodeResult(*point, source='city')
+
+        # Longest matching postal code prefix
+        for length in range(min(len(postal_code), 5), 0, -1):
+            point = self.postal_prefixes.get(postal_code[:length])
+            if point:
+                return GeocodeResult(*point, source='postal')
+        return None
+
+
+@lru_cache(maxsize=1)
+def get_gazetteer():
+    return Gazetteer(getattr(settings, 'GEOCODING_GAZETTEER', DEFAULT_GAZETTEER))
+
+
+@lru_cache(maxsize=10_000)
+def _cached_lookup(address_key):
+    from .models import GeocodeCache
+
+    cached = GeocodeCache.objects.filter(address_key=address_key).first()
+    if cached is None:
+        country, city, postal_code = address_key.split('|')
+        result = get_gazetteer().lookup(city, postal_code) if country == 'IL' else None
+        cached, _ = GeocodeCache.objects.get_or_create(
+            address_key=address_key,
+            defaults={
+                'latitude': result.latitude if result else None,
+                'longitude': result.longitude if result else None,
+                'source': result.source if result else '',
+            },
+        )
+    if cached.latitude is None:
+        return None
+    return GeocodeResult(cached.latitude, cached.longitude, cached.source)
+
+
+def geocode(street='', city='', postal_code='', country='IL'):
+    """
+    Return the coordinates of an address or None.
+    Looked up in process memory, then in GeocodeCache, then in the offline gazetteer - no network calls.
+    """
+    address_key = normalize_address(street, city, postal_code, country)
+    _, city_key, postal_key = address_key.split('|')
+    if not city_key and not postal_key:
+        return None
+    return _cached_lookup(address_key)
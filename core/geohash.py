@@ -0,0 +1,102 @@
+import math
+
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+EARTH_RADIUS_KM = 6371.0
+
+
+def encode(latitude: float, longitude: float, precision: int = 9) -> str:
+    '''
+    encode a coordinate as a geohash - nearby points share a prefix
+    example: 32.0853, 34.7818 -> sv8wx2zq6
+    '''
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        value, value_range = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def decode(geohash: str):
+    ''' return the (latitude, longitude) center of a geohash cell '''
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        bits = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            value_range = lon_range if even else lat_range
+            middle = (value_range[0] + value_range[1]) / 2
+            if bits >> shift & 1:
+                value_range[0] = middle
+            else:
+                value_range[1] = middle
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+def cell_size(precision: int):
+    ''' return the (latitude, longitude) size in degrees of a geohash cell '''
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float):
+    ''' return (min_lat, min_lon, max_lat, max_lon) around a point '''
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    lon_delta = math.degrees(radius_km / (EARTH_RADIUS_KM * max(math.cos(math.radians(latitude)), 1e-6)))
+    return latitude - lat_delta, longitude - lon_delta, latitude + lat_delta, longitude + lon_delta
+
+
+def covering_prefixes(latitude: float, longitude: float, radius_km: float, max_cells: int = 16) -> list:
+    '''
+    geohash prefixes whose cells cover the circle around a point.
+    uses the longest prefix that needs at most max_cells cells
+    '''
+    min_lat, min_lon, max_lat, max_lon = bounding_box(latitude, longitude, radius_km)
+
+    for precision in range(8, 0, -1):
+        lat_step, lon_step = cell_size(precision)
+        rows = math.floor(max_lat / lat_step) - math.floor(min_lat / lat_step) + 1
+        columns = math.floor(max_lon / lon_step) - math.floor(min_lon / lon_step) + 1
+        if rows * columns > max_cells:
+            continue
+
+        prefixes = set()
+        for row in range(rows):
+            cell_lat = min(min_lat + row * lat_step, max_lat)
+            for column in range(columns):
+                cell_lon = min(min_lon + column * lon_step, max_lon)
+                prefixes.add(encode(cell_lat, cell_lon, precision))
+            prefixes.add(encode(cell_lat, max_lon, precision))
+        for column in range(columns):
+            prefixes.add(encode(max_lat, min(min_lon + column * lon_step, max_lon), precision))
+        prefixes.add(encode(max_lat, max_lon, precision))
+        return sorted(prefixes)
+    return ['']
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    ''' great circle (haversine) distance '''
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
@@ -0,0 +1,90 @@
+"""
+Precompiled display labels for choices and countries.
+
+get_FOO_display() builds a dict of the field choices on every call and Country.name goes through
+django_countries for every row. Here the labels of every TextChoices in core.constants, of every
+choice field and of the countries are compiled once per language into plain dicts, so a label is
+a single dict lookup and whole values_list rows are resolved without model instances.
+"""
+import inspect
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import models
+from django.utils import translation
+from django_countries import countries
+from django_countries.fields import CountryField
+from core import constants
+
+
+# Every choices enum of core.constants by name
+CHOICES = {
+    name: value
+    for name, value in vars(constants).items()
+    if inspect.isclass(value) and issubclass(value, models.Choices) and value.__module__ == constants.__name__
+}
+
+
+def _language(language):
+    return language or translation.get_language() or settings.LANGUAGE_CODE
+
+
+@lru_cache(maxsize=None)
+def _choice_table(choices, language):
+    with translation.override(language):
+        return {value: str(label) for value, label in choices.choices}
+
+
+@lru_cache(maxsize=None)
+def _country_table(language):
+    with translation.override(language):
+        return {code: str(name) for code, name in countries}
+
+
+@lru_cache(maxsize=None)
+def _field_table(model, path, language):
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+    if isinstance(field, CountryField):
+        return _country_table(language)
+    if not field.choices:
+        return None
+    with translation.override(language):
+        return {value: str(label) for value, label in field.flatchoices}
+
+
+def choice_label(choices, value, language=None):
+    """ Label of a value of a choices enum, e.g. choice_label(LeadStatus, 'won') """
+    return _choice_table(choices, _language(language)).get(value, value)
+
+
+def country_name(code, language=None):
+    return _country_table(_language(language)).get(code, code)
+
+
+def field_labels(model, path, language=None):
+    """
+    {value: label} of a field, path may follow relations like values_list ('customer__customer_type').
+    None for fields without choices.
+    """
+    return _field_table(model, path, _language(language))
+
+
+def display_rows(rows, model, fields, language=None):
+    """
+    Replace the values of choice and country columns of values_list rows with their labels.
+    rows - iterable of tuples of the fields, e.g. queryset.values_list(*fields)
+    """
+    tables = [(index, field_labels(model, field, language)) for index, field in enumerate(fields)]
+    tables = [(index, table) for index, table in tables if table is not None]
+    if not tables:
+        yield from rows
+        return
+    for row in rows:
+        row = list(row)
+        for index, table in tables:
+            row[index] = table.get(row[index], row[index])
+        yield tuple(row)
@@ -0,0 +1,347 @@
+"""
+Load tests of the admin and the project views.
+
+The project is served in process by Django's threaded WSGI server on 127.0.0.1 (or by a server
+already running on the same database, with a url) and a pool of client threads replays a request
+mix over keep-alive connections - the synthetic mix of the busy admin screens and lead capture,
+or requests recorded from real use by RecordingMiddleware. Latency percentiles, throughput and
+SQL queries are reported per endpoint. Nothing leaves the machine.
+
+Recording, add to MIDDLEWARE with LOADTEST_RECORD_FILE set:
+    'core.loadtest.RecordingMiddleware',
+"""
+import http.client
+import itertools
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+
+class Endpoint:
+    """
+    A request of a mix. path and body may be functions of a random.Random, for a different
+    record or search term on every request. expect is the status of a successful response.
+    """
+
+    def __init__(self, name, path, method='GET', body=None, weight=1, expect=200):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.body = body
+        self.weight = weight
+        self.expect = expect
+
+    def build(self, rng):
+        path = self.path(rng) if callable(self.path) else self.path
+        body = self.body(rng) if callable(self.body) else self.body
+        return path, body
+
+
+class Result:
+    """ Samples of one endpoint """
+
+    def __init__(self):
+        self.latencies = []
+        self.queries = []
+        self.errors = 0
+
+    def extend(self, other):
+        self.latencies += other.latencies
+        self.queries += other.queries
+        self.errors += other.errors
+
+
+# Mixes
+
+def synthetic_mix():
+    """
+    The common admin traffic - changelists and searches of customers and leads, lead capture,
+    site status and the customer 360 page - over samples of the records in the database.
+    Seed at the scale to measure, e.g. seed_data --customers 1000000 for the customer 360 p95.
+    """
+    from core.constants import LeadSource, LeadStatus, SyncStatus
+    from core.seeding import address, person, phone
+    from crm.models import Customer
+    from sales.models import Lead
+    from solar.models import Site
+
+    customers = list(Customer.objects.values_list('pk', 'customer_number', 'name')[:500])
+    leads = list(Lead.objects.values_list('phone', 'city')[:500])
+    sites = list(Site.objects.values_list('pk', flat=True)[:500])
+
+    def customer_search(rng):
+        _, number, name = rng.choice(customers)
+        return reverse('admin:crm_customer_changelist') + '?' + urlencode({'q': rng.choice([number, name or number])})
+
+    def lead_search(rng):
+        lead_phone, city = rng.choice(leads)
+        return reverse('admin:sales_lead_changelist') + '?' + urlencode({'q': rng.choice([lead_phone, city]) or 'x'})
+
+    def lead_form(rng):
+        address_fields, _, _ = address(rng)
+        return {
+            'lead_source': LeadSource.WEB, 'status': LeadStatus.NEW, 'is_active': 'on',
+            'contact_name': person(rng), 'email': f'load{rng.randrange(10 ** 9)}@example.com', 'phone': phone(rng),
+            'estimated_system_size': rng.randint(5, 50), 'assigned_to': '', 'customer': '',
+            'referred_by_installer': '', 'notes': '', **address_fields,
+        }
+
+    mix = [
+        Endpoint('customer_changelist', reverse('admin:crm_customer_changelist'), weight=3),
+        Endpoint('lead_changelist', reverse('admin:sales_lead_changelist') + f'?status__exact={LeadStatus.NEW}', weight=3),
+        Endpoint('lead_capture', reverse('admin:sales_lead_add'), method='POST', body=lead_form, weight=1, expect=302),
+        Endpoint('site_status', reverse('admin:solar_site_changelist') + f'?sync_status__exact={SyncStatus.ERROR}', weight=2),
+    ]
+    if customers:
+        mix.append(Endpoint('customer_search', customer_search, weight=3))
+        mix.append(Endpoint(
+            'customer_360', lambda rng: reverse('admin:crm_customer_360', args=[rng.choice(customers)[0]]), weight=2
+        ))
+    if leads:
+        mix.append(Endpoint('lead_search', lead_search, weight=2))
+    if sites:
+        mix.append(Endpoint(
+            'site_detail', lambda rng: reverse('admin:solar_site_change', args=[rng.choice(sites)]), weight=2
+        ))
+    return mix
+
+
+def recorded_mix(path):
+    """ Endpoints of a RecordingMiddleware file, one per recorded request """
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [
+        Endpoint(record['name'], record['path'], record['method'], record.get('body'), expect=record['status'])
+        for record in records
+    ]
+
+
+class RecordingMiddleware:
+    """ Appends the requests served to settings.LOADTEST_RECORD_FILE as JSON lines, for loadtest --replay """
+    lock = threading.Lock()
+    skipped = ('login', 'logout', 'password')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.path = settings.LOADTEST_RECORD_FILE
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        match = request.resolver_match
+        name = match.view_name if match else request.path
+        if request.method in ('GET', 'POST') and not any(word in name for word in self.skipped):
+            body = None
+            if request.method == 'POST':
+                # Replayed with the token of the load test session
+                body = {key: value for key, value in request.POST.items() if key != 'csrfmiddlewaretoken'}
+            line = json.dumps({
+                'name': name, 'method': request.method, 'path': request.get_full_path(),
+                'body': body, 'status': response.status_code,
+            }, ensure_ascii=False)
+            with self.lock, open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        return response
+
+
+# Server
+
+def count_queries(application):
+    """ WSGI wrapper that adds the number of SQL queries of a request as the X-Query-Count header """
+    def counted(environ, start_response):
+        count = [0]
+
+        def counter(execute, sql, params, many, context):
+            count[0] += 1
+            return execute(sql, params, many, context)
+
+        def start(status, headers, exc_info=None):
+            return start_response(status, headers + [('X-Query-Count', str(count[0]))], exc_info)
+
+        with connection.execute_wrapper(counter):
+            return application(environ, start)
+    return counted
+
+
+class LocalServer:
+    """ The project on Django's threaded WSGI server at 127.0.0.1 on a free port, as a context manager """
+
+    def __enter__(self):
+        from django.core.handlers.wsgi import WSGIHandler
+        from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=False)
+        self.server.set_app(count_queries(WSGIHandler()))
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        self.url = f'http://{host}:{port}'
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def session_cookie(username='loadtest'):
+    """ A session of a superuser for the admin, created when missing with an unusable password """
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+
+    user, created = get_user_model().objects.get_or_create(
+        username=username, defaults={'is_staff': True, 'is_superuser': True}
+    )
+    if created:
+        user.set_unusable_password()
+        user.save()
+    client = Client()
+    client.force_login(user)
+    return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+# Client
+
+class Worker(threading.Thread):
+    """ A client on one keep-alive connection, sending requests of the mix until the run stops """
+
+    def __init__(self, test, index):
+        super().__init__(daemon=True)
+        self.test = test
+        self.rng = random.Random(test.seed + index)
+        self.offset = index
+        self.results = defaultdict(Result)
+        url = urlsplit(test.url)
+        self.connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=test.timeout)
+        self.headers = {
+            'Cookie': f'{settings.SESSION_COOKIE_NAME}={test.session}; {settings.CSRF_COOKIE_NAME}={test.csrf_token}',
+            'X-CSRFToken': test.csrf_token,
+        }
+
+    def endpoints(self):
+        mix = self.test.mix
+        if self.test.replay:
+            # Recorded requests in order, every worker from a different point
+            return itertools.islice(itertools.cycle(mix), self.offset % len(mix), None)
+        weights = [endpoint.weight for endpoint in mix]
+        return (self.rng.choices(mix, weights)[0] for _ in itertools.count())
+
+    def request(self, endpoint):
+        path, body = endpoint.build(self.rng)
+        headers = dict(self.headers)
+        if body is not None:
+            body = urlencode(body)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        start = time.perf_counter()
+        self.connection.request(endpoint.method, path, body, headers)
+        response = self.connection.getresponse()
+        response.read()
+        elapsed = time.perf_counter() - start
+        return response.status, elapsed, response.getheader('X-Query-Count')
+
+    def run(self):
+        test = self.test
+        for number, endpoint in enumerate(self.endpoints()):
+            if number >= test.warmup and not test.take():
+                break
+            try:
+                status, elapsed, queries = self.request(endpoint)
+            except (OSError, http.client.HTTPException):
+                self.connection.close()
+                status, elapsed, queries = None, None, None
+            if number < test.warmup:
+                continue
+            result = self.results[endpoint.name]
+            if status != endpoint.expect:
+                result.errors += 1
+                continue
+            result.latencies.append(elapsed)
+            if queries is not None:
+                result.queries.append(int(queries))
+        self.connection.close()
+
+
+class LoadTest:
+    """
+    A load test run against url with concurrency clients, for a number of requests or seconds.
+    warmup requests of every client are not measured.
+    """
+
+    def __init__(self, url, mix, concurrency=10, requests=1000, duration=None, warmup=5,
+                 replay=False, username='loadtest', seed=0, timeout=30):
+        self.url = url
+        self.mix = mix
+        self.concurrency = concurrency
+        self.requests = requests
+        self.duration = duration
+        self.warmup = warmup
+        self.replay = replay
+        self.seed = seed
+        self.timeout = timeout
+        self.session = session_cookie(username)
+        self.csrf_token = get_random_string(32)
+        self.counter = itertools.count()
+        self.deadline = None
+
+    def take(self):
+        """ Whether another request is to be measured """
+        if self.duration is not None:
+            return time.perf_counter() < self.deadline
+        return next(self.counter) < self.requests
+
+    def run(self):
+        """ returns (rows of report(), seconds) """
+        if not self.mix:
+            raise ValueError('Empty request mix')
+        workers = [Worker(self, index) for index in range(self.concurrency)]
+        start = time.perf_counter()
+        if self.duration is not None:
+            self.deadline = start + self.duration
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        seconds = time.perf_counter() - start
+
+        results = defaultdict(Result)
+        for worker in workers:
+            for name, result in worker.results.items():
+                results[name].extend(result)
+        return report(results, seconds), seconds
+
+
+def report(results, seconds):
+    """ Rows of requests, errors, throughput, latency percentiles (ms) and mean queries per endpoint """
+    rows = []
+    total = Result()
+    for name, result in sorted(results.items()):
+        rows.append(summarize(name, result, seconds))
+        total.extend(result)
+    rows.append(summarize('total', total, seconds))
+    return rows
+
+
+def summarize(name, result, seconds):
+    latencies = np.array(result.latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (np.nan,) * 3
+    return {
+        'endpoint': name,
+        'requests': len(latencies) + result.errors,
+        'errors': result.errors,
+        'rps': round((len(latencies) + result.errors) / seconds, 1) if seconds else 0,
+        'p50_ms': round(float(p50), 1),
+        'p95_ms': round(float(p95), 1),
+        'p99_ms': round(float(p99), 1),
+        'queries': round(float(np.mean(result.queries)), 1) if result.queries else None,
+    }
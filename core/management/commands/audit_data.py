@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Audit the data quality of the crm and sales tables into DataQualityFinding (run weekly)'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', help='Audit only this model (app.Model), repeatable')
+        parser.add_argument('--chunk-size', type=int, default=50_000)
+
+    def handle(self, *args, **options):
+        from django.apps import apps
+        from core.audit import Audit
+
+        models = [apps.get_model(label) for label in options['model'] or []]
+        audit = Audit(chunk_size=options['chunk_size'], log=self.stdout.write)
+        start = time.perf_counter()
+        scanned = audit.run(models)
+        self.stdout.write(f'{scanned} rows audited in {time.perf_counter() - start:.1f}s')
+        for (entity, rule), count in sorted(audit.counts.items()):
+            self.stdout.write(f'{entity:20} {rule:20} {count}')
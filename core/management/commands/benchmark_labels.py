@@ -0,0 +1,54 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Compare get_FOO_display() and Country.name with the label registry (core.labels) on in-memory rows'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs to take the fastest of')
+
+    def handle(self, *args, **options):
+        from core.constants import CustomerType
+        from core.labels import country_name, display_rows
+        from crm.models import Customer
+
+        rng = random.Random(0)
+        types = CustomerType.values
+        codes = ['IL', 'US', 'DE', 'FR', 'GB', 'CY']
+        customers = [
+            Customer(customer_type=rng.choice(types), country=rng.choice(codes)) for _ in range(options['rows'])
+        ]
+        fields = ('customer_type', 'country')
+        rows = [(customer.customer_type, customer.country.code) for customer in customers]
+        addresses = [(customer.city, customer.country.code) for customer in customers]
+
+        def best(func):
+            runs = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                func()
+                runs.append(time.perf_counter() - start)
+            return min(runs)
+
+        cases = [
+            ('get_customer_type_display()', lambda: [c.get_customer_type_display() for c in customers],
+             'field_labels', lambda: list(display_rows(((c.customer_type,) for c in customers), Customer, fields[:1]))),
+            ('Country.name', lambda: [str(c.country.name) for c in customers],
+             'country_name()', lambda: [country_name(code) for _, code in addresses]),
+            ('Customer.full_address (before)', lambda: [', '.join(p for p in (c.city, str(c.country.name)) if p) for c in customers],
+             'full_address', lambda: [c.full_address for c in customers]),
+            ('per row, both', lambda: [(c.get_customer_type_display(), str(c.country.name)) for c in customers],
+             'display_rows()', lambda: list(display_rows(rows, Customer, fields))),
+        ]
+        for name, baseline, registry_name, registry in cases:
+            before, after = best(baseline), best(registry)
+            per_row = 1e9 / options['rows']
+            self.stdout.write(
+                f'{name:30} {before * per_row:8.0f} ns/row   {registry_name:16} {after * per_row:8.0f} ns/row   '
+                f'x{before / after:.1f}'
+            )
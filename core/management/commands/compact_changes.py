@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Compact the change feed to the latest event of every record (run daily)'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Keep every event of the last days')
+        parser.add_argument('--tombstone-days', type=int, help='Also drop deletes older than this, once every consumer read them')
+        parser.add_argument('--chunk-size', type=int, default=50_000, help='Events per delete statement')
+
+    def handle(self, *args, **options):
+        from core.changefeed import compact
+
+        now = timezone.now()
+        tombstones_before = now - timedelta(days=options['tombstone_days']) if options['tombstone_days'] else None
+        deleted = compact(
+            now - timedelta(days=options['days']),
+            tombstones_before=tombstones_before,
+            chunk_size=options['chunk_size'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(f'{deleted} events deleted')
@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test the admin with concurrent clients and report latency percentiles, throughput and SQL '
+        'queries per endpoint. Serves the project in process on 127.0.0.1 unless --url is given.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='A server already running on the same database, e.g. http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--duration', type=float, help='Seconds to run, instead of a number of requests')
+        parser.add_argument('--warmup', type=int, default=5, help='Requests of every client that are not measured')
+        parser.add_argument('--replay', help='Requests recorded by core.loadtest.RecordingMiddleware')
+        parser.add_argument('--user', default='loadtest', help='Superuser to send the requests as, created when missing')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+        parser.add_argument('--max-error-rate', type=float, help='Fail when more requests than this fraction fail')
+
+    def handle(self, *args, **options):
+        from contextlib import nullcontext
+        from core.loadtest import LoadTest, LocalServer, recorded_mix, synthetic_mix
+
+        mix = recorded_mix(options['replay']) if options['replay'] else synthetic_mix()
+        with (nullcontext() if options['url'] else LocalServer()) as server:
+            test = LoadTest(
+                options['url'] or server.url, mix, concurrency=options['concurrency'], requests=options['requests'],
+                duration=options['duration'], warmup=options['warmup'], replay=bool(options['replay']),
+                username=options['user'], seed=options['seed'],
+            )
+            try:
+                rows, seconds = test.run()
+            except ValueError as e:
+                raise CommandError(e)
+
+        if options['json']:
+            self.stdout.write(json.dumps({'seconds': round(seconds, 2), 'endpoints': rows}, indent=2))
+        else:
+            self.stdout.write(f'{options["concurrency"]} clients, {seconds:.1f}s')
+            self.stdout.write(
+                f'{"endpoint":24} {"requests":>9} {"errors":>7} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8}'
+            )
+            for row in rows:
+                queries = '-' if row['queries'] is None else row['queries']
+                self.stdout.write(
+                    f'{row["endpoint"]:24} {row["requests"]:>9} {row["errors"]:>7} {row["rps"]:>8} '
+                    f'{row["p50_ms"]:>8} {row["p95_ms"]:>8} {row["p99_ms"]:>8} {queries:>8}'
+                )
+
+        total = rows[-1]
+        if options['max_error_rate'] is not None and total['errors'] > options['max_error_rate'] * total['requests']:
+            raise CommandError(f'{total["errors"]} of {total["requests"]} requests failed')
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Run the bulk admin actions queued for the background (core.bulk)'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs')
+        parser.add_argument('--interval', type=float, default=2, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        from core import bulk
+
+        bulk.autodiscover()
+        while True:
+            job = bulk.claim_next()
+            if job is None:
+                if not options['loop']:
+                    return
+                time.sleep(options['interval'])
+                continue
+
+            self.stdout.write(f'{job}: started')
+            try:
+                bulk.run_job(job)
+            except bulk.JobLost:
+                self.stderr.write(f'{job}: taken over by another worker')
+            except Exception as e:
+                # Recorded on the job, the worker goes on with the next one
+                self.stderr.write(f'{job}: failed - {e!r}')
+            else:
+                job.refresh_from_db()
+                self.stdout.write(f'{job}: done, {job.changed} changed')
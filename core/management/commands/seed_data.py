@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Add generated customers, leads, installers and sites in bulk (load tests and local development)'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=10_000)
+        parser.add_argument('--leads', type=int, default=20_000)
+        parser.add_argument('--sites', type=int, default=5_000)
+        parser.add_argument('--installers', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed gives the same data')
+
+    def handle(self, *args, **options):
+        from core.seeding import seed
+
+        start = time.perf_counter()
+        try:
+            counts = seed(
+                customers=options['customers'], leads=options['leads'], sites=options['sites'],
+                installers=options['installers'], seed=options['seed'], log=self.stdout.write,
+            )
+        except ValueError as e:
+            raise CommandError(e)
+        self.stdout.write(f'{sum(counts.values())} records seeded in {time.perf_counter() - start:.1f}s')
@@ -0,0 +1,85 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the import time of booting Django with the current settings (python -X importtime), '
+        'fails when it exceeds STARTUP_IMPORT_BUDGET_MS - run in CI with config.settings_worker'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--command', help='Also load this management command, e.g. detect_anomalies')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs to take the fastest of')
+        parser.add_argument('--top', type=int, default=15, help='Slowest top level imports to list')
+        parser.add_argument('--budget-ms', type=float, help='Default: STARTUP_IMPORT_BUDGET_MS')
+
+    def handle(self, *args, **options):
+        code = 'import django; django.setup()'
+        if options['command']:
+            code += (
+                '; from django.core.management import get_commands, load_command_class'
+                f'; load_command_class(get_commands()[{options["command"]!r}], {options["command"]!r})'
+            )
+
+        # Other processes only ever add time, the fastest run is the most stable measurement
+        runs = [self.profile(code) for _ in range(options['repeat'])]
+        imports = min(runs, key=lambda run: sum(run.values()))
+        total = sum(imports.values()) / 1000
+
+        self.stdout.write(f'Settings: {settings.SETTINGS_MODULE}')
+        for name, microseconds in sorted(imports.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'{microseconds / 1000:8.1f} ms  {name}')
+        self.stdout.write(f'{total:8.1f} ms  total')
+
+        budget = options['budget_ms'] or getattr(settings, 'STARTUP_IMPORT_BUDGET_MS', None)
+        if budget and total > budget:
+            raise CommandError(f'Startup imports took {total:.0f} ms, over the budget of {budget:.0f} ms')
+
+    def profile(self, code):
+        """ returns {top level module: cumulative import time in microseconds} """
+        try:
+            modules = import_times(code)
+        except RuntimeError as e:
+            raise CommandError(e)
+        imports = {}
+        # Nested imports are part of the time of their top level import
+        for name, cumulative, top_level in modules:
+            if top_level:
+                imports[name] = imports.get(name, 0) + cumulative
+        return imports
+
+
+def import_times(code, settings_module=None):
+    """
+    Run code in a new interpreter with python -X importtime.
+    returns [(module, cumulative import time in microseconds, whether it is a top level import)]
+    """
+    env = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': settings_module or settings.SETTINGS_MODULE,
+        'PYTHONPATH': os.pathsep.join(path for path in sys.path if path),
+    }
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        env=env,
+        cwd=settings.BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # Nested imports are indented
+        modules.append((name.strip(), int(cumulative), not name.startswith('  ')))
+    return modules
@@ -0,0 +1,46 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:48
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeFeedCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='צרכן')),
+                ('position', models.BigIntegerField(default=0, verbose_name='מיקום')),
+            ],
+            options={
+                'verbose_name': 'סמן צרכן שינויים',
+                'verbose_name_plural': 'סמני צרכני שינויים',
+            },
+        ),
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('entity', models.CharField(max_length=50, verbose_name='ישות')),
+                ('object_id', models.BigIntegerField(verbose_name='מזהה רשומה')),
+                ('operation', models.CharField(choices=[('create', 'יצירה'), ('update', 'עדכון'), ('delete', 'מחיקה')], max_length=10, verbose_name='פעולה')),
+                ('fields', models.JSONField(blank=True, default=list, verbose_name='שדות')),
+                ('data', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='נתונים')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='נוצר')),
+            ],
+            options={
+                'verbose_name': 'אירוע שינוי',
+                'verbose_name_plural': 'אירועי שינוי',
+                'indexes': [models.Index(fields=['entity', 'object_id', 'seq'], name='changeevent_object_idx')],
+            },
+        ),
+    ]
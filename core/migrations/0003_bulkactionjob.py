@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_changefeedcursor_changeevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkActionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('action', models.CharField(max_length=100, verbose_name='פעולה')),
+                ('description', models.CharField(blank=True, max_length=200, verbose_name='תיאור')),
+                ('ranges', models.JSONField(default=list)),
+                ('total', models.IntegerField(default=0, verbose_name='סה"כ')),
+                ('processed', models.IntegerField(default=0, verbose_name='עובדו')),
+                ('changed', models.IntegerField(default=0, verbose_name='עודכנו')),
+                ('status', models.CharField(choices=[('pending', 'ממתין'), ('running', 'רץ'), ('done', 'הסתיים'), ('failed', 'נכשל')], default='pending', max_length=20, verbose_name='סטטוס')),
+                ('error', models.TextField(blank=True, verbose_name='שגיאה')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='התחיל')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='הסתיים')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='נוצר על ידי')),
+            ],
+            options={
+                'verbose_name': 'פעולה גורפת',
+                'verbose_name_plural': 'פעולות גורפות',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_bulkactionjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataQualityFinding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('entity', models.CharField(max_length=50, verbose_name='ישות')),
+                ('object_id', models.BigIntegerField(verbose_name='מזהה רשומה')),
+                ('field', models.CharField(max_length=50, verbose_name='שדה')),
+                ('rule', models.CharField(choices=[('israeli_id', 'תעודת זהות לא תקינה'), ('phone', 'טלפון לא תקין'), ('email', 'אימייל לא תקין'), ('number', 'מספור לא תקין'), ('orphan', 'הפניה לרשומה שלא קיימת'), ('contact_relation', 'איש קשר ללא שיוך יחיד')], max_length=30, verbose_name='כלל')),
+                ('value', models.CharField(blank=True, max_length=255, verbose_name='ערך')),
+                ('suggestion', models.CharField(blank=True, max_length=255, verbose_name='תיקון מוצע')),
+                ('fixed_at', models.DateTimeField(blank=True, null=True, verbose_name='תוקן')),
+            ],
+            options={
+                'verbose_name': 'ממצא איכות נתונים',
+                'verbose_name_plural': 'ממצאי איכות נתונים',
+                'indexes': [models.Index(fields=['entity', 'rule'], name='finding_entity_rule_idx')],
+            },
+        ),
+    ]
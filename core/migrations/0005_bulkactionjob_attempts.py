@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 17:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_dataqualityfinding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkactionjob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='ניסיונות'),
+        ),
+    ]
@@ -1,5 +1,9 @@
-from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.utils import timezone
 from django_countries.fields import CountryField
+from .constants import BulkJobStatus, ChangeOperation, DataQualityRule
 
 class BaseModel(models.Model):
 
@@ -25,6 +29,41 @@ class ActiveManager(models.Manager):
         return super().get_queryset().filter(is_active = True)
 
 
+class ChangeFeedQuerySet(models.QuerySet):
+    '''
+    QuerySet of the models in the change feed (core.changefeed).
+    update(), bulk_create() and bulk_update() send no signals, so they record their changes here -
+    bulk_update() runs its UPDATEs through update().
+    '''
+
+    def update(self, **kwargs):
+        if self.query.is_sliced:
+            raise TypeError('Cannot update a query once a slice has been taken.')
+        from .changefeed import record_rows
+
+        # Only the rows selected here are updated, so every updated row gets its event
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list('pk', flat=True))
+            rows = 0
+            for start in range(0, len(pks), 1000):
+                chunk = self.model._base_manager.using(self.db).filter(pk__in=pks[start:start + 1000])
+                rows += models.QuerySet.update(chunk, **kwargs)
+            record_rows(self.model, pks, ChangeOperation.UPDATE, fields=list(kwargs), using=self.db)
+        return rows
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .changefeed import record_instances
+
+        # An upsert may have updated existing rows
+        operation = ChangeOperation.UPDATE if kwargs.get('update_conflicts') else ChangeOperation.CREATE
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            record_instances(objs, operation, using=self.db)
+        return objs
+
+
 class ActiveModel(BaseModel):
 
     '''
@@ -51,12 +90,160 @@ class AddressMixin(models.Model):
     street = models.CharField(max_length=200, blank=True, verbose_name='רחוב')
     city = models.CharField(max_length=100, blank=True, verbose_name='עיר')
     postal_code = models.CharField(max_length=10, blank=True, verbose_name='מיקוד')
-    country = CountryField(default='IL', verbose_name='מדינה')
+    # An explicit max_length keeps django_countries from loading its country table at import time
+    country = CountryField(default='IL', max_length=2, verbose_name='מדינה')
 
     class Meta:
         abstract = True
 
     @property
     def full_address(self):
-        parts = [self.street, self.city, self.postal_code, str(self.country.name)]
+        from .labels import country_name
+        # The raw code, self.country builds a Country object on every access
+        code = self.__dict__['country'] if 'country' in self.__dict__ else self.country.code
+        parts = [self.street, self.city, self.postal_code, country_name(code)]
         return ', '.join(p for p in parts if p)
+
+
+class GeoLocationMixin(models.Model):
+    """
+    Mixin for coordinates - geohash is indexed for radius queries
+    """
+    latitude = models.FloatField(null=True, blank=True, verbose_name='קו רוחב')
+    longitude = models.FloatField(null=True, blank=True, verbose_name='קו אורך')
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def update_geohash(self):
+        from .geohash import encode
+        if self.latitude is None or self.longitude is None:
+            self.geohash = ''
+        else:
+            self.geohash = encode(self.latitude, self.longitude)
+
+
+class GeocodeCache(models.Model):
+    """
+    Persistent geocoding results keyed on the normalized address.
+    Misses are cached as well (no coordinates) so they are not looked up again.
+    """
+    address_key = models.CharField(max_length=255, unique=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    source = models.CharField(max_length=20, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'מטמון גיאוקודינג'
+        verbose_name_plural = 'מטמון גיאוקודינג'
+
+    def __str__(self):
+        return self.address_key
+
+
+class ChangeEvent(models.Model):
+    """
+    Change data capture outbox of the CRM, sales and field service records (see core.changefeed).
+    Written in the transaction of the change, seq orders the events.
+    """
+    seq = models.BigAutoField(primary_key=True)
+    entity = models.CharField(max_length=50, verbose_name='ישות')
+    object_id = models.BigIntegerField(verbose_name='מזהה רשומה')
+    operation = models.CharField(max_length=10, choices=ChangeOperation.choices, verbose_name='פעולה')
+    # Changed fields, empty when all may have changed
+    fields = models.JSONField(default=list, blank=True, verbose_name='שדות')
+    # The record after the change, None for deletes
+    data = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name='נתונים')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='נוצר')
+
+    class Meta:
+        verbose_name = 'אירוע שינוי'
+        verbose_name_plural = 'אירועי שינוי'
+        indexes = [
+            # Latest event of a record, for compaction
+            models.Index(fields=['entity', 'object_id', 'seq'], name='changeevent_object_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.seq} | {self.entity} {self.object_id} {self.operation}'
+
+
+class ChangeFeedCursor(BaseModel):
+    """
+    Position of a change feed consumer - the last seq it processed
+    """
+    name = models.CharField(max_length=100, unique=True, verbose_name='צרכן')
+    position = models.BigIntegerField(default=0, verbose_name='מיקום')
+
+    class Meta:
+        verbose_name = 'סמן צרכן שינויים'
+        verbose_name_plural = 'סמני צרכני שינויים'
+
+    def __str__(self):
+        return f'{self.name} | {self.position}'
+
+
+class BulkActionJob(BaseModel):
+    """
+    A bulk admin action over a large selection, run by the run_bulk_actions worker (see core.bulk)
+    """
+    action = models.CharField(max_length=100, verbose_name='פעולה')
+    description = models.CharField(max_length=200, blank=True, verbose_name='תיאור')
+    # Selected primary keys as [[first, last], ...] runs
+    ranges = models.JSONField(default=list)
+    total = models.IntegerField(default=0, verbose_name='סה"כ')
+    processed = models.IntegerField(default=0, verbose_name='עובדו')
+    changed = models.IntegerField(default=0, verbose_name='עודכנו')
+    status = models.CharField(
+        max_length=20, choices=BulkJobStatus.choices, default=BulkJobStatus.PENDING, verbose_name='סטטוס'
+    )
+    error = models.TextField(blank=True, verbose_name='שגיאה')
+    # Times the job was claimed by a worker, a job is queued again when its worker dies
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='ניסיונות')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='נוצר על ידי'
+    )
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='התחיל')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='הסתיים')
+
+    class Meta:
+        verbose_name = 'פעולה גורפת'
+        verbose_name_plural = 'פעולות גורפות'
+
+    def __str__(self):
+        return f'{self.description or self.action} | {self.processed}/{self.total}'
+
+    @property
+    def percent(self):
+        return round(100 * self.processed / self.total) if self.total else 100
+
+
+class DataQualityFinding(BaseModel):
+    """
+    A record that breaks a data quality rule, found by the audit_data command (see core.audit)
+    """
+    entity = models.CharField(max_length=50, verbose_name='ישות')
+    object_id = models.BigIntegerField(verbose_name='מזהה רשומה')
+    field = models.CharField(max_length=50, verbose_name='שדה')
+    rule = models.CharField(max_length=30, choices=DataQualityRule.choices, verbose_name='כלל')
+    value = models.CharField(max_length=255, blank=True, verbose_name='ערך')
+    # Replacement value, empty when there is no automatic fix
+    suggestion = models.CharField(max_length=255, blank=True, verbose_name='תיקון מוצע')
+    fixed_at = models.DateTimeField(null=True, blank=True, verbose_name='תוקן')
+
+    class Meta:
+        verbose_name = 'ממצא איכות נתונים'
+        verbose_name_plural = 'ממצאי איכות נתונים'
+        indexes = [
+            models.Index(fields=['entity', 'rule'], name='finding_entity_rule_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.entity} {self.object_id} | {self.get_rule_display()}'
@@ -0,0 +1,197 @@
+"""
+Keyset (cursor) pagination.
+
+OFFSET pagination reads and throws away every row before the page, and the paginator counts the
+whole result. A keyset page continues from the sort key of the last row it showed -
+WHERE (created_at, id) < (last created_at, last id) - so with an index on the sort key page N
+costs the same as page 1. Counts of large results are estimated from the database statistics.
+"""
+import base64
+import json
+
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR
+from django.db import connections
+from django.db.models import Q
+from core.exeptions import InvalidCursorException
+
+
+CURSOR_VAR = 'cursor'
+DEFAULT_ORDERING = ('-created_at', '-pk')
+
+# Results estimated below this size are counted exactly
+EXACT_COUNT_LIMIT = 10_000
+
+
+def estimated_count(queryset, exact_below=EXACT_COUNT_LIMIT):
+    """
+    Number of rows of a queryset from the planner statistics when they are available (PostgreSQL),
+    exact for small results and on databases without statistics.
+    """
+    connection = connections[queryset.db]
+    estimate = None
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)', [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+                estimate = row[0] if row else None
+            else:
+                sql, params = queryset.order_by().query.sql_with_params()
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                estimate = plan[0]['Plan']['Plan Rows']
+
+    # reltuples is -1 for tables that were never analyzed
+    if estimate is None or estimate < exact_below:
+        return queryset.count()
+    return int(estimate)
+
+
+class KeysetPage:
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by a unique sort key, by default newest first on (created_at, id).
+    The last field of the ordering must be unique.
+    example:
+        page = KeysetPaginator(Lead.objects.all(), 100).page(request.GET.get('cursor'))
+        page.object_list, page.next_cursor, page.previous_cursor
+    """
+
+    def __init__(self, queryset, per_page, ordering=DEFAULT_ORDERING):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def _field(self, name):
+        opts = self.queryset.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def encode_cursor(self, obj, direction):
+        values = [self._field(name).value_to_string(obj) for name, _ in self.fields]
+        payload = json.dumps([direction] + values, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            direction, values = payload[0], payload[1:]
+            if direction not in ('n', 'p') or len(values) != len(self.fields):
+                raise ValueError
+            return direction, [self._field(name).to_python(value) for (name, _), value in zip(self.fields, values)]
+        except Exception as e:
+            raise InvalidCursorException(f'Invalid cursor: {cursor}') from e
+
+    def _after(self, values, forward):
+        """
+        Rows after the key in the page direction: for (a desc, b desc) going forward
+        a <= x AND (a < x OR (a = x AND b < y)), the first condition makes it an index range scan.
+        """
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        name, descending = self.fields[0]
+        bound = Q(**{f'{name}__{"lte" if descending == forward else "gte"}': values[0]})
+        return bound & condition
+
+    def page(self, cursor=None):
+        """ The page starting after cursor, the first page without one """
+        forward, queryset = True, self.queryset
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+            forward = direction == 'n'
+            queryset = queryset.filter(self._after(values, forward))
+
+        ordering = self.ordering if forward else [
+            name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering
+        ]
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+        if not rows:
+            return KeysetPage([], None, None)
+
+        has_next = more if forward else True
+        has_previous = bool(cursor) if forward else more
+        return KeysetPage(
+            rows,
+            self.encode_cursor(rows[-1], 'n') if has_next else None,
+            self.encode_cursor(rows[0], 'p') if has_previous else None,
+        )
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Admin changelist paginated by keyset while the default ordering is used.
+    Sorting by a column falls back to the regular numbered pages.
+    """
+
+    def get_queryset(self, request, exclude_parameters=None):
+        # The cursor is not a filter, and changing a filter starts from the first page
+        self.cursor = self.params.pop(CURSOR_VAR, None)
+        self.filter_params.pop(CURSOR_VAR, None)
+        return super().get_queryset(request, exclude_parameters)
+
+    def get_results(self, request):
+        self.keyset_page = None
+        if ORDER_VAR in self.params or self.show_all or self.list_editable:
+            return super().get_results(request)
+
+        paginator = KeysetPaginator(self.queryset, self.list_per_page, self.model_admin.keyset_ordering)
+        try:
+            page = paginator.page(self.cursor)
+        except InvalidCursorException:
+            raise IncorrectLookupParameters
+
+        self.result_count = estimated_count(self.queryset)
+        self.show_full_result_count = self.model_admin.show_full_result_count
+        self.full_result_count = estimated_count(self.root_queryset) if self.show_full_result_count else None
+        self.show_admin_actions = not self.show_full_result_count or bool(self.full_result_count)
+        self.result_list = page.object_list
+        self.can_show_all = False
+        self.multi_page = page.has_next or page.has_previous
+        self.paginator = paginator
+        self.keyset_page = page
+        self.next_url = self.get_query_string({CURSOR_VAR: page.next_cursor}) if page.has_next else None
+        self.previous_url = self.get_query_string({CURSOR_VAR: page.previous_cursor}) if page.has_previous else None
+
+
+class KeysetPaginationMixin:
+    """
+    ModelAdmin mixin for large tables - keyset pages and estimated counts.
+    The model needs an index on the keyset_ordering fields.
+    """
+    keyset_ordering = DEFAULT_ORDERING
+    change_list_template = 'admin/keyset_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
@@ -0,0 +1,70 @@
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _read_range(file, start, length):
+    file.seek(start)
+    remaining = length
+    try:
+        while remaining > 0:
+            chunk = file.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def file_download_response(request, field_file, filename, content_type='application/octet-stream'):
+    """
+    Stream a stored file without loading it into memory.
+    Hands the transfer to the web server when SENDFILE_HEADER is set (X-Sendfile / X-Accel-Redirect),
+    otherwise serves it from Python with single byte range support.
+    """
+    sendfile_header = getattr(settings, 'SENDFILE_HEADER', None)
+    if sendfile_header:
+        response = HttpResponse(content_type=content_type)
+        if sendfile_header == 'X-Accel-Redirect':
+            response[sendfile_header] = getattr(settings, 'SENDFILE_URL', '/protected/') + field_file.name
+        else:
+            response[sendfile_header] = field_file.path
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    size = field_file.size
+    file = field_file.storage.open(field_file.name, 'rb')
+    match = RANGE_RE.match(request.headers.get('Range', ''))
+
+    if match and any(match.groups()):
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # Suffix range - the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+
+        if start > end or start >= size:
+            file.close()
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        length = end - start + 1
+        response = StreamingHttpResponse(_read_range(file, start, length), status=206, content_type=content_type)
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    else:
+        response = FileResponse(file, as_attachment=True, filename=filename, content_type=content_type)
+
+    response['Accept-Ranges'] = 'bytes'
+    return response
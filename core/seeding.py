@@ -0,0 +1,182 @@
+"""
+Synthetic data for load tests and local development.
+
+Records are generated in memory and written with bulk_create in batches, numbered with
+generate_unique_numbers and with the fields save() would derive (normalized keys, geohash) set
+here, so a seed of hundreds of thousands of rows takes seconds. The same seed gives the same data.
+"""
+import random
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from .constants import CustomerType, LeadSource, LeadStatus, SyncStatus
+from .geohash import encode
+from .utils import generate_unique_numbers, normalize_email, normalize_phone
+
+
+BATCH_SIZE = 2000
+
+FIRST_NAMES = ['נועה', 'יוסי', 'מיכל', 'דוד', 'שירה', 'אבי', 'תמר', 'משה', 'רונית', 'איתי', 'הילה', 'עומר']
+LAST_NAMES = ['כהן', 'לוי', 'מזרחי', 'פרץ', 'ביטון', 'אברהם', 'פרידמן', 'אזולאי', 'דהן', 'שפירא']
+COMPANY_WORDS = ['אנרגיה', 'סולאר', 'גגות', 'מערכות', 'שמש', 'חשמל', 'הנדסה']
+# (city, latitude, longitude)
+CITIES = [
+    ('תל אביב', 32.08, 34.78), ('ירושלים', 31.77, 35.21), ('חיפה', 32.79, 34.99), ('באר שבע', 31.25, 34.79),
+    ('אשדוד', 31.80, 34.65), ('נתניה', 32.33, 34.86), ('אילת', 29.56, 34.95), ('עפולה', 32.61, 35.29),
+]
+STREETS = ['הרצל', 'ויצמן', 'בן גוריון', 'הנשיא', 'רוטשילד', 'הגפן', 'התאנה']
+
+
+def israeli_id(rng):
+    """ A random 9 digit ID with a valid check digit """
+    digits = [rng.randrange(10) for _ in range(8)]
+    total = 0
+    for index, digit in enumerate(digits):
+        product = digit * (1 + index % 2)
+        total += product // 10 + product % 10
+    return ''.join(map(str, digits)) + str(-total % 10)
+
+
+def phone(rng):
+    return f'05{rng.randrange(10 ** 8):08d}'
+
+
+def person(rng):
+    return f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+
+
+def address(rng):
+    city, latitude, longitude = rng.choice(CITIES)
+    return {
+        'street': f'{rng.choice(STREETS)} {rng.randint(1, 120)}',
+        'city': city,
+        'postal_code': f'{rng.randrange(10 ** 7):07d}',
+        'country': 'IL',
+    }, latitude, longitude
+
+
+def bulk_insert(model, objs, log):
+    with transaction.atomic():
+        created = model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+    log(f'{model._meta.label}: {len(created)} created')
+    return created
+
+
+def generate_installers(rng, count):
+    from crm.models import Installer
+
+    for index in range(count):
+        address_fields, _, _ = address(rng)
+        yield Installer(
+            company_name=f'{rng.choice(COMPANY_WORDS)} {rng.choice(LAST_NAMES)} {index + 1}',
+            email=f'installer{index}@example.com',
+            phone=phone(rng),
+            license_number=str(rng.randrange(10 ** 6)),
+            **address_fields,
+        )
+
+
+def generate_customers(rng, count):
+    from crm.models import Customer
+
+    for number in generate_unique_numbers('CUS', Customer, 'customer_number', count):
+        business = rng.random() < 0.2
+        name = person(rng)
+        email = f'{number.lower()}@example.com'
+        customer_phone = phone(rng)
+        address_fields, _, _ = address(rng)
+        yield Customer(
+            customer_number=number,
+            customer_type=CustomerType.BUSINESS if business else CustomerType.PRIVATE,
+            name='' if business else name,
+            id_number='' if business else israeli_id(rng),
+            company_name=f'{rng.choice(COMPANY_WORDS)} {rng.choice(LAST_NAMES)} בע"מ' if business else '',
+            email=email,
+            phone=customer_phone,
+            normalized_phone=normalize_phone(customer_phone),
+            normalized_email=normalize_email(email),
+            **address_fields,
+        )
+
+
+def generate_leads(rng, count):
+    from sales.models import Lead
+
+    statuses = [LeadStatus.NEW, LeadStatus.NEW, LeadStatus.CONTACTED, LeadStatus.QUOTE, LeadStatus.LOST]
+    for number in generate_unique_numbers('LED', Lead, 'lead_number', count):
+        address_fields, _, _ = address(rng)
+        yield Lead(
+            lead_number=number,
+            lead_source=rng.choice(LeadSource.values),
+            status=rng.choice(statuses),
+            contact_name=person(rng),
+            email=f'{number.lower()}@example.com',
+            phone=phone(rng),
+            estimated_system_size=rng.randint(5, 100),
+            **address_fields,
+        )
+
+
+def generate_sites(rng, count, customer_ids, installer_ids):
+    from solar.models import Site
+
+    now = timezone.now()
+    for number in generate_unique_numbers('SYS', Site, 'site_number', count):
+        address_fields, latitude, longitude = address(rng)
+        latitude += rng.uniform(-0.05, 0.05)
+        longitude += rng.uniform(-0.05, 0.05)
+        sync_status = rng.choices(SyncStatus.values, weights=[8, 1, 1])[0]
+        yield Site(
+            site_number=number,
+            name=f'מערכת {number}',
+            customer_id=rng.choice(customer_ids),
+            installer_id=rng.choice(installer_ids) if installer_ids else None,
+            installed_capacity=rng.randint(5, 500),
+            installation_date=(now - timedelta(days=rng.randrange(3650))).date(),
+            latitude=latitude,
+            longitude=longitude,
+            geohash=encode(latitude, longitude),
+            sync_status=sync_status,
+            last_sync_at=None if sync_status == SyncStatus.PENDING else now - timedelta(minutes=rng.randrange(1440)),
+            **address_fields,
+        )
+
+
+def seed(customers=0, leads=0, sites=0, installers=0, seed=0, log=print):
+    """
+    Add generated records - sites belong to existing customers (seeded or not) and installers.
+    returns {model label: number of records created}
+    """
+    from crm.models import Customer, Installer
+    from crm.scorecards import rebuild
+    from sales.models import Lead
+    from sales.routing import assign
+    from solar.models import Site
+
+    rng = random.Random(seed)
+    counts = {}
+    for model, count, generate in [
+        (Installer, installers, generate_installers),
+        (Customer, customers, generate_customers),
+        (Lead, leads, generate_leads),
+    ]:
+        if count:
+            objs = list(generate(rng, count))
+            if model is Lead:
+                # bulk_create skips Lead.save(), route the imported leads in one pass
+                assign(objs)
+            counts[model._meta.label] = len(bulk_insert(model, objs, log))
+
+    if sites:
+        customer_ids = list(Customer.objects.values_list('pk', flat=True))
+        if not customer_ids:
+            raise ValueError('Sites need customers, seed customers first')
+        installer_ids = list(Installer.objects.values_list('pk', flat=True))
+        objs = list(generate_sites(rng, sites, customer_ids, installer_ids))
+        counts[Site._meta.label] = len(bulk_insert(Site, objs, log))
+
+    if sites or installers:
+        # bulk_create sends no signals, the scorecards count the new sites
+        rebuild()
+    return counts
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_save, post_delete
+from .changefeed import TRACKED_MODELS, record_instances, record_rows
+from .constants import ChangeOperation
+
+
+# Change feed (core.changefeed) of saves and deletes
+
+def record_saved(sender, instance, created, raw=False, using=None, update_fields=None, **kwargs):
+    # Fixtures are loaded as they are, not as changes
+    if raw:
+        return
+    operation = ChangeOperation.CREATE if created else ChangeOperation.UPDATE
+    if instance.get_deferred_fields():
+        # Events carry the whole record, read the fields that were not loaded
+        record_rows(sender, [instance.pk], operation, fields=update_fields or (), using=using)
+    else:
+        record_instances([instance], operation, fields=update_fields or (), using=using)
+
+
+def record_deleted(sender, instance, using=None, **kwargs):
+    record_instances([instance], ChangeOperation.DELETE, using=using)
+
+
+for label in TRACKED_MODELS:
+    post_save.connect(record_saved, sender=label, dispatch_uid=f'changefeed_save_{label}')
+    post_delete.connect(record_deleted, sender=label, dispatch_uid=f'changefeed_delete_{label}')
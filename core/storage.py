@@ -0,0 +1,69 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names each file by the SHA-256 of its content.
+    Identical uploads are stored once, the content is streamed in chunks and never held in memory.
+    example: contracts/3f/a2/3fa2...e1.pdf
+    """
+    chunk_size = 1024 * 1024
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is decided by the content hash in _save
+        return name
+
+    def content_name(self, name, digest):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, digest[:2], digest[2:4], f'{digest}{extension}').replace('\\', '/')
+
+    def _save(self, name, content):
+        # Large uploads are already on disk, hash them in place and let the parent move the file
+        if hasattr(content, 'temporary_file_path'):
+            with open(content.temporary_file_path(), 'rb') as f:
+                digest = hashlib.file_digest(f, 'sha256').hexdigest()
+            target = self.content_name(name, digest)
+            if self.exists(target):
+                return target
+            return super()._save(target, content)
+
+        os.makedirs(self.location, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix='.upload-', dir=self.location)
+        try:
+            sha = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in content.chunks(self.chunk_size):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    sha.update(chunk)
+                    temp_file.write(chunk)
+
+            target = self.content_name(name, sha.hexdigest())
+            if self.exists(target):
+                return target
+
+            full_path = self.path(target)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            os.replace(temp_path, full_path)
+            temp_path = None
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+            return target
+        finally:
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    @staticmethod
+    def digest_from_name(name):
+        """ Return the content hash encoded in a stored name, or '' for names from other storages """
+        digest = os.path.splitext(os.path.basename(name or ''))[0]
+        if len(digest) == 64 and all(c in '0123456789abcdef' for c in digest):
+            return digest
+        return ''
@@ -1,3 +1,122 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from crm.models import Customer
+from . import changefeed
+from .management.commands.startup_profile import import_times
+from .constants import ChangeOperation
+from .models import ChangeEvent
+
+
+class ChangeFeedRecordTest(TestCase):
+
+    def setUp(self):
+        self.customers = [Customer.objects.create(name=f'לקוח {i}', city='חיפה') for i in range(3)]
+        ChangeEvent.objects.all().delete()
+
+    def test_bulk_update_records_one_event_per_row(self):
+        for customer in self.customers:
+            customer.city = 'עכו'
+        Customer.objects.bulk_update(self.customers, ['city'])
+        events = ChangeEvent.objects.filter(entity='crm.customer')
+        self.assertEqual(sorted(events.values_list('object_id', flat=True)), sorted(c.pk for c in self.customers))
+        self.assertTrue(all(event.operation == ChangeOperation.UPDATE for event in events))
+        self.assertTrue(all(event.data['city'] == 'עכו' and event.data['name'] for event in events))
+
+    def test_deferred_save_records_the_whole_record(self):
+        customer = Customer.objects.only('pk', 'city').get(pk=self.customers[0].pk)
+        customer.city = 'עכו'
+        customer.save()
+        event = ChangeEvent.objects.get()
+        self.assertEqual(event.data['city'], 'עכו')
+        self.assertEqual(event.data['name'], 'לקוח 0')
+        self.assertIn('customer_number', event.data)
+
+
+class ChangeFeedReadTest(TestCase):
+
+    def event(self, seq, entity='crm.customer', age=120):
+        return ChangeEvent.objects.create(
+            seq=seq, entity=entity, object_id=seq, operation=ChangeOperation.UPDATE, data={},
+            created_at=timezone.now() - timedelta(seconds=age),
+        )
+
+    def test_entities_are_filtered_and_passed(self):
+        for seq in range(1, 7):
+            self.event(seq, 'crm.customer' if seq % 3 == 0 else 'sales.lead')
+        events, position = changefeed.read(0, 10, ['crm.customer'])
+        self.assertEqual([event.seq for event in events], [3, 6])
+        self.assertEqual(position, 6)
+
+    def test_limit_counts_the_events_of_the_entities(self):
+        for seq in range(1, 7):
+            self.event(seq, 'crm.customer' if seq % 3 == 0 else 'sales.lead')
+        events, position = changefeed.read(0, 1, ['crm.customer'])
+        self.assertEqual([event.seq for event in events], [3])
+        self.assertEqual(position, 3)
+
+    def test_stops_before_a_recent_gap(self):
+        self.event(1)
+        self.event(2, age=1)
+        self.event(4, age=1)
+        events, position = changefeed.read(0, 10, ['crm.customer'])
+        self.assertEqual([event.seq for event in events], [1, 2])
+        self.assertEqual(position, 2)
+
+    def test_passes_a_settled_gap(self):
+        self.event(1)
+        self.event(3)
+        self.event(4, 'sales.lead', age=1)
+        events, position = changefeed.read(0, 10, ['crm.customer'])
+        self.assertEqual([event.seq for event in events], [1, 3])
+        self.assertEqual(position, 4)
+
+    def test_stops_before_a_gap_right_after_the_settled_events(self):
+        self.event(1)
+        self.event(3, age=1)
+        self.assertEqual(changefeed.readable_position(), 1)
+
+    def test_readable_position_queries_do_not_follow_the_recent_events(self):
+        self.event(1)
+        for seq in range(2, 52):
+            self.event(seq, age=1)
+        self.event(53, age=1)
+        with self.assertNumQueries(3):
+            self.assertEqual(changefeed.readable_position(), 51)
+
+    def test_empty_batch_is_refused(self):
+        self.event(1)
+        with self.assertRaises(ValueError):
+            changefeed.read(0, 0)
+
+    def test_view_refuses_a_limit_below_one(self):
+        self.event(1)
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password'))
+        for limit in (0, -1):
+            response = self.client.get(reverse('core:changes'), {'limit': limit})
+            self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('core:changes'), {'limit': 1})
+        self.assertEqual(response.json()['position'], 1)
+
+
+class WorkerStartupTest(SimpleTestCase):
+    """ Booting Django with config.settings_worker, measured in new interpreters """
+    BOOT = 'import django; django.setup()'
+    RUNS = 5
+
+    def test_import_time_budget(self):
+        # Other processes only ever add time, the fastest run is the stable measurement
+        totals = [
+            sum(cumulative for _, cumulative, top_level in import_times(self.BOOT, 'config.settings_worker') if top_level)
+            for _ in range(self.RUNS)
+        ]
+        self.assertLess(min(totals) / 1000, settings.STARTUP_IMPORT_BUDGET_MS)
+
+    def test_heavy_modules_are_not_imported(self):
+        modules = {name for name, _, _ in import_times(self.BOOT, 'config.settings_worker')}
+        for name in ['numpy', 'weasyprint', 'pypdf', 'ijson', 'crm.admin', 'sales.admin', 'monitoring.anomalies', 'reports.generation']:
+            self.assertNotIn(name, modules)
@@ -1,10 +1,12 @@
+import re
+
 
 def generate_unique_number(prefix: str, model_class, field_name: str = 'number') -> str:
     '''
     create a unique number with a prefix for each record type
     example: CUS-0001, CUS-0002, SYS-0001
     '''
-    last_obj = models_class.objects.filter(
+    last_obj = model_class.objects.filter(
         **{f'{field_name}__startswith': f'{prefix}-'}
     ).order_by(f'-{field_name}').first()
 
@@ -16,3 +18,43 @@ def generate_unique_number(prefix: str, model_class, field_name: str = 'number')
     
     return f'{prefix}-{new_number:06d}'
 
+
+def generate_unique_numbers(prefix: str, model_class, field_name: str, count: int) -> list:
+    '''
+    create count consecutive unique numbers for bulk inserts with a single query
+    example: CON-0007, CON-0008, CON-0009
+    '''
+    first = generate_unique_number(prefix, model_class, field_name)
+    first_number = int(first.split('-')[-1])
+    return [f'{prefix}-{number:06d}' for number in range(first_number, first_number + count)]
+
+
+NIQQUD_RE = re.compile('[\u0591-\u05c7]')
+FINAL_LETTERS = str.maketrans('ךםןףץ', 'כמנפצ')
+APOSTROPHE_RE = re.compile('[\'"`\u05f3\u05f4]')
+NON_WORD_RE = re.compile(r'[^\w\s]')
+
+
+def normalize_phone(phone: str) -> str:
+    '''
+    normalize an israeli phone number to local digits only
+    example: +972-50-123 4567 -> 0501234567
+    '''
+    digits = ''.join(c for c in phone or '' if c.isdigit())
+    if digits.startswith('972'):
+        digits = '0' + digits[3:]
+    return digits
+
+
+def normalize_email(email: str) -> str:
+    return (email or '').strip().lower()
+
+
+def normalize_name(name: str) -> str:
+    '''
+    normalize a hebrew / english name for comparison:
+    lower case, no niqqud or punctuation, regular letters instead of final letters
+    '''
+    name = NIQQUD_RE.sub('', (name or '').lower()).translate(FINAL_LETTERS)
+    name = APOSTROPHE_RE.sub('', name)
+    return ' '.join(NON_WORD_RE.sub(' ', name).split())
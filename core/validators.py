@@ -1,4 +1,6 @@
+from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
+from django.utils.deconstruct import deconstructible
 
 
 phone_validator = RegexValidator(
@@ -7,7 +9,26 @@ phone_validator = RegexValidator(
 )
 
 
-israeli_id_validator = RegexValidator(
-    regex=r'^\d{9}$',
-    message='תעודת זהות חייבת להכיל 9 ספרות'
-)
\ No newline at end of file
+def israeli_id_checksum(value):
+    """ Whether the check digit (last) of a 9 digit Israeli ID is right """
+    total = 0
+    for index, digit in enumerate(value):
+        product = int(digit) * (1 + index % 2)
+        total += product // 10 + product % 10
+    return total % 10 == 0
+
+
+@deconstructible
+class IsraeliIdValidator(RegexValidator):
+    """ 9 digits with a valid check digit """
+    regex = r'^\d{9}$'
+    message = 'תעודת זהות חייבת להכיל 9 ספרות'
+    checksum_message = 'ספרת הביקורת של תעודת הזהות שגויה'
+
+    def __call__(self, value):
+        super().__call__(value)
+        if not israeli_id_checksum(str(value)):
+            raise ValidationError(self.checksum_message, code='checksum', params={'value': value})
+
+
+israeli_id_validator = IsraeliIdValidator()
@@ -1,3 +1,43 @@
-from django.shortcuts import render
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import PermissionDenied
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from .changefeed import BATCH_SIZE, read
 
-# Create your views here.
+
+MAX_LIMIT = 10_000
+
+
+@staff_member_required
+def changes(request):
+    """
+    A batch of the change feed (core.changefeed) for downstream systems.
+    ?after=<position of the previous batch>&limit=<events>&entity=crm.customer (repeatable)
+    """
+    if not request.user.has_perm('core.view_changeevent'):
+        raise PermissionDenied
+
+    try:
+        after = int(request.GET.get('after', 0))
+        limit = min(int(request.GET.get('limit', BATCH_SIZE)), MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': 'after and limit must be integers'}, status=400)
+    if limit < 1:
+        return JsonResponse({'error': 'limit must be positive'}, status=400)
+
+    events, position = read(after, limit, request.GET.getlist('entity') or None)
+    return JsonResponse({
+        'position': position,
+        'events': [
+            {
+                'seq': event.seq,
+                'entity': event.entity,
+                'object_id': event.object_id,
+                'operation': event.operation,
+                'fields': event.fields,
+                'data': event.data,
+                'created_at': event.created_at,
+            }
+            for event in events
+        ],
+    }, encoder=DjangoJSONEncoder)
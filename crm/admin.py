@@ -1,5 +1,18 @@
-from django.contrib import admin
-from .models import Customer, Contact, Installer, Supplier
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
+from accounts.scoping import ScopedAdminMixin
+from core.bulk import admin_action
+from core.exports import CSVExportMixin
+from . import bulk  # noqa: F401 - registers the bulk actions
+from core.pagination import KeysetPaginationMixin
+from reports.models import MonthlyReport
+from .customer360 import Customer360
+from .dedup import merge_customers, merge_relations
+from .models import Customer, Contact, Installer, InstallerScorecard, Supplier
 
 
 class ContactInline(admin.TabularInline):
@@ -9,16 +22,16 @@ class ContactInline(admin.TabularInline):
 
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(ScopedAdminMixin, KeysetPaginationMixin, CSVExportMixin, admin.ModelAdmin):
     list_display = ['customer_number', 'display_name', 'customer_type', 'city', 'phone', 'is_active']
     list_filter = ['customer_type', 'is_active', 'city']
     search_fields = ['customer_number', 'name', 'company_name', 'email', 'phone']
-    readonly_fields = ['customer_number', 'created_at', 'updated_at']
+    readonly_fields = ['customer_number', 'customer360_link', 'created_at', 'updated_at']
     inlines = [ContactInline]
     
     fieldsets = (
         ('פרטי לקוח', {
-            'fields': ('customer_number', 'customer_type', 'is_active')
+            'fields': ('customer_number', 'customer_type', 'is_active', 'customer360_link')
         }),
         ('פרטים אישיים', {
             'fields': ('name', 'id_number'),
@@ -40,23 +53,157 @@ class CustomerAdmin(admin.ModelAdmin):
         }),
     )
     
+    actions = ['merge_selected', admin_action('crm.customer.deactivate_customers'), 'export_csv']
+    export_fields = [
+        'customer_number', 'customer_type', 'name', 'company_name', 'email', 'phone', 'mobile',
+        'street', 'city', 'postal_code', 'country', 'is_active', 'created_at',
+    ]
+
+    @admin.action(description='מזג לקוחות נבחרים (ללקוח הוותיק)', permissions=['change'])
+    def merge_selected(self, request, queryset):
+        """ Like delete_selected, an intermediate page confirms the merge before it is done """
+        customers = list(queryset.order_by('pk'))
+        if len(customers) < 2:
+            self.message_user(request, 'יש לבחור לפחות שני לקוחות למיזוג', messages.WARNING)
+            return None
+        target, duplicates = customers[0], customers[1:]
+        if request.POST.get('post'):
+            merged = merge_customers(target, duplicates)
+            self.message_user(request, f'{merged} לקוחות מוזגו ללקוח {target}')
+            return None
+
+        duplicate_ids = [c.pk for c in duplicates]
+        moved = []
+        for model, field in [*merge_relations(), (Contact, 'customer'), (MonthlyReport, 'customer')]:
+            count = model.objects.filter(**{f'{field}__in': duplicate_ids}).count()
+            if count:
+                moved.append(f'{model._meta.verbose_name_plural}: {count}')
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.opts,
+            'title': 'מיזוג לקוחות',
+            'target': target,
+            'duplicates': duplicates,
+            'moved': moved,
+            'queryset': queryset,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, 'admin/crm/customer/merge_confirmation.html', context)
+
     def get_inline_instances(self, request, obj=None):
         """מציג inline רק עבור לקוחות קיימים"""
         if obj is None:
             return []
         return super().get_inline_instances(request, obj)
 
+    def get_urls(self):
+        urls = [
+            path(
+                '<path:object_id>/360/',
+                self.admin_site.admin_view(self.customer360_view),
+                name='crm_customer_360',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def customer360_view(self, request, object_id):
+        """תמונת לקוח מלאה - נטענת במספר קבוע של שאילתות"""
+        try:
+            customer360 = Customer360.load(object_id, self.get_queryset(request))
+        except (Customer.DoesNotExist, ValueError):
+            return self._get_obj_does_not_exist_redirect(request, self.opts, object_id)
+        if not self.has_view_or_change_permission(request, customer360.customer):
+            raise PermissionDenied
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.opts,
+            'title': f'תמונת לקוח | {customer360.customer.display_name}',
+            'customer': customer360.customer,
+            'customer360': customer360,
+        }
+        return TemplateResponse(request, 'admin/crm/customer/customer360.html', context)
+
+    @admin.display(description='תמונת לקוח')
+    def customer360_link(self, obj):
+        if not obj.pk:
+            return '-'
+        return format_html('<a href="{}">פתח</a>', reverse('admin:crm_customer_360', args=[obj.pk]))
+
 
 @admin.register(Installer)
-class InstallerAdmin(admin.ModelAdmin):
-    list_display = ['company_name', 'phone', 'city', 'is_active']
+class InstallerAdmin(ScopedAdminMixin, admin.ModelAdmin):
+    list_display = [
+        'company_name',
+        'phone',
+        'city',
+        'fleet_size',
+        'recent_installs',
+        'performance_ratio',
+        'alert_rate',
+        'avg_resolution_hours',
+        'conversion_rate',
+        'is_active',
+    ]
     list_filter = ['is_active', 'city']
     search_fields = ['company_name', 'email', 'phone']
     inlines = [ContactInline]
+    actions = [admin_action('crm.installer.deactivate_installers')]
+
+    def get_queryset(self, request):
+        # Scorecard of the last 12 months from the monthly rollup rows, part of the changelist query
+        return super().get_queryset(request).with_scorecard()
+
+    @admin.display(description='מערכות', ordering='fleet_size')
+    def fleet_size(self, obj):
+        return int(obj.fleet_size)
+
+    @admin.display(description='התקנות (12 ח׳)', ordering='recent_installs')
+    def recent_installs(self, obj):
+        return int(obj.recent_installs)
+
+    @admin.display(description='יחס ביצועים', ordering='performance_ratio')
+    def performance_ratio(self, obj):
+        return _percent(obj.performance_ratio)
+
+    @admin.display(description='התראות למערכת', ordering='alert_rate')
+    def alert_rate(self, obj):
+        return '-' if obj.alert_rate is None else f'{obj.alert_rate:.2f}'
+
+    @admin.display(description='זמן טיפול ממוצע (שעות)', ordering='avg_resolution_hours')
+    def avg_resolution_hours(self, obj):
+        return '-' if obj.avg_resolution_hours is None else f'{obj.avg_resolution_hours:.1f}'
+
+    @admin.display(description='המרת הפניות', ordering='conversion_rate')
+    def conversion_rate(self, obj):
+        return _percent(obj.conversion_rate)
+
+
+def _percent(value):
+    return '-' if value is None else f'{value:.0%}'
+
+
+@admin.register(InstallerScorecard)
+class InstallerScorecardAdmin(ScopedAdminMixin, admin.ModelAdmin):
+    list_display = [
+        'installer',
+        'month',
+        'systems_installed',
+        'energy_kwh',
+        'expected_kwh',
+        'alert_count',
+        'tickets_resolved',
+        'referred_leads',
+        'converted_leads',
+    ]
+    list_filter = ['month']
+    search_fields = ['installer__company_name']
+    list_select_related = ['installer']
+    raw_id_fields = ['installer']
 
 
 @admin.register(Supplier)
-class SupplierAdmin(admin.ModelAdmin):
+class SupplierAdmin(ScopedAdminMixin, admin.ModelAdmin):
     list_display = ['name', 'supplier_type', 'phone', 'is_active']
     list_filter = ['supplier_type', 'is_active']
     search_fields = ['name', 'email']
@@ -64,7 +211,7 @@ class SupplierAdmin(admin.ModelAdmin):
 
 
 @admin.register(Contact)
-class ContactAdmin(admin.ModelAdmin):
+class ContactAdmin(ScopedAdminMixin, admin.ModelAdmin):
     list_display = ['first_name', 'last_name', 'entity_type', 'related_entity', 'role', 'phone', 'email', 'is_primary']
     list_filter = ['is_primary']
     search_fields = ['first_name', 'last_name', 'email', 'phone']
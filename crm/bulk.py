@@ -0,0 +1,12 @@
+from django.utils import timezone
+from core import bulk
+
+
+@bulk.register('crm.Customer', 'השבת לקוחות')
+def deactivate_customers(queryset):
+    return queryset.filter(is_active=True).update(is_active=False, updated_at=timezone.now())
+
+
+@bulk.register('crm.Installer', 'השבת מתקינים')
+def deactivate_installers(queryset):
+    return queryset.filter(is_active=True).update(is_active=False, updated_at=timezone.now())
@@ -0,0 +1,81 @@
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Prefetch, Subquery, Sum
+from django.db.models.functions import Coalesce
+from alerts.models import Alert, OPEN_ALERT_STATUSES
+from sales.models import Contract, Lead
+from solar.models import Site
+from tickets.models import Ticket
+from .models import Customer, Contact
+
+
+def _subquery_aggregate(queryset, aggregate, output_field):
+    """
+    Correlated aggregate over the customer relation.
+    A subquery per aggregate keeps the customer row single instead of multiplying joins.
+    """
+    return Coalesce(
+        Subquery(
+            queryset.filter(customer=OuterRef('pk'))
+            .order_by()
+            .values('customer')
+            .annotate(total=aggregate)
+            .values('total'),
+            output_field=output_field,
+        ),
+        0,
+        output_field=output_field,
+    )
+
+
+class Customer360:
+    """
+    Full picture of a customer for support staff.
+    Loads the customer with its aggregates in one query and each related list with one
+    prefetch query - 7 queries in total, no matter how much data the customer has.
+    """
+
+    def __init__(self, customer):
+        self.customer = customer
+        self.contacts = customer.contacts.all()
+        self.leads = customer.leads.all()
+        self.contracts = customer.contracts.all()
+        self.sites = customer.sites.all()
+        self.open_alerts = customer.open_alerts
+        self.open_tickets = customer.open_tickets
+        self.total_contract_value = customer.total_contract_value
+        self.open_alert_count = customer.open_alert_count
+        self.open_ticket_count = customer.open_ticket_count
+
+    @staticmethod
+    def get_queryset(queryset=None):
+        queryset = queryset if queryset is not None else Customer.objects.all()
+        return queryset.annotate(
+            total_contract_value=_subquery_aggregate(
+                Contract.active.all(), Sum('value'), DecimalField(max_digits=14, decimal_places=2)
+            ),
+            open_alert_count=_subquery_aggregate(
+                Alert.objects.filter(status__in=OPEN_ALERT_STATUSES), Count('pk'), IntegerField()
+            ),
+            open_ticket_count=_subquery_aggregate(
+                Ticket.objects.open(), Count('pk'), IntegerField()
+            ),
+        ).prefetch_related(
+            Prefetch('contacts', queryset=Contact.active.all()),
+            Prefetch('leads', queryset=Lead.objects.select_related('assigned_to')),
+            Prefetch('contracts', queryset=Contract.objects.order_by('-start_date')),
+            Prefetch('sites', queryset=Site.objects.select_related('installer')),
+            Prefetch(
+                'alerts',
+                queryset=Alert.objects.filter(status__in=OPEN_ALERT_STATUSES).select_related('site'),
+                to_attr='open_alerts',
+            ),
+            Prefetch(
+                'tickets',
+                queryset=Ticket.objects.open().select_related('site', 'assigned_to').order_by('sla_due_at'),
+                to_attr='open_tickets',
+            ),
+        )
+
+    @classmethod
+    def load(cls, pk, queryset=None):
+        """ raises Customer.DoesNotExist when the customer is missing or out of the given queryset """
+        return cls(cls.get_queryset(queryset).get(pk=pk))
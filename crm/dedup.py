@@ -0,0 +1,236 @@
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+from django.db import transaction
+from core.constants import CustomerType
+from core.utils import normalize_email, normalize_name, normalize_phone
+
+
+# Vav / yod inside a word are spelled inconsistently in hebrew (ktiv male / haser)
+MATRES_RE = re.compile('(?<=\\w)[וי]')
+
+# Keys that identify a person or a company on their own, no name check needed
+STRONG_KEYS = {'id_number', 'business_number'}
+
+
+@lru_cache(maxsize=100_000)
+def name_skeleton(name):
+    """ Spelling-insensitive form of a name, word order ignored """
+    return ' '.join(sorted(MATRES_RE.sub('', word) for word in normalize_name(name).split()))
+
+
+def name_similarity(a, b):
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def names_match(a, b, threshold):
+    """ name_similarity(a, b) >= threshold, with the cheap upper bounds checked first """
+    if not a or not b:
+        return False
+    if a == b:
+        return True
+    matcher = SequenceMatcher(None, a, b)
+    return (
+        matcher.real_quick_ratio() >= threshold
+        and matcher.quick_ratio() >= threshold
+        and matcher.ratio() >= threshold
+    )
+
+
+class DuplicateFinder:
+    """
+    Groups records that share a blocking key (phone, email, id number...) and have similar names.
+    Records are only compared inside their blocks, so the work grows with the number of records
+    and the block sizes, not with the square of the number of records.
+    Oversized blocks (a shared office phone, a placeholder email) are skipped.
+    """
+
+    def __init__(self, threshold=0.8, max_block_size=50):
+        self.threshold = threshold
+        self.max_block_size = max_block_size
+        self.blocks = defaultdict(list)
+        self.names = {}
+        self.parent = {}
+
+    def add(self, key, name, blocking_keys):
+        """ blocking_keys - iterable of (field, value) pairs, empty values are ignored """
+        self.names[key] = name_skeleton(name)
+        self.parent[key] = key
+        for field, value in blocking_keys:
+            if value:
+                self.blocks[(field, value)].append(key)
+
+    def _find(self, key):
+        root = key
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[key] != root:
+            self.parent[key], key = root, self.parent[key]
+        return root
+
+    def _union(self, a, b):
+        self.parent[self._find(b)] = self._find(a)
+
+    def clusters(self):
+        """ Return groups of two or more keys that are considered the same entity """
+        for (field, _), members in self.blocks.items():
+            if len(members) < 2 or len(members) > self.max_block_size:
+                continue
+            strong = field in STRONG_KEYS
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    if self._find(a) == self._find(b):
+                        continue
+                    if strong or names_match(self.names[a], self.names[b], self.threshold):
+                        self._union(a, b)
+
+        groups = defaultdict(list)
+        for key in self.parent:
+            groups[self._find(key)].append(key)
+        return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+def _customer_blocking_keys(phone, mobile, email, id_number, business_number):
+    return [
+        ('phone', normalize_phone(phone)),
+        ('phone', normalize_phone(mobile)),
+        ('email', normalize_email(email)),
+        ('id_number', id_number),
+        ('business_number', business_number),
+    ]
+
+
+def _add_customers(finder, queryset, key_prefix=None):
+    rows = queryset.values_list(
+        'pk', 'customer_type', 'name', 'company_name', 'phone', 'mobile', 'email', 'id_number', 'business_number'
+    )
+    for pk, customer_type, name, company_name, phone, mobile, email, id_number, business_number in rows.iterator(chunk_size=5000):
+        display_name = company_name if customer_type == CustomerType.BUSINESS else name
+        key = (key_prefix, pk) if key_prefix else pk
+        finder.add(key, display_name, _customer_blocking_keys(phone, mobile, email, id_number, business_number))
+
+
+def find_duplicate_customers(queryset=None, threshold=0.8):
+    """ Return clusters of duplicate customer pks, streamed from the DB in chunks """
+    from .models import Customer
+
+    finder = DuplicateFinder(threshold)
+    _add_customers(finder, queryset if queryset is not None else Customer.active.all())
+    return finder.clusters()
+
+
+def match_leads_to_customers(leads, customers=None, threshold=0.8):
+    """
+    Find the existing customer of each unconverted lead.
+    returns {lead pk: customer pk}, leads that match several customers go to the oldest one
+    """
+    from .models import Customer
+
+    finder = DuplicateFinder(threshold)
+    _add_customers(finder, customers if customers is not None else Customer.active.all(), 'customer')
+    for pk, contact_name, phone, email in leads.filter(customer__isnull=True).values_list(
+        'pk', 'contact_name', 'phone', 'email'
+    ).iterator(chunk_size=5000):
+        finder.add(('lead', pk), contact_name, [('phone', normalize_phone(phone)), ('email', normalize_email(email))])
+
+    matches = {}
+    for cluster in finder.clusters():
+        customer_pks = [pk for kind, pk in cluster if kind == 'customer']
+        if customer_pks:
+            for kind, pk in cluster:
+                if kind == 'lead':
+                    matches[pk] = min(customer_pks)
+    return matches
+
+
+def find_duplicate_contacts(queryset=None, threshold=0.8):
+    """ Return clusters of duplicate contact pks, a contact is only compared with contacts of the same entity """
+    from .models import Contact
+
+    finder = DuplicateFinder(threshold)
+    queryset = queryset if queryset is not None else Contact.active.all()
+    for pk, customer_id, installer_id, supplier_id, first_name, last_name, phone, email in queryset.values_list(
+        'pk', 'customer_id', 'installer_id', 'supplier_id', 'first_name', 'last_name', 'phone', 'email'
+    ).iterator(chunk_size=5000):
+        owner = (customer_id, installer_id, supplier_id)
+        finder.add(pk, f'{first_name} {last_name}', [
+            ('phone', (owner, normalize_phone(phone)) if phone else None),
+            ('email', (owner, normalize_email(email)) if email else None),
+        ])
+    return finder.clusters()
+
+
+# Customer fields filled from a duplicate when empty on the merge target
+MERGE_FILL_FIELDS = [
+    'name', 'id_number', 'company_name', 'business_number', 'email', 'phone', 'mobile',
+    'street', 'city', 'postal_code',
+]
+
+
+def merge_relations():
+    """
+    The (model, field) of every foreign key to Customer the merge moves to the target - leads,
+    contracts, invoices, sites, alerts, tickets and anything added later. Contacts and monthly
+    reports have their own rules, merged_into is the merge itself.
+    """
+    from reports.models import MonthlyReport
+    from .models import Contact, Customer
+
+    return [
+        (relation.related_model, relation.field.name)
+        for relation in Customer._meta.related_objects
+        if relation.one_to_many and relation.related_model not in (Customer, Contact, MonthlyReport)
+    ]
+
+
+def merge_customers(target, duplicates):
+    """
+    Merge duplicate customers into target.
+    The records of every relation (merge_relations) are moved with one UPDATE per relation, the
+    duplicates are deactivated and point to target through merged_into. The target keeps a
+    single primary contact. A monthly report of a duplicate is moved unless the target already
+    has one for the month (the target's is rendered again from the merged sites), otherwise it
+    stays with the deactivated duplicate.
+    """
+    from reports.models import MonthlyReport
+    from .models import Customer, Contact
+
+    duplicates = [c for c in duplicates if c.pk != target.pk]
+    duplicate_ids = [c.pk for c in duplicates]
+    if not duplicate_ids:
+        return 0
+
+    with transaction.atomic():
+        for model, field in merge_relations():
+            model.objects.filter(**{f'{field}__in': duplicate_ids}).update(**{field: target})
+
+        # Keep a single primary contact - the one of the target if it has one, else the oldest moved one
+        moved_contacts = Contact.objects.filter(customer_id__in=duplicate_ids)
+        demoted = moved_contacts.filter(is_primary=True)
+        if not Contact.objects.filter(customer=target, is_primary=True).exists():
+            demoted = demoted.exclude(pk=demoted.order_by('pk').values_list('pk', flat=True).first())
+        demoted.update(is_primary=False)
+        moved_contacts.update(customer=target)
+
+        months = set(MonthlyReport.objects.filter(customer=target).values_list('month', flat=True))
+        moved_reports = []
+        for pk, month in MonthlyReport.objects.filter(customer_id__in=duplicate_ids).order_by('pk').values_list('pk', 'month'):
+            if month not in months:
+                months.add(month)
+                moved_reports.append(pk)
+        MonthlyReport.objects.filter(pk__in=moved_reports).update(customer=target)
+
+        changed = [field for field in MERGE_FILL_FIELDS if not getattr(target, field)]
+        for field in changed:
+            value = next((getattr(c, field) for c in duplicates if getattr(c, field)), '')
+            setattr(target, field, value)
+        target.save()
+
+        Customer.objects.filter(pk__in=duplicate_ids).update(is_active=False, merged_into=target)
+    return len(duplicate_ids)
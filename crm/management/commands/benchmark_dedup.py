@@ -0,0 +1,99 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+
+HEBREW_LETTERS = 'אבגדהזחטכלמנסעפצקרשת'
+
+
+class Command(BaseCommand):
+    help = (
+        'Time duplicate detection (crm.dedup) over generated customers with known duplicates - reformatted '
+        'phones and emails, spelling variants and word order of names - or over the customers in the database'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=1_000_000)
+        parser.add_argument('--duplicates', type=float, default=0.05, help='Fraction of the records that duplicate another')
+        parser.add_argument('--threshold', type=float, default=0.8)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--database', action='store_true', help='Run find_duplicate_customers on the database instead')
+
+    def handle(self, *args, **options):
+        from crm.dedup import find_duplicate_customers
+
+        if options['database']:
+            start = time.perf_counter()
+            clusters = find_duplicate_customers(threshold=options['threshold'])
+            self.stdout.write(f'{len(clusters)} duplicate groups in {time.perf_counter() - start:.1f}s')
+            return
+        self.benchmark(options)
+
+    def benchmark(self, options):
+        from core.seeding import israeli_id, phone
+        from crm.dedup import DuplicateFinder, _customer_blocking_keys, name_skeleton
+
+        rng = random.Random(options['seed'])
+
+        def surname():
+            return ''.join(rng.choice(HEBREW_LETTERS) for _ in range(rng.randint(3, 7)))
+
+        def variant(name):
+            words = name.split()
+            if rng.random() < 0.5:
+                # Ktiv male, a vav or yod inside the last name
+                last = words[-1]
+                position = rng.randrange(1, len(last))
+                words[-1] = last[:position] + rng.choice('וי') + last[position:]
+            else:
+                words.reverse()
+            return ' '.join(words)
+
+        def unique_id():
+            # A shared id number merges records without a name check, of different people only by mistake
+            while True:
+                id_number = israeli_id(rng)
+                if id_number not in id_numbers:
+                    id_numbers.add(id_number)
+                    return id_number
+
+        # (name, phone, email, id number) of every record, original record of every duplicate
+        records, originals, id_numbers = [], {}, set()
+        for key in range(options['records']):
+            if records and rng.random() < options['duplicates']:
+                original = rng.randrange(len(records))
+                while original in originals:
+                    original = originals[original]
+                name, record_phone, email, id_number = records[original]
+                record_phone = f'+972-{record_phone[1:3]}-{record_phone[3:]}' if rng.random() < 0.5 else record_phone
+                records.append((
+                    variant(name), record_phone, email.upper() if rng.random() < 0.5 else '',
+                    id_number if rng.random() < 0.3 else '',
+                ))
+                originals[key] = original
+            else:
+                records.append((f'{surname()} {surname()}', phone(rng), f'customer{key}@example.com', unique_id()))
+
+        name_skeleton.cache_clear()
+        finder = DuplicateFinder(options['threshold'])
+        start = time.perf_counter()
+        for key, (name, record_phone, email, id_number) in enumerate(records):
+            finder.add(key, name, _customer_blocking_keys(record_phone, '', email, id_number, ''))
+        added = time.perf_counter() - start
+        start = time.perf_counter()
+        clusters = finder.clusters()
+        clustered = time.perf_counter() - start
+
+        cluster_of = {key: index for index, cluster in enumerate(clusters) for key in cluster}
+        found = sum(1 for key, original in originals.items() if key in cluster_of and cluster_of[key] == cluster_of.get(original))
+        # Groups holding records of different people
+        wrong = sum(1 for cluster in clusters if len({originals.get(key, key) for key in cluster}) > 1)
+        self.stdout.write(
+            f'{len(records)} records: keys and names {added:.1f}s, clusters {clustered:.1f}s '
+            f'({len(records) / (added + clustered):,.0f} records/s)'
+        )
+        self.stdout.write(
+            f'{len(clusters)} duplicate groups, {found} of {len(originals)} duplicates found, {wrong} groups mix different people'
+        )
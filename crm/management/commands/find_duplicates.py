@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from crm.models import Contact, Customer
+from sales.models import Lead
+
+
+class Command(BaseCommand):
+    help = 'Find duplicate customers, contacts and leads of existing customers, optionally merge them'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=0.8, help='Minimal name similarity (0-1)')
+        parser.add_argument('--merge', action='store_true', help='Merge the duplicates that were found')
+
+    def handle(self, *args, **options):
+        from crm.dedup import find_duplicate_contacts, find_duplicate_customers, match_leads_to_customers, merge_customers
+
+        threshold = options['threshold']
+        merge = options['merge']
+
+        customer_clusters = find_duplicate_customers(threshold=threshold)
+        self.stdout.write(f'{len(customer_clusters)} duplicate customer groups')
+        if merge:
+            merged = 0
+            for cluster in customer_clusters:
+                customers = list(Customer.objects.filter(pk__in=cluster).order_by('pk'))
+                merged += merge_customers(customers[0], customers[1:])
+            self.stdout.write(f'{merged} customers merged')
+
+        lead_matches = match_leads_to_customers(Lead.active.all(), threshold=threshold)
+        self.stdout.write(f'{len(lead_matches)} leads match an existing customer')
+        if merge:
+            by_customer = {}
+            for lead_pk, customer_pk in lead_matches.items():
+                by_customer.setdefault(customer_pk, []).append(lead_pk)
+            for customer_pk, lead_pks in by_customer.items():
+                Lead.objects.filter(pk__in=lead_pks).update(customer_id=customer_pk)
+
+        contact_clusters = find_duplicate_contacts(threshold=threshold)
+        self.stdout.write(f'{len(contact_clusters)} duplicate contact groups')
+        if merge:
+            # Keep the primary (or oldest) contact of each group
+            duplicate_pks = []
+            for cluster in contact_clusters:
+                keep = Contact.objects.filter(pk__in=cluster).order_by('-is_primary', 'pk').values_list('pk', flat=True)[0]
+                duplicate_pks.extend(pk for pk in cluster if pk != keep)
+            Contact.objects.filter(pk__in=duplicate_pks).update(is_active=False, is_primary=False)
+            self.stdout.write(f'{len(duplicate_pks)} contacts deactivated')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from crm.scorecards import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the installer scorecards from scratch (initial backfill or repair, they are updated incrementally)'
+    requires_system_checks = []
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(f'{count} scorecard rows rebuilt')
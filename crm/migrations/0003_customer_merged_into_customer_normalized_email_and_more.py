@@ -0,0 +1,51 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.utils import normalize_email, normalize_phone
+
+
+def fill_normalized_keys(apps, schema_editor):
+    Customer = apps.get_model('crm', 'Customer')
+    batch = []
+    for customer in Customer.objects.only('phone', 'mobile', 'email').iterator(chunk_size=2000):
+        customer.normalized_phone = normalize_phone(customer.phone)
+        customer.normalized_mobile = normalize_phone(customer.mobile)
+        customer.normalized_email = normalize_email(customer.email)
+        batch.append(customer)
+        if len(batch) == 2000:
+            Customer.objects.bulk_update(batch, ['normalized_phone', 'normalized_mobile', 'normalized_email'])
+            batch = []
+    Customer.objects.bulk_update(batch, ['normalized_phone', 'normalized_mobile', 'normalized_email'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0002_alter_contact_options_remove_contact_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='merged_into',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='merged_customers', to='crm.customer', verbose_name='מוזג אל'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='normalized_email',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='normalized_mobile',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='normalized_phone',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20),
+        ),
+        migrations.RunPython(fill_normalized_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0003_customer_merged_into_customer_normalized_email_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstallerScorecard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('month', models.DateField(verbose_name='חודש')),
+                ('systems_installed', models.IntegerField(default=0, verbose_name='מערכות שהותקנו')),
+                ('installed_capacity', models.FloatField(default=0, verbose_name='הספק שהותקן (kWp)')),
+                ('energy_kwh', models.FloatField(default=0, verbose_name='ייצור (kWh)')),
+                ('expected_kwh', models.FloatField(default=0, verbose_name='ייצור צפוי (kWh)')),
+                ('alert_count', models.IntegerField(default=0, verbose_name='התראות')),
+                ('tickets_resolved', models.IntegerField(default=0, verbose_name='קריאות שנפתרו')),
+                ('resolution_hours', models.FloatField(default=0, verbose_name='סה"כ שעות טיפול')),
+                ('referred_leads', models.IntegerField(default=0, verbose_name='לידים שהופנו')),
+                ('converted_leads', models.IntegerField(default=0, verbose_name='לידים שהומרו')),
+                ('installer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scorecards', to='crm.installer', verbose_name='מתקין')),
+            ],
+            options={
+                'verbose_name': 'כרטיס ביצועי מתקין',
+                'verbose_name_plural': 'כרטיסי ביצועי מתקינים',
+                'ordering': ['-month'],
+                'constraints': [models.UniqueConstraint(fields=('installer', 'month'), name='installer_scorecard_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0004_installerscorecard'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['created_at', 'id'], name='customer_created_idx'),
+        ),
+    ]
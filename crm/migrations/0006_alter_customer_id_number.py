@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:58
+
+import core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0005_customer_customer_created_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='id_number',
+            field=models.CharField(blank=True, max_length=9, validators=[core.validators.IsraeliIdValidator()], verbose_name='תעודת זהות'),
+        ),
+    ]
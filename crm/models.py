@@ -1,8 +1,13 @@
+from datetime import timedelta
+
 from django.db import models
-from core.models import ActiveModel, AddressMixin
+from django.db.models import FloatField, Q, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+from core.models import ActiveModel, ActiveManager, AddressMixin, BaseModel, ChangeFeedQuerySet
 from core.constants import CustomerType, SupplierType
 from core.validators import phone_validator, israeli_id_validator
-from core.utils import generate_unique_number
+from core.utils import generate_unique_number, normalize_email, normalize_phone
 
 
 class Customer(ActiveModel, AddressMixin):
@@ -48,22 +53,76 @@ class Customer(ActiveModel, AddressMixin):
 
     notes = models.TextField(blank=True, verbose_name='הערות')
 
+    # Normalized blocking keys for duplicate lookups
+    normalized_phone = models.CharField(max_length=20, blank=True, db_index=True, editable=False)
+    normalized_mobile = models.CharField(max_length=20, blank=True, db_index=True, editable=False)
+    normalized_email = models.CharField(max_length=254, blank=True, db_index=True, editable=False)
+
+    merged_into = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='merged_customers',
+        verbose_name='מוזג אל'
+    )
+
+    objects = ChangeFeedQuerySet.as_manager()
+    active = ActiveManager.from_queryset(ChangeFeedQuerySet)()
+
     class Meta:
         verbose_name = 'לקוח'
         verbose_name_plural = 'לקוחות'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the changelist (core.pagination)
+            models.Index(fields=['created_at', 'id'], name='customer_created_idx'),
+        ]
 
     def __str__(self):
         if self.customer_type == CustomerType.BUSINESS:
-            return f'{self.customer_number} | {self.company_bane}'
+            return f'{self.customer_number} | {self.company_name}'
         return f'{self.customer_number} | {self.name}'
 
     def save(self, *args, **kwargs):
         """ Adding customer number on save """
         if not self.customer_number:
             self.customer_number = generate_unique_number('CUS', Customer, 'customer_number')
+        self.normalized_phone = normalize_phone(self.phone)
+        self.normalized_mobile = normalize_phone(self.mobile)
+        self.normalized_email = normalize_email(self.email)
         super().save(*args, **kwargs)
 
+    @classmethod
+    def find_match(cls, name='', phone='', email='', id_number=''):
+        """
+        Return an existing active customer that is the same person, or None.
+        Uses the indexed normalized keys and confirms phone / email matches by name similarity.
+        """
+        from .dedup import name_similarity, name_skeleton
+
+        if id_number:
+            customer = cls.active.filter(id_number=id_number).order_by('pk').first()
+            if customer:
+                return customer
+
+        phone = normalize_phone(phone)
+        email = normalize_email(email)
+        lookups = models.Q()
+        if phone:
+            lookups |= models.Q(normalized_phone=phone) | models.Q(normalized_mobile=phone)
+        if email:
+            lookups |= models.Q(normalized_email=email)
+        if not lookups:
+            return None
+
+        skeleton = name_skeleton(name)
+        for customer in cls.active.filter(lookups).order_by('pk')[:20]:
+            if name_similarity(skeleton, name_skeleton(customer.display_name)) >= 0.8:
+                return customer
+        return None
+
 
     @property
     def display_name(self):
@@ -73,6 +132,43 @@ class Customer(ActiveModel, AddressMixin):
 
 
 
+class InstallerQuerySet(models.QuerySet):
+
+    def with_scorecard(self, months=12, today=None):
+        """
+        Annotate the scorecard of the last months from the monthly rollup rows - a single
+        grouped join on InstallerScorecard, no matter how many sites / alerts / tickets exist.
+        Ratios are None when there is nothing to divide by.
+        """
+        month = (today or timezone.localdate()).replace(day=1)
+        for _ in range(months - 1):
+            month = (month - timedelta(days=1)).replace(day=1)
+        recent = Q(scorecards__month__gte=month)
+
+        def total(field, **kwargs):
+            return Coalesce(Sum(f'scorecards__{field}', **kwargs), 0, output_field=FloatField())
+
+        def ratio(numerator, denominator):
+            return Cast(numerator, FloatField()) / NullIf(denominator, 0, output_field=FloatField())
+
+        return self.annotate(
+            fleet_size=total('systems_installed'),
+            recent_installs=total('systems_installed', filter=recent),
+            recent_energy=total('energy_kwh', filter=recent),
+            recent_expected=total('expected_kwh', filter=recent),
+            recent_alerts=total('alert_count', filter=recent),
+            recent_resolved=total('tickets_resolved', filter=recent),
+            recent_resolution_hours=total('resolution_hours', filter=recent),
+            recent_referred=total('referred_leads', filter=recent),
+            recent_converted=total('converted_leads', filter=recent),
+        ).annotate(
+            performance_ratio=ratio('recent_energy', 'recent_expected'),
+            alert_rate=ratio('recent_alerts', 'fleet_size'),
+            avg_resolution_hours=ratio('recent_resolution_hours', 'recent_resolved'),
+            conversion_rate=ratio('recent_converted', 'recent_referred'),
+        )
+
+
 class Installer(ActiveModel, AddressMixin):
     """
     Installing company or person
@@ -89,6 +185,9 @@ class Installer(ActiveModel, AddressMixin):
     license_number = models.CharField(max_length=50, blank=True, verbose_name='מספר רישיון')
     notes = models.TextField(blank=True, verbose_name='הערות')
 
+    objects = InstallerQuerySet.as_manager()
+    active = ActiveManager.from_queryset(InstallerQuerySet)()
+
     class Meta:
         verbose_name = 'מתקין'
         verbose_name_plural = 'מתקינים'
@@ -98,6 +197,52 @@ class Installer(ActiveModel, AddressMixin):
         return self.company_name
 
 
+class InstallerScorecard(BaseModel):
+    """
+    Monthly rollup of an installer performance, maintained incrementally by crm.scorecards
+    """
+    installer = models.ForeignKey(
+        Installer,
+        on_delete=models.CASCADE,
+        related_name='scorecards',
+        verbose_name='מתקין'
+    )
+    month = models.DateField(verbose_name='חודש')
+
+    systems_installed = models.IntegerField(default=0, verbose_name='מערכות שהותקנו')
+    installed_capacity = models.FloatField(default=0, verbose_name='הספק שהותקן (kWp)')
+    energy_kwh = models.FloatField(default=0, verbose_name='ייצור (kWh)')
+    expected_kwh = models.FloatField(default=0, verbose_name='ייצור צפוי (kWh)')
+    alert_count = models.IntegerField(default=0, verbose_name='התראות')
+    tickets_resolved = models.IntegerField(default=0, verbose_name='קריאות שנפתרו')
+    resolution_hours = models.FloatField(default=0, verbose_name='סה"כ שעות טיפול')
+    referred_leads = models.IntegerField(default=0, verbose_name='לידים שהופנו')
+    converted_leads = models.IntegerField(default=0, verbose_name='לידים שהומרו')
+
+    class Meta:
+        verbose_name = 'כרטיס ביצועי מתקין'
+        verbose_name_plural = 'כרטיסי ביצועי מתקינים'
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(fields=['installer', 'month'], name='installer_scorecard_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.installer_id} | {self.month:%m/%Y}'
+
+    @property
+    def performance_ratio(self):
+        return self.energy_kwh / self.expected_kwh if self.expected_kwh else None
+
+    @property
+    def avg_resolution_hours(self):
+        return self.resolution_hours / self.tickets_resolved if self.tickets_resolved else None
+
+    @property
+    def conversion_rate(self):
+        return self.converted_leads / self.referred_leads if self.referred_leads else None
+
+
 
 class Supplier(ActiveModel, AddressMixin):
     """
@@ -173,6 +318,9 @@ class Contact(ActiveModel):
     )
     is_primary = models.BooleanField(default=False, verbose_name='איש קשר ראשי')
 
+    objects = ChangeFeedQuerySet.as_manager()
+    active = ActiveManager.from_queryset(ChangeFeedQuerySet)()
+
     class Meta:
         verbose_name = 'איש קשר'
         verbose_name_plural = 'אנשי קשר'
@@ -0,0 +1,147 @@
+"""
+Installer scorecards.
+
+Every installer has an InstallerScorecard row per month with counters that are incremented as
+events happen - a site installed, an alert raised, a ticket resolved, a referred lead created or
+converted, a day of production rolled up. Reports read these rows instead of joining sites,
+alerts, tickets and leads of the whole fleet.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import InstallerScorecard
+
+
+def month_of(value):
+    """ First day of the (local) month of a date or datetime """
+    if isinstance(value, datetime):
+        value = timezone.localdate(value)
+    return date(value.year, value.month, 1)
+
+
+def record(installer_id, when, **deltas):
+    """ Add deltas (field=amount) to the scorecard of an installer for the month of when """
+    if installer_id and when:
+        record_many({(installer_id, month_of(when)): deltas})
+
+
+def record_many(deltas):
+    """
+    Apply many increments at once.
+    deltas - {(installer_id, month): {field: amount}}
+    """
+    now = timezone.now()
+    for (installer_id, month), changes in deltas.items():
+        changes = {field: amount for field, amount in changes.items() if amount}
+        if not installer_id or not changes:
+            continue
+        rows = InstallerScorecard.objects.filter(installer_id=installer_id, month=month)
+        increments = {field: F(field) + amount for field, amount in changes.items()}
+        if rows.update(**increments, updated_at=now):
+            continue
+        try:
+            with transaction.atomic():
+                InstallerScorecard.objects.create(installer_id=installer_id, month=month, **changes)
+        except IntegrityError:
+            # Created concurrently by another event
+            rows.update(**increments, updated_at=now)
+
+
+class Deltas(defaultdict):
+    """ Accumulates increments for record_many """
+
+    def __init__(self):
+        super().__init__(lambda: defaultdict(int))
+
+    def add(self, installer_id, when, **changes):
+        if installer_id and when:
+            for field, amount in changes.items():
+                self[(installer_id, month_of(when))][field] += amount
+
+
+def site_deltas(deltas, state, sign):
+    """ state - (installer_id, installation_date, installed_capacity) of a site """
+    installer_id, installation_date, capacity = state
+    deltas.add(installer_id, installation_date, systems_installed=sign, installed_capacity=sign * float(capacity or 0))
+
+
+def lead_deltas(deltas, state, created_at, sign):
+    """ state - (referred_by_installer_id, is_won) of a lead, counted in the month the lead came in """
+    installer_id, is_won = state
+    deltas.add(installer_id, created_at, referred_leads=sign, converted_leads=sign * int(is_won))
+
+
+def ticket_deltas(deltas, state, sign):
+    """ state - (installer_id, created_at, resolved_at) of a ticket, counted in the month it was resolved """
+    installer_id, created_at, resolved_at = state
+    hours = (resolved_at - created_at).total_seconds() / 3600
+    deltas.add(installer_id, resolved_at, tickets_resolved=sign, resolution_hours=sign * hours)
+
+
+def record_resolved_tickets(tickets, reopened=()):
+    """
+    tickets - iterable of (installer_id, created_at, resolved_at) of resolved tickets
+    reopened - the same of tickets whose resolution was taken back, so a ticket counts once
+    """
+    deltas = Deltas()
+    for state in reopened:
+        ticket_deltas(deltas, state, -1)
+    for state in tickets:
+        ticket_deltas(deltas, state, 1)
+    record_many(deltas)
+
+
+def rebuild():
+    """
+    Recompute all scorecards from the source tables.
+    A one-off for the initial backfill or a repair - the rows are kept up to date incrementally.
+    returns the number of scorecard rows
+    """
+    from django.db.models import Count, Q, Sum
+    from django.db.models.functions import TruncMonth
+    from alerts.models import Alert
+    from core.constants import LeadStatus
+    from monitoring.models import DailyProduction
+    from sales.models import Lead
+    from solar.models import Site
+    from tickets.models import Ticket
+
+    deltas = Deltas()
+
+    sites = Site.objects.filter(installer__isnull=False, installation_date__isnull=False)
+    for row in sites.values('installer_id', month=TruncMonth('installation_date')).annotate(
+        count=Count('pk'), capacity=Sum('installed_capacity')
+    ).order_by():
+        deltas.add(row['installer_id'], row['month'], systems_installed=row['count'], installed_capacity=float(row['capacity'] or 0))
+
+    production = DailyProduction.objects.filter(site__installer__isnull=False, expected_kwh__isnull=False)
+    for row in production.values('site__installer_id', month=TruncMonth('date')).annotate(
+        energy=Sum('energy_kwh'), expected=Sum('expected_kwh')
+    ).order_by():
+        deltas.add(row['site__installer_id'], row['month'], energy_kwh=row['energy'], expected_kwh=row['expected'])
+
+    alerts = Alert.objects.filter(site__installer__isnull=False)
+    for row in alerts.values('site__installer_id', month=TruncMonth('created_at')).annotate(count=Count('pk')).order_by():
+        deltas.add(row['site__installer_id'], row['month'], alert_count=row['count'])
+
+    tickets = Ticket.objects.filter(installer__isnull=False, resolved_at__isnull=False)
+    for state in tickets.values_list('installer_id', 'created_at', 'resolved_at').iterator():
+        ticket_deltas(deltas, state, 1)
+
+    leads = Lead.objects.filter(referred_by_installer__isnull=False)
+    for row in leads.values('referred_by_installer_id', month=TruncMonth('created_at')).annotate(
+        count=Count('pk'), converted=Count('pk', filter=Q(status=LeadStatus.WON))
+    ).order_by():
+        deltas.add(row['referred_by_installer_id'], row['month'], referred_leads=row['count'], converted_leads=row['converted'])
+
+    scorecards = [
+        InstallerScorecard(installer_id=installer_id, month=month, **changes)
+        for (installer_id, month), changes in deltas.items()
+    ]
+    with transaction.atomic():
+        InstallerScorecard.objects.all().delete()
+        InstallerScorecard.objects.bulk_create(scorecards, batch_size=1000)
+    return len(scorecards)
@@ -0,0 +1,125 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from core.constants import LeadStatus
+from .scorecards import Deltas, lead_deltas, record, record_many, site_deltas, ticket_deltas
+
+
+def _loaded(instance, *fields):
+    """ Values of fields as loaded, None when one of them is deferred (reading it would query) """
+    values = tuple(instance.__dict__.get(field, _loaded) for field in fields)
+    return None if _loaded in values else values
+
+
+# Sites count in the month they were installed
+
+@receiver(post_init, sender='solar.Site')
+def site_loaded(sender, instance, **kwargs):
+    instance._scorecard_state = _site_state(instance)
+
+
+def _site_state(site):
+    state = _loaded(site, 'installer_id', 'installation_date', 'installed_capacity')
+    if state is None:
+        return None
+    return state if state[0] and state[1] else ()
+
+
+@receiver(post_save, sender='solar.Site')
+def site_saved(sender, instance, created, **kwargs):
+    old = () if created else getattr(instance, '_scorecard_state', None)
+    new = _site_state(instance)
+    if old is None or new is None or old == new:
+        return
+    deltas = Deltas()
+    if old:
+        site_deltas(deltas, old, -1)
+    if new:
+        site_deltas(deltas, new, 1)
+    record_many(deltas)
+    instance._scorecard_state = new
+
+
+@receiver(post_delete, sender='solar.Site')
+def site_deleted(sender, instance, **kwargs):
+    if getattr(instance, '_scorecard_state', None):
+        deltas = Deltas()
+        site_deltas(deltas, instance._scorecard_state, -1)
+        record_many(deltas)
+
+
+# Referred leads count in the month the lead came in
+
+@receiver(post_init, sender='sales.Lead')
+def lead_loaded(sender, instance, **kwargs):
+    instance._scorecard_state = _lead_state(instance)
+
+
+def _lead_state(lead):
+    state = _loaded(lead, 'referred_by_installer_id', 'status')
+    if state is None:
+        return None
+    return (state[0], state[1] == LeadStatus.WON) if state[0] else ()
+
+
+@receiver(post_save, sender='sales.Lead')
+def lead_saved(sender, instance, created, **kwargs):
+    old = () if created else getattr(instance, '_scorecard_state', None)
+    new = _lead_state(instance)
+    if old is None or new is None or old == new:
+        return
+    deltas = Deltas()
+    if old:
+        lead_deltas(deltas, old, instance.created_at, -1)
+    if new:
+        lead_deltas(deltas, new, instance.created_at, 1)
+    record_many(deltas)
+    instance._scorecard_state = new
+
+
+# Alerts count in the month they were raised
+
+@receiver(post_save, sender='alerts.Alert')
+def alert_saved(sender, instance, created, **kwargs):
+    if created:
+        from solar.models import Site
+
+        installer_id = Site.objects.filter(pk=instance.site_id).values_list('installer_id', flat=True).first()
+        record(installer_id, instance.created_at, alert_count=1)
+
+
+# Tickets count once, in the month they were resolved - a reopened ticket is taken back.
+# Bulk transitions are recorded by TicketQuerySet
+
+@receiver(post_init, sender='tickets.Ticket')
+def ticket_loaded(sender, instance, **kwargs):
+    instance._scorecard_state = _ticket_state(instance)
+
+
+def _ticket_state(ticket):
+    state = _loaded(ticket, 'installer_id', 'created_at', 'resolved_at')
+    if state is None:
+        return None
+    return state if state[0] and state[2] else ()
+
+
+@receiver(post_save, sender='tickets.Ticket')
+def ticket_saved(sender, instance, created, **kwargs):
+    old = () if created else getattr(instance, '_scorecard_state', None)
+    new = _ticket_state(instance)
+    if old is None or new is None or old == new:
+        return
+    deltas = Deltas()
+    if old:
+        ticket_deltas(deltas, old, -1)
+    if new:
+        ticket_deltas(deltas, new, 1)
+    record_many(deltas)
+    instance._scorecard_state = new
+
+
+@receiver(post_delete, sender='tickets.Ticket')
+def ticket_deleted(sender, instance, **kwargs):
+    if getattr(instance, '_scorecard_state', None):
+        deltas = Deltas()
+        ticket_deltas(deltas, instance._scorecard_state, -1)
+        record_many(deltas)
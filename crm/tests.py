@@ -1,3 +1,63 @@
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from alerts.models import Alert
+from sales.models import Contract, Lead
+from solar.models import Site
+from tickets.models import Ticket
+from .customer360 import Customer360
+from .models import Contact, Customer, Installer
+
+
+class Customer360QueryCountTest(TestCase):
+    """ The customer 360 view loads in a fixed number of queries, whatever the customer has """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        installer = Installer.objects.create(company_name='מתקין')
+        cls.small = cls.customer_with(1, installer)
+        cls.large = cls.customer_with(4, installer)
+
+    @staticmethod
+    def customer_with(count, installer):
+        customer = Customer.objects.create(name=f'לקוח {count}')
+        for i in range(count):
+            Contact.objects.create(customer=customer, first_name='איש', last_name=f'קשר {i}')
+            Lead.objects.create(customer=customer, contact_name=f'ליד {i}', phone='0501234567')
+            Contract.objects.create(customer=customer, start_date=date(2024, 1, 1), value=1000)
+            site = Site.objects.create(customer=customer, installer=installer, city='תל אביב', latitude=32.08, longitude=34.78)
+            alert = Alert.objects.create(site=site, customer=customer, title=f'התראה {i}')
+            Ticket.objects.create(customer=customer, site=site, alert=alert, title=f'קריאה {i}')
+        return customer
+
+    def test_load(self):
+        for customer in (self.small, self.large):
+            with self.assertNumQueries(7):
+                customer360 = Customer360.load(customer.pk)
+                # The related rows the template shows come with their prefetch
+                for site in customer360.sites:
+                    str(site.installer)
+                for alert in customer360.open_alerts:
+                    alert.site.site_number
+                for ticket in customer360.open_tickets:
+                    str(ticket.assigned_to)
+                for lead in customer360.leads:
+                    str(lead.assigned_to)
+            self.assertEqual(len(customer360.contacts), customer.contacts.count())
+            self.assertEqual(customer360.open_ticket_count, len(customer360.open_tickets))
 
-# Create your tests here.
+    def test_view(self):
+        self.client.force_login(self.user)
+        # The first request also loads the user's access, cached for the later ones
+        self.client.get(reverse('admin:crm_customer_360', args=[self.small.pk]))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:crm_customer_360', args=[self.small.pk]))
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(reverse('admin:crm_customer_360', args=[self.large.pk]))
+        self.assertEqual(response.status_code, 200)
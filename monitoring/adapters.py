@@ -0,0 +1,181 @@
+"""
+Manufacturer API adapters.
+
+Vendor responses carry per-interval readings of many inverters and run to many megabytes. An
+adapter parses a response incrementally (with ijson when it is installed) straight into columnar
+buffers - typed arrays of timestamps and values per inverter - and store_readings() upserts the
+columns without building model instances. Malformed responses raise APIResponseException.
+"""
+import json
+import math
+from array import array
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.db import connections, transaction
+from core.exeptions import APIAdapterException, APIResponseException
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+PARSE_ERRORS = (ValueError, KeyError, TypeError) + ((ijson.JSONError,) if ijson else ())
+
+
+class InverterColumns:
+    """ Readings of one inverter - timestamps as epoch seconds, energy is NaN when not reported """
+    __slots__ = ('timestamps', 'power', 'energy')
+
+    def __init__(self):
+        self.timestamps = array('d')
+        self.power = array('d')
+        self.energy = array('d')
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def arrays(self):
+        """ (timestamps, power, energy) as numpy arrays over the buffers, without copying """
+        return tuple(np.frombuffer(column, dtype=np.float64) for column in (self.timestamps, self.power, self.energy))
+
+
+class ReadingColumns(dict):
+    """ {inverter serial: InverterColumns} of a response """
+
+    def __missing__(self, serial):
+        columns = self[serial] = InverterColumns()
+        return columns
+
+    @property
+    def count(self):
+        return sum(len(columns) for columns in self.values())
+
+
+class BaseAdapter:
+    """
+    A manufacturer API, subclasses fetch responses and describe their layout:
+        {"inverters": [{"serial": ..., "readings": [{"timestamp": ..., "power": ..., "energy": ...}]}]}
+    Timestamps are ISO 8601 or epoch seconds, naive ones are in the adapter timezone.
+    """
+    inverters_path = 'inverters.item'
+    serial_key = 'serial'
+    readings_key = 'readings'
+    time_key = 'timestamp'
+    power_key = 'power'
+    energy_key = 'energy'
+    timezone = dt_timezone.utc
+
+    def open_readings(self, site, start, end):
+        """ The raw readings response of a site for a period, as a binary file-like object """
+        raise NotImplementedError
+
+    def iter_inverters(self, stream):
+        """ Inverter records of a response, one at a time when ijson is installed """
+        try:
+            if ijson is not None:
+                yield from ijson.items(stream, self.inverters_path, use_float=True)
+                return
+            data = json.load(stream)
+            for key in self.inverters_path.split('.')[:-1]:
+                data = data[key]
+            yield from data
+        except PARSE_ERRORS as e:
+            raise APIResponseException(f'{type(self).__name__}: malformed response: {e}') from e
+
+    def parse_time(self, value):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        moment = datetime.fromisoformat(value)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=self.timezone)
+        return moment.timestamp()
+
+    def parse(self, stream):
+        """ returns ReadingColumns of a response """
+        columns = ReadingColumns()
+        time_key, power_key, energy_key = self.time_key, self.power_key, self.energy_key
+        for inverter in self.iter_inverters(stream):
+            try:
+                serial = str(inverter[self.serial_key])
+                readings = inverter[self.readings_key]
+            except (KeyError, TypeError) as e:
+                raise APIResponseException(f'{type(self).__name__}: inverter without {e}') from e
+
+            target = columns[serial]
+            append_time, append_power, append_energy = target.timestamps.append, target.power.append, target.energy.append
+            for index, reading in enumerate(readings):
+                try:
+                    timestamp = self.parse_time(reading[time_key])
+                    power = float(reading[power_key])
+                    energy = reading.get(energy_key)
+                    energy = math.nan if energy is None else float(energy)
+                except (KeyError, TypeError, ValueError, AttributeError) as e:
+                    raise APIResponseException(
+                        f'{type(self).__name__}: inverter {serial} reading {index} is malformed: {e!r}'
+                    ) from e
+                if not math.isfinite(power):
+                    raise APIResponseException(f'{type(self).__name__}: inverter {serial} reading {index} has no power')
+                append_time(timestamp)
+                append_power(power)
+                append_energy(energy)
+        return columns
+
+
+class JSONReadingsAdapter(BaseAdapter):
+    """ Responses in the default layout, e.g. exported files """
+
+
+ADAPTERS = {
+    'json': JSONReadingsAdapter,
+}
+
+
+def get_adapter(name):
+    try:
+        return ADAPTERS[name]()
+    except KeyError:
+        raise APIAdapterException(f'Unknown adapter: {name}')
+
+
+def store_readings(site_id, columns, using='default', chunk_size=5000):
+    """
+    Upsert the readings of a site from ReadingColumns, a reading already stored for the same
+    inverter and timestamp is overwritten.
+    returns the number of readings written
+    """
+    from .models import Reading
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    adapt = connection.ops.adapt_datetimefield_value
+    sql = (
+        f'INSERT INTO {quote(Reading._meta.db_table)} '
+        f'({quote("site_id")}, {quote("inverter_serial")}, {quote("timestamp")}, {quote("power_w")}, {quote("energy_wh")}) '
+        'VALUES (%s, %s, %s, %s, %s) '
+        f'ON CONFLICT ({quote("site_id")}, {quote("inverter_serial")}, {quote("timestamp")}) '
+        f'DO UPDATE SET {quote("power_w")} = excluded.{quote("power_w")}, {quote("energy_wh")} = excluded.{quote("energy_wh")}'
+    )
+
+    def rows():
+        utc = dt_timezone.utc
+        for serial, inverter in columns.items():
+            for timestamp, power, energy in zip(inverter.timestamps, inverter.power, inverter.energy):
+                yield (
+                    site_id, serial, adapt(datetime.fromtimestamp(timestamp, utc)), power,
+                    None if math.isnan(energy) else energy,
+                )
+
+    written = 0
+    chunk = []
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        for row in rows():
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                cursor.executemany(sql, chunk)
+                written += len(chunk)
+                chunk = []
+        if chunk:
+            cursor.executemany(sql, chunk)
+            written += len(chunk)
+    return written
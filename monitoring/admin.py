@@ -1,3 +1,52 @@
 from django.contrib import admin
+from .models import AnomalyRun, DailyProduction, ReadingArchive, SyncLease, SyncMetric, SyncNode
 
-# Register your models here.
+
+@admin.register(DailyProduction)
+class DailyProductionAdmin(admin.ModelAdmin):
+    list_display = ['site', 'date', 'energy_kwh', 'expected_kwh', 'peak_power_kw', 'reading_count']
+    list_filter = ['date']
+    search_fields = ['site__site_number']
+    raw_id_fields = ['site']
+    date_hierarchy = 'date'
+
+
+@admin.register(AnomalyRun)
+class AnomalyRunAdmin(admin.ModelAdmin):
+    list_display = ['date', 'alerts_created', 'finished_at']
+    readonly_fields = ['chunks', 'completed_chunks', 'alerts_created', 'finished_at', 'created_at', 'updated_at']
+
+
+@admin.register(ReadingArchive)
+class ReadingArchiveAdmin(admin.ModelAdmin):
+    list_display = ['site', 'month', 'row_count', 'inverter_count', 'size_bytes']
+    list_filter = ['month']
+    search_fields = ['site__site_number']
+    raw_id_fields = ['site']
+    readonly_fields = ['site', 'month', 'path', 'row_count', 'inverter_count', 'size_bytes', 'created_at', 'updated_at']
+
+
+@admin.register(SyncMetric)
+class SyncMetricAdmin(admin.ModelAdmin):
+    list_display = ['vendor', 'recorded_at', 'requests', 'errors', 'records', 'busy_seconds']
+    list_filter = ['vendor']
+    date_hierarchy = 'recorded_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SyncNode)
+class SyncNodeAdmin(admin.ModelAdmin):
+    list_display = ['name', 'started_at', 'heartbeat_at']
+    readonly_fields = ['name', 'started_at', 'heartbeat_at']
+
+
+@admin.register(SyncLease)
+class SyncLeaseAdmin(admin.ModelAdmin):
+    list_display = ['partition', 'node', 'expires_at', 'epoch']
+    list_filter = ['node']
+    readonly_fields = ['partition', 'node', 'expires_at', 'epoch']
@@ -0,0 +1,280 @@
+"""
+Nightly fleet anomaly detection.
+
+Sites are split into primary key ranges that are processed in a process pool. Each worker streams
+the daily rollups of its range and compares every site with its neighbours (same city, or same
+installer for small cities) day by day, which removes weather and season from the comparison.
+The parent raises the alerts and checkpoints every finished range in AnomalyRun, so an
+interrupted run resumes where it stopped.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from itertools import groupby
+from multiprocessing import get_context
+from typing import NamedTuple
+
+import numpy as np
+from django.db import connections, transaction
+from django.db.models import Avg, Count, F, FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+from core.constants import AlertPriority
+
+
+HISTORY_DAYS = 90
+MIN_HISTORY_DAYS = 14
+MIN_GROUP_SIZE = 3
+
+# Thresholds on the production of a site relative to its neighbours
+UNDERPERFORMANCE_RATIO = 0.6
+STRING_FAILURE_STEP = (0.5, 0.9)
+SOILING_SLOPE_PER_DAY = -0.005
+DEGRADATION_SLOPE_PER_DAY = -0.0005
+
+ANOMALY_KINDS = {
+    'no_production': ('אין ייצור', AlertPriority.CRITICAL),
+    'underperformance': ('תפוקה נמוכה ביחס למערכות סמוכות', AlertPriority.HIGH),
+    'string_failure': ('חשד לתקלת סטרינג', AlertPriority.HIGH),
+    'soiling': ('חשד להצטברות לכלוך', AlertPriority.LOW),
+    'degradation': ('מגמת ירידה בתפוקה', AlertPriority.MEDIUM),
+}
+
+
+class Finding(NamedTuple):
+    site_id: int
+    customer_id: int
+    installer_id: int
+    kind: str
+    description: str
+
+
+def neighbour_references(day):
+    """
+    Average performance ratio per city and per installer for every day of the history window.
+    Computed by the database in one pass per grouping, shared with all workers.
+    returns {('city', name) / ('installer', id): {date ordinal: average ratio}}
+    """
+    from .models import DailyProduction
+
+    rows = DailyProduction.objects.filter(
+        date__gt=day - timedelta(days=HISTORY_DAYS), date__lte=day, expected_kwh__gt=0, site__is_active=True,
+    ).annotate(ratio=F('energy_kwh') / Cast('expected_kwh', FloatField()))
+
+    references = {}
+    for group, field in (('city', 'site__city'), ('installer', 'site__installer_id')):
+        for row in rows.values('date', field).annotate(average=Avg('ratio'), sites=Count('site')).order_by():
+            if row[field] in ('', None) or row['sites'] < MIN_GROUP_SIZE:
+                continue
+            references.setdefault((group, row[field]), {})[row['date'].toordinal()] = row['average']
+    return references
+
+
+def _slope(values):
+    """ Least squares slope per day """
+    if len(values) < MIN_HISTORY_DAYS:
+        return 0.0
+    x = np.arange(len(values), dtype=np.float64)
+    return float(np.polyfit(x, values, 1)[0])
+
+
+def analyze_site(site_id, customer_id, installer_id, ordinals, energy, expected, reference, day):
+    """
+    Findings for one site.
+    ordinals / energy / expected - the daily rollups of the history window, oldest first
+    reference - {date ordinal: neighbours average ratio}, may be empty
+    A site with history but no rollup for day stopped reporting, it is a no_production finding.
+    """
+    today = day.toordinal()
+    if not len(ordinals):
+        return []
+    if ordinals[-1] != today:
+        return [Finding(site_id, customer_id, installer_id, 'no_production', f'לא התקבלו נתוני ייצור בתאריך {day:%d/%m/%Y}')]
+
+    if energy[-1] <= 0:
+        return [Finding(site_id, customer_id, installer_id, 'no_production', f'לא נרשם ייצור בתאריך {day:%d/%m/%Y}')]
+
+    ratio = energy / expected
+    if reference:
+        neighbours = np.array([reference.get(o, np.nan) for o in ordinals])
+        relative = ratio / neighbours
+    else:
+        relative = ratio / np.median(ratio)
+    known = ~np.isnan(relative)
+    ordinals, relative = ordinals[known], relative[known]
+    if len(relative) < MIN_HISTORY_DAYS or ordinals[-1] != today:
+        return []
+
+    findings = []
+    recent = relative[-3:]
+    baseline = np.median(relative[:-3])
+    step = np.median(recent) / baseline if baseline > 0 else 1.0
+    # A step needs the week before it at the usual level, otherwise the decline is gradual
+    before_step = np.median(relative[-10:-3]) / baseline if baseline > 0 else 1.0
+
+    if (
+        STRING_FAILURE_STEP[0] <= step <= STRING_FAILURE_STEP[1]
+        and before_step > 0.95
+        and recent.max() / max(recent.min(), 1e-6) < 1.15
+    ):
+        # A steady drop by a fixed share of the output - some strings stopped producing
+        findings.append(Finding(site_id, customer_id, installer_id, 'string_failure', f'ירידה קבועה של {1 - step:.0%} ב-3 הימים האחרונים'))
+    elif relative[-1] < UNDERPERFORMANCE_RATIO:
+        findings.append(Finding(site_id, customer_id, installer_id, 'underperformance', f'ייצור של {relative[-1]:.0%} מהמערכות הסמוכות'))
+    else:
+        monthly_slope = _slope(relative[ordinals > today - 30])
+        if monthly_slope < SOILING_SLOPE_PER_DAY:
+            findings.append(Finding(site_id, customer_id, installer_id, 'soiling', f'ירידה הדרגתית של {-monthly_slope * 30:.0%} בחודש האחרון'))
+        elif _slope(relative) < DEGRADATION_SLOPE_PER_DAY:
+            findings.append(Finding(site_id, customer_id, installer_id, 'degradation', f'ירידה מתמשכת ב-{HISTORY_DAYS} הימים האחרונים'))
+    return findings
+
+
+_references = {}
+
+
+def _init_worker(references):
+    import django
+    from django.apps import apps
+
+    # Workers are spawned, set Django up in each of them
+    if not apps.ready:
+        django.setup()
+    global _references
+    _references = references
+
+
+def process_chunk(first_pk, last_pk, day_ordinal):
+    """ Analyze the sites with first_pk <= pk <= last_pk, streaming their rollups from the DB """
+    from solar.models import Site
+    from .models import DailyProduction
+
+    day = date.fromordinal(day_ordinal)
+    sites = {
+        pk: (customer_id, city, installer_id)
+        for pk, customer_id, city, installer_id in Site.active.filter(pk__gte=first_pk, pk__lte=last_pk)
+        .values_list('pk', 'customer_id', 'city', 'installer_id')
+    }
+    rows = DailyProduction.objects.filter(
+        site_id__gte=first_pk, site_id__lte=last_pk,
+        date__gt=day - timedelta(days=HISTORY_DAYS), date__lte=day, expected_kwh__gt=0,
+    ).order_by('site_id', 'date').values_list('site_id', 'date', 'energy_kwh', 'expected_kwh')
+
+    findings = []
+    for site_id, site_rows in groupby(rows.iterator(chunk_size=10_000), key=lambda row: row[0]):
+        if site_id not in sites:
+            continue
+        customer_id, city, installer_id = sites[site_id]
+        reference = _references.get(('city', city)) or _references.get(('installer', installer_id)) or {}
+        _, dates, energy, expected = zip(*site_rows)
+        findings.extend(analyze_site(
+            site_id,
+            customer_id,
+            installer_id,
+            np.array([d.toordinal() for d in dates]),
+            np.array(energy, dtype=np.float64),
+            np.array(expected, dtype=np.float64),
+            reference,
+            day,
+        ))
+    return first_pk, findings
+
+
+def site_chunks(chunk_size):
+    """ (first pk, last pk) ranges of about chunk_size active sites """
+    from solar.models import Site
+
+    pks = list(Site.active.order_by('pk').values_list('pk', flat=True))
+    return [(pks[i], pks[min(i + chunk_size, len(pks)) - 1]) for i in range(0, len(pks), chunk_size)]
+
+
+def raise_alerts(findings):
+    """ Create an alert per finding, unless the site already has an open alert of that kind """
+    from alerts.models import Alert, OPEN_ALERT_STATUSES
+    from crm.scorecards import Deltas, record_many
+
+    if not findings:
+        return 0
+    now = timezone.now()
+    existing = set(
+        Alert.objects.filter(
+            site_id__in={f.site_id for f in findings},
+            kind__in=ANOMALY_KINDS,
+            status__in=OPEN_ALERT_STATUSES,
+        ).values_list('site_id', 'kind')
+    )
+    alerts = []
+    alert_counts = Deltas()
+    for finding in findings:
+        if (finding.site_id, finding.kind) in existing:
+            continue
+        alert_counts.add(finding.installer_id, now, alert_count=1)
+        title, priority = ANOMALY_KINDS[finding.kind]
+        alerts.append(Alert(
+            site_id=finding.site_id,
+            customer_id=finding.customer_id,
+            kind=finding.kind,
+            title=title,
+            description=finding.description,
+            priority=priority,
+        ))
+        existing.add((finding.site_id, finding.kind))
+    Alert.objects.bulk_create(alerts, batch_size=1000)
+    # bulk_create skips the signals that count alerts on the installer scorecards
+    record_many(alert_counts)
+    return len(alerts)
+
+
+def run(day, workers=4, chunk_size=1000, restart=False, log=print):
+    """
+    Run (or resume) the anomaly detection of a day.
+    The chunks are saved when the run starts, a resumed run processes the rest of the same ranges
+    (and chunk_size is ignored) - sites added or deactivated meanwhile don't move the boundaries.
+    workers=0 processes the chunks in the current process.
+    returns the AnomalyRun checkpoint
+    """
+    from .models import AnomalyRun
+
+    checkpoint, _ = AnomalyRun.objects.get_or_create(date=day)
+    if restart:
+        checkpoint.chunks = []
+        checkpoint.completed_chunks = []
+        checkpoint.alerts_created = 0
+        checkpoint.finished_at = None
+    if restart or not checkpoint.chunks:
+        checkpoint.chunks = [list(chunk) for chunk in site_chunks(chunk_size)]
+        checkpoint.save()
+
+    done = set(checkpoint.completed_chunks)
+    chunks = [tuple(chunk) for chunk in checkpoint.chunks if chunk[0] not in done]
+    log(f'{len(chunks)} chunks to process, {len(done)} already done')
+
+    references = neighbour_references(day)
+
+    def finish_chunk(first_pk, findings):
+        with transaction.atomic():
+            created = raise_alerts(findings)
+            checkpoint.completed_chunks.append(first_pk)
+            checkpoint.alerts_created += created
+            checkpoint.save(update_fields=['completed_chunks', 'alerts_created', 'updated_at'])
+        log(f'chunk {first_pk}: {len(findings)} findings, {created} alerts')
+
+    if workers == 0:
+        _init_worker(references)
+        for first_pk, last_pk in chunks:
+            finish_chunk(*process_chunk(first_pk, last_pk, day.toordinal()))
+    else:
+        # Workers open their own connections, never share the parent's
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(references,),
+        ) as pool:
+            futures = [pool.submit(process_chunk, first_pk, last_pk, day.toordinal()) for first_pk, last_pk in chunks]
+            for future in as_completed(futures):
+                finish_chunk(*future.result())
+
+    checkpoint.finished_at = timezone.now()
+    checkpoint.save(update_fields=['finished_at', 'updated_at'])
+    return checkpoint
@@ -0,0 +1,336 @@
+"""
+Cold storage of production readings.
+
+Readings older than READINGS_HOT_MONTHS are moved out of the Reading table into one columnar file
+per site and month (ReadingArchive). In a file the readings are ordered by inverter and time:
+timestamps are stored as delta-of-deltas (0 for a steady 5 minute interval), power and energy as
+the XOR of each value's bits with the previous value's, and every column is byte-shuffled and
+zlib compressed - a month of readings takes a few percent of its size in the database.
+Files are memory-mapped and only the requested columns are decoded, with vectorized cumulative
+sums and XORs.
+
+load() reads a period of a site from both tiers, rows that arrived after their month was archived
+take precedence, and DailyProduction.rollup() reads archived days through it.
+"""
+import json
+import mmap
+import struct
+import zlib
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+
+MAGIC = b'SPRA'
+VERSION = 1
+COLUMNS = ('power', 'energy')
+COMPRESSION_LEVEL = 6
+
+
+def archive_dir():
+    return Path(getattr(settings, 'READINGS_ARCHIVE_DIR', settings.BASE_DIR / 'var' / 'readings'))
+
+
+def hot_months():
+    return getattr(settings, 'READINGS_HOT_MONTHS', 6)
+
+
+class Readings(NamedTuple):
+    """
+    Readings of a site in (timestamp, inverter) order - inverter indexes serials, energy is NaN
+    when not reported, columns that were not requested are None
+    """
+    serials: list
+    inverter: np.ndarray
+    timestamp: np.ndarray
+    power: np.ndarray
+    energy: np.ndarray
+
+    def __len__(self):
+        return len(self.timestamp)
+
+
+def cutoff_month(months=None):
+    """ The first day of the month `months` (default READINGS_HOT_MONTHS) before the current one """
+    from django.utils import timezone
+
+    today = timezone.now().astimezone(dt_timezone.utc).date()
+    index = today.year * 12 + today.month - 1 - (hot_months() if months is None else months)
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def month_bounds(month):
+    """ The UTC datetimes of the start of a month and of the next one """
+    return (
+        datetime.combine(month, datetime.min.time(), tzinfo=dt_timezone.utc),
+        datetime.combine(next_month(month), datetime.min.time(), tzinfo=dt_timezone.utc),
+    )
+
+
+def to_datetime64(values):
+    """ Aware datetimes as datetime64[us] (UTC) """
+    return np.array([value.astimezone(dt_timezone.utc).replace(tzinfo=None) for value in values], dtype='datetime64[us]')
+
+
+# Column encodings
+
+def shuffle(values):
+    """ The bytes of 8 byte values grouped by position, so the constant high bytes compress together """
+    return values.view(np.uint8).reshape(-1, 8).T.tobytes()
+
+
+def unshuffle(buffer, dtype):
+    return np.frombuffer(buffer, dtype=np.uint8).reshape(8, -1).T.copy().view(dtype).ravel()
+
+
+def encode_times(values):
+    microseconds = values.astype('datetime64[us]').view(np.int64)
+    return np.diff(np.diff(microseconds, prepend=0), prepend=0)
+
+
+def decode_times(values):
+    return np.cumsum(np.cumsum(values)).view('datetime64[us]')
+
+
+def encode_floats(values):
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.uint64)
+    encoded = bits.copy()
+    encoded[1:] ^= bits[:-1]
+    return encoded
+
+
+def decode_floats(values):
+    return np.bitwise_xor.accumulate(values).view(np.float64) if len(values) else values.view(np.float64)
+
+
+# Files
+
+def write_file(path, readings):
+    """ Write Readings to a new archive file, atomically. returns the file size """
+    order = np.lexsort((readings.timestamp, readings.inverter))
+    inverter = readings.inverter[order]
+    blobs = {
+        'timestamp': shuffle(encode_times(readings.timestamp[order])),
+        'power': shuffle(encode_floats(readings.power[order])),
+        'energy': shuffle(encode_floats(readings.energy[order])),
+    }
+    columns, offset = {}, 0
+    for name, blob in blobs.items():
+        blobs[name] = zlib.compress(blob, COMPRESSION_LEVEL)
+        columns[name] = [offset, len(blobs[name])]
+        offset += len(blobs[name])
+    header = json.dumps({
+        'version': VERSION,
+        'rows': len(order),
+        'serials': list(readings.serials),
+        'counts': np.bincount(inverter, minlength=len(readings.serials)).tolist(),
+        'columns': columns,
+    }).encode()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix('.tmp')
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header)) + header)
+        for blob in blobs.values():
+            f.write(blob)
+    temp_path.replace(path)
+    return path.stat().st_size
+
+
+def read_file(path, columns=COLUMNS):
+    """ Readings of an archive file in (inverter, timestamp) order, only the requested columns are decoded """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if mapped[:4] != MAGIC:
+            raise ValueError(f'{path} is not a readings archive')
+        header_length, = struct.unpack_from('<I', mapped, 4)
+        header = json.loads(mapped[8:8 + header_length])
+        data_start = 8 + header_length
+
+        def column(name, dtype):
+            offset, length = header['columns'][name]
+            with memoryview(mapped)[data_start + offset:data_start + offset + length] as blob:
+                return unshuffle(zlib.decompress(blob), dtype)
+
+        return Readings(
+            serials=header['serials'],
+            inverter=np.repeat(np.arange(len(header['serials']), dtype=np.int32), header['counts']),
+            timestamp=decode_times(column('timestamp', np.int64)),
+            power=decode_floats(column('power', np.uint64)) if 'power' in columns else None,
+            energy=decode_floats(column('energy', np.uint64)) if 'energy' in columns else None,
+        )
+
+
+# Tiers
+
+def hot_readings(site_id, start, end, columns=COLUMNS):
+    """ Readings of a site in [start, end) from the Reading table """
+    from .models import Reading
+
+    rows = list(
+        Reading.objects.filter(site_id=site_id, timestamp__gte=start, timestamp__lt=end)
+        .values_list('inverter_serial', 'timestamp', 'power_w', 'energy_wh')
+    )
+    serials = sorted({row[0] for row in rows})
+    index = {serial: position for position, serial in enumerate(serials)}
+    return Readings(
+        serials=serials,
+        inverter=np.array([index[row[0]] for row in rows], dtype=np.int32),
+        timestamp=to_datetime64(row[1] for row in rows),
+        power=np.array([row[2] for row in rows], dtype=np.float64) if 'power' in columns else None,
+        energy=np.array([np.nan if row[3] is None else row[3] for row in rows], dtype=np.float64) if 'energy' in columns else None,
+    )
+
+
+def merge(parts, columns=COLUMNS):
+    """
+    Readings of several parts in (timestamp, inverter) order, a reading of a later part replaces
+    one of an earlier part with the same inverter and timestamp
+    """
+    serials = sorted({serial for part in parts for serial in part.serials})
+    index = {serial: position for position, serial in enumerate(serials)}
+    inverter = np.concatenate([
+        np.array([index[serial] for serial in part.serials], dtype=np.int32)[part.inverter] if len(part) else part.inverter
+        for part in parts
+    ]) if parts else np.empty(0, dtype=np.int32)
+
+    def concat(name, dtype):
+        if name in COLUMNS and name not in columns:
+            return None
+        return np.concatenate([getattr(part, name) for part in parts]) if parts else np.empty(0, dtype=dtype)
+
+    timestamp = concat('timestamp', 'datetime64[us]')
+    source = np.concatenate([np.full(len(part), number) for number, part in enumerate(parts)]) if parts else np.empty(0)
+    order = np.lexsort((source, inverter, timestamp))
+    inverter, timestamp = inverter[order], timestamp[order]
+    # Last of every (timestamp, inverter) run
+    keep = np.ones(len(order), dtype=bool)
+    keep[:-1] = (timestamp[1:] != timestamp[:-1]) | (inverter[1:] != inverter[:-1])
+    order = order[keep]
+
+    power, energy = concat('power', np.float64), concat('energy', np.float64)
+    return Readings(
+        serials=serials,
+        inverter=inverter[keep],
+        timestamp=timestamp[keep],
+        power=power[order] if power is not None else None,
+        energy=energy[order] if energy is not None else None,
+    )
+
+
+def load(site_id, start, end, columns=COLUMNS):
+    """ Readings of a site in [start, end) from the archive files and the Reading table """
+    from .models import ReadingArchive
+
+    parts = []
+    archives = ReadingArchive.objects.filter(
+        site_id=site_id,
+        month__gte=month_start(start.astimezone(dt_timezone.utc).date()),
+        month__lte=end.astimezone(dt_timezone.utc).date(),
+    ).order_by('month')
+    low, high = np.datetime64(to_datetime64([start])[0]), np.datetime64(to_datetime64([end])[0])
+    for archive in archives:
+        part = read_file(archive_dir() / archive.path, columns)
+        mask = (part.timestamp >= low) & (part.timestamp < high)
+        parts.append(Readings(
+            part.serials, part.inverter[mask], part.timestamp[mask],
+            part.power[mask] if part.power is not None else None,
+            part.energy[mask] if part.energy is not None else None,
+        ))
+    parts.append(hot_readings(site_id, start, end, columns))
+    return merge(parts, columns)
+
+
+def archived_sites(day, site_ids=None):
+    """ {site id: installer id} of the sites whose readings of day are archived """
+    from .models import ReadingArchive
+
+    archives = ReadingArchive.objects.filter(month=month_start(day))
+    if site_ids is not None:
+        archives = archives.filter(site_id__in=site_ids)
+    return dict(archives.values_list('site_id', 'site__installer_id'))
+
+
+def daily_totals(day, sites):
+    """ Rollup rows of a day of archived sites ({site id: installer id}), as DailyProduction.rollup() aggregates them """
+    start = datetime.combine(day, datetime.min.time(), tzinfo=dt_timezone.utc)
+    rows = []
+    for site_id, installer_id in sites.items():
+        readings = load(site_id, start, start + timedelta(days=1))
+        if not len(readings):
+            continue
+        reported = ~np.isnan(readings.energy)
+        rows.append({
+            'site_id': site_id,
+            'site__installer_id': installer_id,
+            'energy': float(readings.energy[reported].sum()) if reported.any() else None,
+            'power': float(readings.power.sum()),
+            'peak': float(readings.power.max()),
+            'count': len(readings),
+        })
+    return rows
+
+
+def archive_month(site_id, month):
+    """
+    Move the readings of a site for a month (first day) from the Reading table to its archive
+    file, merged with the file when the month was archived before.
+    returns (ReadingArchive, number of readings moved), the archive is None when the month has none
+    """
+    from .models import Reading, ReadingArchive
+
+    start, end = month_bounds(month)
+    with transaction.atomic():
+        existing = ReadingArchive.objects.select_for_update().filter(site_id=site_id, month=month).first()
+        hot = Reading.objects.filter(site_id=site_id, timestamp__gte=start, timestamp__lt=end)
+        if not hot.exists():
+            return existing, 0
+        parts = [read_file(archive_dir() / existing.path)] if existing else []
+        readings = merge(parts + [hot_readings(site_id, start, end)])
+
+        path = f'{site_id}/{month:%Y-%m}.readings'
+        size = write_file(archive_dir() / path, readings)
+        archive, _ = ReadingArchive.objects.update_or_create(
+            site_id=site_id, month=month,
+            defaults={'path': path, 'row_count': len(readings), 'inverter_count': len(readings.serials), 'size_bytes': size},
+        )
+        moved = hot.delete()[0]
+    return archive, moved
+
+
+def archive(before=None, site_ids=None, log=print):
+    """
+    Archive every month before `before` (first day of a month, default READINGS_HOT_MONTHS ago)
+    that has readings in the Reading table.
+    returns (archived site months, archived readings)
+    """
+    from django.db.models.functions import TruncMonth
+    from .models import Reading
+
+    cutoff = month_bounds(before or cutoff_month())[0]
+
+    months = Reading.objects.filter(timestamp__lt=cutoff)
+    if site_ids is not None:
+        months = months.filter(site_id__in=site_ids)
+    months = months.annotate(month=TruncMonth('timestamp', tzinfo=dt_timezone.utc)).values_list('site_id', 'month').distinct().order_by('site_id', 'month')
+
+    archived = readings = 0
+    for site_id, month in list(months):
+        month = month.date() if isinstance(month, datetime) else month
+        result, moved = archive_month(site_id, month)
+        if moved:
+            archived += 1
+            readings += moved
+            log(f'site {site_id} {month:%Y-%m}: {moved} readings moved, {result.size_bytes / 1024:.1f} KB')
+    return archived, readings
@@ -0,0 +1,281 @@
+"""
+Fleet sync by several worker processes (sync_worker), on one machine or many.
+
+Sites are split into partitions by site id and every partition is leased by one node at a time
+(SyncLease). A node heartbeats every quarter of the lease time, renewing its leases and
+rebalancing. With n live nodes, those with a heartbeat in SyncNode fresher than the lease time,
+each node's fair share is ceil(partitions / n). A node under its share claims free and expired
+leases, and a node over it releases the rest. A node that joins gets its share as the others
+release, and the leases of a dead node expire and are claimed. Claims are conditional UPDATEs,
+so a partition never has two holders.
+
+A node only syncs sites of the partitions it holds, and only in the first half of a lease. A
+fetch has to finish in the other half, so no fetch is in flight when a lease changes hands.
+The clocks of the machines are expected to be in sync (NTP). A site is synced when its last sync
+is older than SYNC_INTERVAL.
+
+Vendor rate limits (SYNC_VENDOR_RATE_LIMITS, {vendor: requests per minute}) are shared through
+VendorRateWindow, and nodes take requests from the budget of the minute a few at a time.
+"""
+import math
+import os
+import random
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import F, Q, Value
+from django.db.models.functions import Mod
+from django.utils import timezone
+from core.constants import SyncStatus
+from core.exeptions import APIAdapterException
+from .models import SyncLease, SyncNode, VendorRateWindow
+from .sync import sync_site, update_site
+
+
+PARTITIONS = getattr(settings, 'SYNC_PARTITIONS', 64)
+LEASE_SECONDS = getattr(settings, 'SYNC_LEASE_SECONDS', 60)
+SYNC_INTERVAL = getattr(settings, 'SYNC_INTERVAL', 300)
+VENDOR_RATE_LIMITS = getattr(settings, 'SYNC_VENDOR_RATE_LIMITS', {})
+
+RATE_WINDOW = 60
+RATE_BATCH = 5
+BATCH_SIZE = 200
+# Node and rate window rows older than this are deleted
+RETENTION = timedelta(hours=1)
+
+
+class RateBudget:
+    """ Requests a node may send to each vendor, reserved from the shared budget of the current window """
+
+    def __init__(self, limits=None, batch=RATE_BATCH):
+        self.limits = VENDOR_RATE_LIMITS if limits is None else limits
+        self.batch = batch
+        # {vendor: (window start, requests left)}
+        self.granted = {}
+
+    @staticmethod
+    def window():
+        return datetime.fromtimestamp(int(time.time()) // RATE_WINDOW * RATE_WINDOW, dt_timezone.utc)
+
+    def reserve(self, vendor, window, limit):
+        """ Take up to batch requests of the window, returns the number taken """
+        if limit <= 0:
+            return 0
+        VendorRateWindow.objects.bulk_create([VendorRateWindow(vendor=vendor, window_start=window)], ignore_conflicts=True)
+        for count in sorted({min(self.batch, limit), 1}, reverse=True):
+            rows = VendorRateWindow.objects.filter(
+                vendor=vendor, window_start=window, used__lte=limit - count
+            ).update(used=F('used') + count)
+            if rows:
+                return count
+        return 0
+
+    def take(self, vendor):
+        """ Whether a request may be sent to vendor now """
+        limit = self.limits.get(vendor)
+        if limit is None:
+            return True
+        window = self.window()
+        start, left = self.granted.get(vendor, (None, 0))
+        if start != window:
+            left = 0
+        if left == 0:
+            # None when the window is used up by all the nodes
+            left = self.reserve(vendor, window, limit) or None
+        if left is None:
+            self.granted[vendor] = (window, None)
+            return False
+        self.granted[vendor] = (window, left - 1)
+        return True
+
+    def exhausted(self):
+        """ Vendors without requests left in the current window """
+        window = self.window()
+        return [vendor for vendor, (start, left) in self.granted.items() if start == window and left is None]
+
+
+class Node:
+    """
+    A sync worker. sync(site) fetches a site and updates its last_sync_at, sites is the queryset
+    of the sites to sync (the active sites with a vendor by default).
+    """
+
+    def __init__(self, name=None, sync=sync_site, sites=None, partitions=PARTITIONS,
+                 lease_seconds=LEASE_SECONDS, interval=SYNC_INTERVAL, budget=None, log=print):
+        from solar.models import Site
+
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.sync = sync
+        self.sites = sites if sites is not None else Site.active.exclude(vendor='')
+        self.partitions = partitions
+        self.lease_seconds = lease_seconds
+        self.interval = timedelta(seconds=interval)
+        self.budget = budget or RateBudget()
+        self.log = log
+        self.held = set()
+        # Monotonic times
+        self.valid_until = 0.0
+        self.next_heartbeat = 0.0
+        self.stopping = False
+
+    def join(self):
+        SyncLease.objects.bulk_create([SyncLease(partition=p) for p in range(self.partitions)], ignore_conflicts=True)
+        now = timezone.now()
+        SyncNode.objects.update_or_create(name=self.name, defaults={'started_at': now, 'heartbeat_at': now})
+        self.heartbeat()
+
+    def leave(self):
+        self.held = set()
+        SyncLease.objects.filter(node=self.name).update(node='', expires_at=None, epoch=F('epoch') + 1)
+        SyncNode.objects.filter(name=self.name).delete()
+
+    def heartbeat(self):
+        """ Renew the leases held and rebalance """
+        renewed = time.monotonic()
+        now = timezone.now()
+        expires = now + timedelta(seconds=self.lease_seconds)
+        if not SyncNode.objects.filter(name=self.name).update(heartbeat_at=now):
+            SyncNode.objects.create(name=self.name, started_at=now, heartbeat_at=now)
+        SyncLease.objects.filter(node=self.name, expires_at__gt=now).update(expires_at=expires)
+        held = set(SyncLease.objects.filter(node=self.name, expires_at__gt=now).values_list('partition', flat=True))
+
+        live = SyncNode.objects.filter(heartbeat_at__gt=now - timedelta(seconds=self.lease_seconds)).count()
+        share = math.ceil(self.partitions / max(live, 1))
+        if len(held) > share:
+            extra = sorted(held)[share:]
+            SyncLease.objects.filter(node=self.name, partition__in=extra).update(
+                node='', expires_at=None, epoch=F('epoch') + 1
+            )
+            held -= set(extra)
+        elif len(held) < share:
+            free = Q(expires_at__isnull=True) | Q(expires_at__lte=now)
+            candidates = list(SyncLease.objects.filter(free, partition__lt=self.partitions).values_list('partition', flat=True))
+            # Nodes claiming at the same time mostly try different partitions
+            random.shuffle(candidates)
+            for partition in candidates:
+                if len(held) >= share:
+                    break
+                if SyncLease.objects.filter(free, partition=partition).update(
+                    node=self.name, expires_at=expires, epoch=F('epoch') + 1
+                ):
+                    held.add(partition)
+
+        if held != self.held:
+            self.log(f'{self.name}: {len(held)} partitions of {self.partitions}, {live} nodes')
+        self.held = held
+        self.valid_until = renewed + self.lease_seconds / 2
+        self.next_heartbeat = renewed + self.lease_seconds / 4
+        SyncNode.objects.filter(heartbeat_at__lt=now - RETENTION).delete()
+        VendorRateWindow.objects.filter(window_start__lt=now - RETENTION).delete()
+
+    def due(self):
+        """ Sites of the partitions held whose last sync is older than the interval, the oldest first """
+        if not self.held:
+            return []
+        sites = self.sites.annotate(partition=Mod('id', Value(self.partitions))).filter(
+            Q(last_sync_at__isnull=True) | Q(last_sync_at__lte=timezone.now() - self.interval),
+            partition__in=sorted(self.held),
+        )
+        exhausted = self.budget.exhausted()
+        if exhausted:
+            sites = sites.exclude(vendor__in=exhausted)
+        return list(sites.order_by(F('last_sync_at').asc(nulls_first=True), 'pk')[:BATCH_SIZE])
+
+    def step(self):
+        """ Sync a batch of due sites, returns the number of sites synced """
+        if time.monotonic() >= self.next_heartbeat:
+            self.heartbeat()
+        synced = 0
+        for site in self.due():
+            if self.stopping:
+                break
+            if time.monotonic() >= self.next_heartbeat:
+                self.heartbeat()
+            # Released or lost on the last heartbeat
+            if site.partition not in self.held or time.monotonic() >= self.valid_until:
+                continue
+            if not self.budget.take(site.vendor):
+                continue
+            try:
+                self.sync(site)
+            except APIAdapterException as e:
+                # Marked as failed by sync_site
+                self.log(f'{site.site_number}: {e}')
+            except Exception as e:
+                # A vendor without an adapter, a file or database error - the site fails, not the node.
+                # When the database is away the mark fails too, and run() waits for it
+                self.log(f'{site.site_number}: {e!r}')
+                update_site(site, sync_status=SyncStatus.ERROR, last_sync_at=timezone.now())
+            synced += 1
+        return synced
+
+    def run(self):
+        """ Sync until stopping is set, e.g. from a signal handler """
+        joined = False
+        try:
+            while not self.stopping:
+                try:
+                    if not joined:
+                        self.join()
+                        joined = True
+                    synced = self.step()
+                except DatabaseError as e:
+                    # The database is busy or away, the leases run out if it does not come back
+                    self.log(f'{self.name}: {e}')
+                    synced = 0
+                if not synced and not self.stopping:
+                    time.sleep(min(1.0, self.lease_seconds / 8))
+        finally:
+            if joined:
+                try:
+                    self.leave()
+                except DatabaseError as e:
+                    self.log(f'{self.name}: {e}, the leases are released when they expire')
+
+
+# Simulation (sync_worker --simulate, monitoring.tests)
+
+def simulated_sync(path, latency, node_name):
+    """ A sync(site) that takes latency seconds and appends 'site node start end' to path """
+    def sync(site):
+        start = time.time()
+        time.sleep(latency)
+        update_site(site, last_sync_at=timezone.now())
+        line = f'{site.pk} {node_name} {start:.6f} {time.time():.6f}\n'
+        # A single append of a short line is atomic between processes
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+    return sync
+
+
+def check_fetch_log(path, site_ids, start, end, interval, grace):
+    """
+    Check the fetches of a simulation between the times start and end.
+    Double fetch - a site fetched again before its interval passed, or by two nodes at once.
+    Skipped - a site not fetched for longer than interval + grace (or grace at the start).
+    returns (fetches, {site id: [double fetch times]}, {site id: [gaps in seconds]})
+    """
+    fetches = {site_id: [] for site_id in site_ids}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            site_id, _, fetch_start, fetch_end = line.split()
+            fetches.setdefault(int(site_id), []).append((float(fetch_start), float(fetch_end)))
+
+    doubles, skipped = {}, {}
+    for site_id, times in fetches.items():
+        times.sort()
+        for (_, previous_end), (next_start, _) in zip(times, times[1:]):
+            if next_start < previous_end + interval * 0.9:
+                doubles.setdefault(site_id, []).append(next_start)
+        marks = [start] + [fetch_end for _, fetch_end in times] + [end]
+        gaps = [later - earlier for earlier, later in zip(marks, marks[1:]) if later - earlier > interval + grace]
+        if gaps:
+            skipped[site_id] = gaps
+    return sum(len(times) for times in fetches.values()), doubles, skipped
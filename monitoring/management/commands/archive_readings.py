@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Move readings older than READINGS_HOT_MONTHS into per site and month archive files (run monthly)'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, help='Months of readings kept in the database (default READINGS_HOT_MONTHS)')
+        parser.add_argument('--site', type=int, action='append', help='Archive only this site, repeatable')
+
+    def handle(self, *args, **options):
+        from monitoring.archive import archive, cutoff_month
+
+        before = cutoff_month(options['months'])
+        start = time.perf_counter()
+        archived, readings = archive(before, options['site'], log=self.stdout.write)
+        self.stdout.write(
+            f'{readings} readings of {archived} site months before {before:%Y-%m} archived in {time.perf_counter() - start:.1f}s'
+        )
@@ -0,0 +1,92 @@
+import gc
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Compare parse time and peak memory of json.loads + Reading objects with the streaming adapter'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=50, help='Size of the generated payload')
+        parser.add_argument('--inverters', type=int, default=200)
+
+    def handle(self, *args, **options):
+        from monitoring.adapters import JSONReadingsAdapter, ijson
+
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            readings = self.write_payload(f, options['size_mb'] * 1024 * 1024, options['inverters'])
+            path = f.name
+        try:
+            self.stdout.write(f'{os.path.getsize(path) / 2**20:.1f} MB, {readings} readings, ijson: {ijson is not None}')
+            adapter = JSONReadingsAdapter()
+            self.measure('json.loads + Reading objects', lambda: self.parse_objects(path))
+            self.measure('adapter columns', lambda: self.parse_columns(adapter, path))
+        finally:
+            os.unlink(path)
+
+    def write_payload(self, f, size, inverters):
+        """ A response of size bytes, written inverter by inverter """
+        rng = random.Random(0)
+        start = datetime(2025, 6, 1, tzinfo=dt_timezone.utc)
+        per_inverter = size // inverters
+        readings = 0
+        f.write('{"site": "benchmark", "inverters": [')
+        for index in range(inverters):
+            f.write(('' if index == 0 else ',') + f'{{"serial": "INV{index:05d}", "readings": [')
+            written, moment, energy = 0, start, 0.0
+            while written < per_inverter:
+                power = round(rng.uniform(0, 5000), 1)
+                energy += power / 12
+                item = json.dumps({'timestamp': moment.isoformat(), 'power': power, 'energy': round(energy, 1)})
+                f.write(('' if written == 0 else ',') + item)
+                written += len(item) + 1
+                moment += timedelta(minutes=5)
+                readings += 1
+            f.write(']}')
+        f.write(']}')
+        return readings
+
+    def parse_objects(self, path):
+        from monitoring.models import Reading
+
+        with open(path, 'rb') as f:
+            data = json.loads(f.read())
+        return [
+            Reading(
+                site_id=1,
+                inverter_serial=inverter['serial'],
+                timestamp=datetime.fromisoformat(reading['timestamp']),
+                power_w=reading['power'],
+                energy_wh=reading['energy'],
+            )
+            for inverter in data['inverters']
+            for reading in inverter['readings']
+        ]
+
+    def parse_columns(self, adapter, path):
+        with open(path, 'rb') as f:
+            return adapter.parse(f)
+
+    def measure(self, name, parse):
+        gc.collect()
+        start = time.perf_counter()
+        result = parse()
+        elapsed = time.perf_counter() - start
+        del result
+
+        # A second run for the memory, tracing slows parsing down
+        gc.collect()
+        tracemalloc.start()
+        result = parse()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        self.stdout.write(f'{name:30} {elapsed:7.2f} s  {peak / 2**20:8.1f} MB peak')
@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Detect production anomalies across the fleet and raise alerts (resumes an interrupted run)'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='Day to analyze (default: yesterday)')
+        parser.add_argument('--workers', type=int, default=4, help='Worker processes, 0 to run in this process')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Sites per chunk')
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint of a previous run')
+
+    def handle(self, *args, **options):
+        from monitoring import anomalies
+
+        day = options['date'] or timezone.localdate() - timedelta(days=1)
+        run = anomalies.run(
+            day,
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            restart=options['restart'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(f'{run.alerts_created} alerts created for {day}')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.exeptions import APIAdapterException
+
+
+class Command(BaseCommand):
+    help = 'Import the readings of a site from a manufacturer API response file'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('site_number')
+        parser.add_argument('path', help='Response file')
+        parser.add_argument('--adapter', default='json', help='Adapter of the response layout (monitoring.adapters.ADAPTERS)')
+
+    def handle(self, *args, **options):
+        from monitoring.adapters import get_adapter, store_readings
+        from solar.models import Site
+
+        try:
+            site_id = Site.objects.values_list('pk', flat=True).get(site_number=options['site_number'])
+        except Site.DoesNotExist:
+            raise CommandError(f'Unknown site {options["site_number"]}')
+
+        try:
+            adapter = get_adapter(options['adapter'])
+            with open(options['path'], 'rb') as stream:
+                columns = adapter.parse(stream)
+        except APIAdapterException as e:
+            raise CommandError(str(e))
+
+        written = store_readings(site_id, columns)
+        self.stdout.write(f'{written} readings of {len(columns)} inverters imported')
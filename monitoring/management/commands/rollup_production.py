@@ -0,0 +1,18 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from monitoring.models import DailyProduction
+
+
+class Command(BaseCommand):
+    help = 'Aggregate the readings of a day into daily production rows (run nightly, before detect_anomalies)'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='Day to roll up (default: yesterday)')
+
+    def handle(self, *args, **options):
+        day = options['date'] or timezone.localdate() - timedelta(days=1)
+        count = DailyProduction.objects.rollup(day)
+        self.stdout.write(f'{count} sites rolled up for {day}')
@@ -0,0 +1,36 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Sync the sites of the partitions this node leases from their manufacturer APIs, run one or more per machine'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', help='Node name (default host:pid:random)')
+        parser.add_argument('--partitions', type=int, help='Number of partitions, the same on every node (default SYNC_PARTITIONS)')
+        parser.add_argument('--lease', type=float, help='Lease seconds (default SYNC_LEASE_SECONDS)')
+        parser.add_argument('--interval', type=float, help='Seconds between syncs of a site (default SYNC_INTERVAL)')
+        parser.add_argument('--simulate', metavar='LOG', help='Fake the fetches and log them to LOG (monitoring.tests)')
+        parser.add_argument('--latency', type=float, default=0.01, help='Seconds of a simulated fetch')
+
+    def handle(self, *args, **options):
+        from monitoring import fleet
+
+        settings = {
+            key: options[option] for key, option in [
+                ('partitions', 'partitions'), ('lease_seconds', 'lease'), ('interval', 'interval'),
+            ] if options[option] is not None
+        }
+        node = fleet.Node(name=options['name'], log=self.stdout.write, **settings)
+        if options['simulate']:
+            node.sync = fleet.simulated_sync(options['simulate'], options['latency'], node.name)
+
+        def stop(signum, frame):
+            node.stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        node.run()
+        self.stdout.write(f'{node.name}: stopped')
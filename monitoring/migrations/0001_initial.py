@@ -0,0 +1,71 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('solar', '0003_site_azimuth_site_tilt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnomalyRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField(unique=True, verbose_name='תאריך')),
+                ('completed_chunks', models.JSONField(default=list, verbose_name='מקטעים שהושלמו')),
+                ('alerts_created', models.PositiveIntegerField(default=0, verbose_name='התראות שנוצרו')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='הסתיים')),
+            ],
+            options={
+                'verbose_name': 'ריצת זיהוי חריגות',
+                'verbose_name_plural': 'ריצות זיהוי חריגות',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProduction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField(verbose_name='תאריך')),
+                ('energy_kwh', models.FloatField(verbose_name='ייצור (kWh)')),
+                ('expected_kwh', models.FloatField(blank=True, null=True, verbose_name='ייצור צפוי (kWh)')),
+                ('peak_power_kw', models.FloatField(blank=True, null=True, verbose_name='הספק שיא (kW)')),
+                ('reading_count', models.PositiveIntegerField(default=0, verbose_name='מספר קריאות')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_production', to='solar.site', verbose_name='מערכת')),
+            ],
+            options={
+                'verbose_name': 'ייצור יומי',
+                'verbose_name_plural': 'ייצור יומי',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date', 'site'], name='daily_production_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('site', 'date'), name='daily_production_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Reading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inverter_serial', models.CharField(blank=True, max_length=50, verbose_name='מספר ממיר')),
+                ('timestamp', models.DateTimeField(verbose_name='זמן')),
+                ('power_w', models.FloatField(verbose_name='הספק (W)')),
+                ('energy_wh', models.FloatField(blank=True, null=True, verbose_name='אנרגיה (Wh)')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='readings', to='solar.site', verbose_name='מערכת')),
+            ],
+            options={
+                'verbose_name': 'קריאה',
+                'verbose_name_plural': 'קריאות',
+                'indexes': [models.Index(fields=['site', 'timestamp'], name='reading_site_time_idx')],
+                'constraints': [models.UniqueConstraint(fields=('site', 'inverter_serial', 'timestamp'), name='reading_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-19 17:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0001_initial'),
+        ('solar', '0003_site_azimuth_site_tilt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadingArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('month', models.DateField(verbose_name='חודש')),
+                ('path', models.CharField(max_length=255, verbose_name='קובץ')),
+                ('row_count', models.PositiveIntegerField(default=0, verbose_name='מספר קריאות')),
+                ('inverter_count', models.PositiveIntegerField(default=0, verbose_name='מספר ממירים')),
+                ('size_bytes', models.PositiveBigIntegerField(default=0, verbose_name='גודל (בתים)')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reading_archives', to='solar.site', verbose_name='מערכת')),
+            ],
+            options={
+                'verbose_name': 'ארכיון קריאות',
+                'verbose_name_plural': 'ארכיון קריאות',
+                'ordering': ['-month'],
+                'indexes': [models.Index(fields=['month', 'site'], name='reading_archive_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('site', 'month'), name='reading_archive_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-19 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0002_readingarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vendor', models.CharField(max_length=30, verbose_name='יצרן')),
+                ('recorded_at', models.DateTimeField(verbose_name='זמן')),
+                ('requests', models.PositiveIntegerField(default=0, verbose_name='בקשות')),
+                ('errors', models.PositiveIntegerField(default=0, verbose_name='שגיאות')),
+                ('errors_by_type', models.JSONField(default=dict, verbose_name='שגיאות לפי סוג')),
+                ('records', models.PositiveBigIntegerField(default=0, verbose_name='קריאות שהתקבלו')),
+                ('busy_seconds', models.FloatField(default=0, verbose_name='זמן סנכרון (שניות)')),
+                ('latency_histogram', models.JSONField(default=dict, verbose_name='התפלגות זמני תגובה')),
+            ],
+            options={
+                'verbose_name': 'מדד סנכרון',
+                'verbose_name_plural': 'מדדי סנכרון',
+                'ordering': ['-recorded_at'],
+                'indexes': [models.Index(fields=['recorded_at', 'vendor'], name='sync_metric_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.0.1 on 2026-10-19 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0003_syncmetric'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('partition', models.PositiveIntegerField(unique=True, verbose_name='מחיצה')),
+                ('node', models.CharField(blank=True, db_index=True, max_length=100, verbose_name='צומת')),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name='תפוגה')),
+                ('epoch', models.PositiveBigIntegerField(default=0, verbose_name='גרסה')),
+            ],
+            options={
+                'verbose_name': 'חכירת מחיצה',
+                'verbose_name_plural': 'חכירות מחיצות',
+                'ordering': ['partition'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SyncNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='שם')),
+                ('started_at', models.DateTimeField(verbose_name='הופעל')),
+                ('heartbeat_at', models.DateTimeField(db_index=True, verbose_name='דופק אחרון')),
+            ],
+            options={
+                'verbose_name': 'צומת סנכרון',
+                'verbose_name_plural': 'צמתי סנכרון',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VendorRateWindow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vendor', models.CharField(max_length=30, verbose_name='יצרן')),
+                ('window_start', models.DateTimeField(verbose_name='תחילת חלון')),
+                ('used', models.PositiveIntegerField(default=0, verbose_name='בקשות')),
+            ],
+            options={
+                'verbose_name': 'חלון מכסת יצרן',
+                'verbose_name_plural': 'חלונות מכסת יצרן',
+                'ordering': ['-window_start'],
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'window_start'), name='vendor_rate_window_unique')],
+            },
+        ),
+    ]
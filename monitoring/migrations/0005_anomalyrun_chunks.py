@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0004_synclease_syncnode_vendorratewindow'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='anomalyrun',
+            name='chunks',
+            field=models.JSONField(default=list, verbose_name='מקטעים'),
+        ),
+    ]
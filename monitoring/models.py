@@ -1,3 +1,283 @@
-from django.db import models
+from datetime import datetime, time, timedelta, timezone as dt_timezone
 
-# Create your models here.
+from django.db import models, transaction
+from django.db.models import Count, Max, Sum
+from core.models import BaseModel
+
+
+class Reading(models.Model):
+    """
+    Production reading of an inverter, usually every 5 minutes
+    """
+    site = models.ForeignKey(
+        'solar.Site',
+        on_delete=models.CASCADE,
+        related_name='readings',
+        verbose_name='מערכת'
+    )
+    inverter_serial = models.CharField(max_length=50, blank=True, verbose_name='מספר ממיר')
+    timestamp = models.DateTimeField(verbose_name='זמן')
+    power_w = models.FloatField(verbose_name='הספק (W)')
+    energy_wh = models.FloatField(null=True, blank=True, verbose_name='אנרגיה (Wh)')
+
+    class Meta:
+        verbose_name = 'קריאה'
+        verbose_name_plural = 'קריאות'
+        constraints = [
+            models.UniqueConstraint(fields=['site', 'inverter_serial', 'timestamp'], name='reading_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['site', 'timestamp'], name='reading_site_time_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.site_id} | {self.timestamp} | {self.power_w}W'
+
+
+class DailyProductionQuerySet(models.QuerySet):
+
+    def rollup(self, day, site_ids=None):
+        """
+        Aggregate the readings of a day into one row per site, together with the expected production.
+        Safe to run again for the same day - existing rows are updated.
+        returns the number of rolled up sites
+        """
+        from solar.models import Site
+        from solar.yield_model import expected_daily_energy
+
+        from .archive import archived_sites, daily_totals
+
+        start = datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+        readings = Reading.objects.filter(timestamp__gte=start, timestamp__lt=start + timedelta(days=1))
+        if site_ids is not None:
+            readings = readings.filter(site_id__in=site_ids)
+        # Sites whose month is in the cold tier are read from their archive files
+        archived = archived_sites(day, site_ids)
+        if archived:
+            readings = readings.exclude(site_id__in=list(archived))
+
+        totals = readings.values('site_id', 'site__installer_id').annotate(
+            energy=Sum('energy_wh'),
+            power=Sum('power_w'),
+            peak=Max('power_w'),
+            count=Count('pk'),
+        ).order_by()
+
+        rows = list(totals) + daily_totals(day, archived)
+        expected = expected_daily_energy(Site.objects.filter(pk__in=[row['site_id'] for row in rows]), day)
+
+        rollups = [
+            DailyProduction(
+                site_id=row['site_id'],
+                date=day,
+                # Sites that only report power get energy from the 5 minute averages
+                energy_kwh=(row['energy'] if row['energy'] is not None else row['power'] * 5 / 60) / 1000,
+                expected_kwh=expected.get(row['site_id']),
+                peak_power_kw=row['peak'] / 1000,
+                reading_count=row['count'],
+            )
+            for row in rows
+        ]
+        # The scorecard deltas are computed from the rows being replaced, both or neither are written
+        with transaction.atomic():
+            self._record_scorecards(day, rows, rollups, site_ids)
+            DailyProduction.objects.bulk_create(
+                rollups,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['site', 'date'],
+                update_fields=['energy_kwh', 'expected_kwh', 'peak_power_kw', 'reading_count', 'updated_at'],
+            )
+        return len(rollups)
+
+    def _record_scorecards(self, day, rows, rollups, site_ids):
+        """ Add the production of the day to the installer scorecards, minus what an earlier rollup added """
+        from crm.scorecards import Deltas, record_many
+
+        previous = DailyProduction.objects.filter(date=day, expected_kwh__isnull=False)
+        if site_ids is not None:
+            previous = previous.filter(site_id__in=site_ids)
+        previous = {site_id: (energy, expected) for site_id, energy, expected in previous.values_list('site_id', 'energy_kwh', 'expected_kwh')}
+
+        deltas = Deltas()
+        for row, rollup in zip(rows, rollups):
+            # Only days with an expected production count, so the performance ratio compares like with like
+            energy, expected = (rollup.energy_kwh, rollup.expected_kwh) if rollup.expected_kwh is not None else (0, 0)
+            old_energy, old_expected = previous.get(rollup.site_id, (0, 0))
+            deltas.add(row['site__installer_id'], day, energy_kwh=energy - old_energy, expected_kwh=expected - old_expected)
+        record_many(deltas)
+
+
+class DailyProduction(BaseModel):
+    """
+    Daily production rollup of a site, the source for analytics instead of raw readings
+    """
+    site = models.ForeignKey(
+        'solar.Site',
+        on_delete=models.CASCADE,
+        related_name='daily_production',
+        verbose_name='מערכת'
+    )
+    date = models.DateField(verbose_name='תאריך')
+    energy_kwh = models.FloatField(verbose_name='ייצור (kWh)')
+    expected_kwh = models.FloatField(null=True, blank=True, verbose_name='ייצור צפוי (kWh)')
+    peak_power_kw = models.FloatField(null=True, blank=True, verbose_name='הספק שיא (kW)')
+    reading_count = models.PositiveIntegerField(default=0, verbose_name='מספר קריאות')
+
+    objects = DailyProductionQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'ייצור יומי'
+        verbose_name_plural = 'ייצור יומי'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['site', 'date'], name='daily_production_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'site'], name='daily_production_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.site_id} | {self.date} | {self.energy_kwh:.1f} kWh'
+
+    @property
+    def performance_ratio(self):
+        """ Actual / expected clear-sky production """
+        if not self.expected_kwh:
+            return None
+        return self.energy_kwh / self.expected_kwh
+
+
+class AnomalyRun(BaseModel):
+    """
+    Checkpoint of the nightly anomaly detection job, allows resuming an interrupted run
+    """
+    date = models.DateField(unique=True, verbose_name='תאריך')
+    # [first pk, last pk] ranges taken when the run starts, a resumed run keeps them
+    chunks = models.JSONField(default=list, verbose_name='מקטעים')
+    completed_chunks = models.JSONField(default=list, verbose_name='מקטעים שהושלמו')
+    alerts_created = models.PositiveIntegerField(default=0, verbose_name='התראות שנוצרו')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='הסתיים')
+
+    class Meta:
+        verbose_name = 'ריצת זיהוי חריגות'
+        verbose_name_plural = 'ריצות זיהוי חריגות'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f'{self.date} | {len(self.completed_chunks)}/{len(self.chunks)} chunks'
+
+
+class ReadingArchive(BaseModel):
+    """
+    Readings of a site for a month, moved from Reading to a columnar file of the cold tier (monitoring.archive)
+    """
+    site = models.ForeignKey(
+        'solar.Site',
+        on_delete=models.CASCADE,
+        related_name='reading_archives',
+        verbose_name='מערכת'
+    )
+    month = models.DateField(verbose_name='חודש')
+    # Relative to READINGS_ARCHIVE_DIR
+    path = models.CharField(max_length=255, verbose_name='קובץ')
+    row_count = models.PositiveIntegerField(default=0, verbose_name='מספר קריאות')
+    inverter_count = models.PositiveIntegerField(default=0, verbose_name='מספר ממירים')
+    size_bytes = models.PositiveBigIntegerField(default=0, verbose_name='גודל (בתים)')
+
+    class Meta:
+        verbose_name = 'ארכיון קריאות'
+        verbose_name_plural = 'ארכיון קריאות'
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(fields=['site', 'month'], name='reading_archive_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['month', 'site'], name='reading_archive_month_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.site_id} | {self.month:%Y-%m} | {self.row_count}'
+
+
+class SyncMetric(models.Model):
+    """
+    Sync requests of a vendor (manufacturer API) in an interval of a process, written by monitoring.telemetry
+    """
+    vendor = models.CharField(max_length=30, verbose_name='יצרן')
+    recorded_at = models.DateTimeField(verbose_name='זמן')
+    requests = models.PositiveIntegerField(default=0, verbose_name='בקשות')
+    errors = models.PositiveIntegerField(default=0, verbose_name='שגיאות')
+    # {exception class name: count}
+    errors_by_type = models.JSONField(default=dict, verbose_name='שגיאות לפי סוג')
+    records = models.PositiveBigIntegerField(default=0, verbose_name='קריאות שהתקבלו')
+    busy_seconds = models.FloatField(default=0, verbose_name='זמן סנכרון (שניות)')
+    # {bucket: count} of telemetry.bucket_of(), only the non-empty buckets
+    latency_histogram = models.JSONField(default=dict, verbose_name='התפלגות זמני תגובה')
+
+    class Meta:
+        verbose_name = 'מדד סנכרון'
+        verbose_name_plural = 'מדדי סנכרון'
+        ordering = ['-recorded_at']
+        indexes = [
+            models.Index(fields=['recorded_at', 'vendor'], name='sync_metric_time_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.vendor} | {self.recorded_at} | {self.requests}'
+
+
+class SyncNode(models.Model):
+    """
+    A sync worker process (monitoring.fleet), alive while its heartbeat is fresher than the lease time
+    """
+    name = models.CharField(max_length=100, unique=True, verbose_name='שם')
+    started_at = models.DateTimeField(verbose_name='הופעל')
+    heartbeat_at = models.DateTimeField(db_index=True, verbose_name='דופק אחרון')
+
+    class Meta:
+        verbose_name = 'צומת סנכרון'
+        verbose_name_plural = 'צמתי סנכרון'
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class SyncLease(models.Model):
+    """
+    Lease of a partition of the sites (site id modulo the number of partitions) by a sync node
+    """
+    partition = models.PositiveIntegerField(unique=True, verbose_name='מחיצה')
+    node = models.CharField(max_length=100, blank=True, db_index=True, verbose_name='צומת')
+    expires_at = models.DateTimeField(null=True, blank=True, verbose_name='תפוגה')
+    # Grows with every change of holder
+    epoch = models.PositiveBigIntegerField(default=0, verbose_name='גרסה')
+
+    class Meta:
+        verbose_name = 'חכירת מחיצה'
+        verbose_name_plural = 'חכירות מחיצות'
+        ordering = ['partition']
+
+    def __str__(self):
+        return f'{self.partition} | {self.node or "-"}'
+
+
+class VendorRateWindow(models.Model):
+    """
+    Requests to a vendor API in a window, shared by all sync nodes against the vendor rate limit
+    """
+    vendor = models.CharField(max_length=30, verbose_name='יצרן')
+    window_start = models.DateTimeField(verbose_name='תחילת חלון')
+    used = models.PositiveIntegerField(default=0, verbose_name='בקשות')
+
+    class Meta:
+        verbose_name = 'חלון מכסת יצרן'
+        verbose_name_plural = 'חלונות מכסת יצרן'
+        ordering = ['-window_start']
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'window_start'], name='vendor_rate_window_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.vendor} | {self.window_start} | {self.used}'
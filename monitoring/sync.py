@@ -0,0 +1,52 @@
+"""
+Sync of a site's readings from its manufacturer API, recorded by monitoring.telemetry.
+"""
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+from core.constants import SyncStatus
+from core.exeptions import APIAdapterException
+from . import telemetry
+from .adapters import get_adapter, store_readings
+
+
+FIRST_SYNC_DAYS = 1
+
+
+def sync_site(site, end=None):
+    """
+    Fetch the readings of a site since its last reading (a day back on the first sync) and store them.
+    An APIAdapterException marks the site as failed and is raised again.
+    returns the number of readings stored
+    """
+    end = end or timezone.now()
+    start = site.last_reading_at or end - timedelta(days=FIRST_SYNC_DAYS)
+    vendor = site.vendor or 'unknown'
+    began = time.perf_counter()
+    try:
+        adapter = get_adapter(site.vendor)
+        with adapter.open_readings(site, start, end) as stream:
+            columns = adapter.parse(stream)
+    except APIAdapterException as e:
+        telemetry.record(vendor, time.perf_counter() - began, error=e)
+        update_site(site, sync_status=SyncStatus.ERROR, last_sync_at=timezone.now())
+        raise
+    telemetry.record(vendor, time.perf_counter() - began, records=columns.count)
+
+    written = store_readings(site.pk, columns)
+    fields = {'sync_status': SyncStatus.OK, 'last_sync_at': timezone.now()}
+    newest = max((max(inverter.timestamps) for inverter in columns.values() if len(inverter)), default=None)
+    if newest is not None:
+        newest = datetime.fromtimestamp(newest, dt_timezone.utc)
+        if site.last_reading_at is None or newest > site.last_reading_at:
+            fields['last_reading_at'] = newest
+    update_site(site, **fields)
+    return written
+
+
+def update_site(site, **fields):
+    """ Set sync fields of a site, without save() and its geocoding """
+    for name, value in fields.items():
+        setattr(site, name, value)
+    type(site).objects.filter(pk=site.pk).update(updated_at=timezone.now(), **fields)
@@ -0,0 +1,202 @@
+"""
+Sync telemetry per manufacturer API (vendor).
+
+Every sync request is recorded in counters of the recording thread - requests, errors by
+APIAdapterException subtype, readings, busy time and a log-linear (HDR style) latency histogram.
+Only the owning thread writes its counters and they only grow, so recording takes no lock.
+The counters of threads that ended are folded into a shared total and their recorders dropped,
+so short-lived threads don't pile up. flush() sums the counters of all threads and writes their growth since the previous flush as a
+SyncMetric row per vendor; it runs every FLUSH_INTERVAL from whichever thread records next, and
+at exit. The metrics view serves the recent rows of all processes in the Prometheus text format,
+with the lag behind real time from Site.last_reading_at.
+"""
+import atexit
+import logging
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = getattr(settings, 'SYNC_METRICS_FLUSH_INTERVAL', 60)
+
+# 32 buckets per power of two, a latency is known within 3%
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF_BUCKETS = SUB_BUCKETS // 2
+MAX_MICROSECONDS = 3600 * 10 ** 6
+
+
+def bucket_of(microseconds):
+    """ Histogram bucket of a latency in microseconds """
+    value = min(max(int(microseconds), 0), MAX_MICROSECONDS)
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return shift * HALF_BUCKETS + (value >> shift)
+
+
+def bucket_low(index):
+    """ Smallest latency in microseconds of a bucket """
+    if index < SUB_BUCKETS:
+        return index
+    shift = index // HALF_BUCKETS - 1
+    return (index - shift * HALF_BUCKETS) << shift
+
+
+BUCKETS = bucket_of(MAX_MICROSECONDS) + 1
+# Middle of every bucket, in seconds
+BUCKET_SECONDS = np.array(
+    [(bucket_low(index) + bucket_low(index + 1)) / 2 / 10 ** 6 for index in range(BUCKETS)], dtype=np.float64
+)
+
+
+def quantiles(histogram, qs):
+    """ Latencies in seconds at the quantiles qs of a histogram (array of bucket counts) """
+    cumulative = np.cumsum(histogram)
+    if not len(cumulative) or not cumulative[-1]:
+        return [None] * len(qs)
+    positions = np.searchsorted(cumulative, np.asarray(qs) * cumulative[-1])
+    return BUCKET_SECONDS[np.minimum(positions, BUCKETS - 1)].tolist()
+
+
+class Series:
+    """ Counters of a vendor """
+    __slots__ = ('requests', 'records', 'busy_seconds', 'errors', 'histogram')
+
+    def __init__(self):
+        self.requests = 0
+        self.records = 0
+        self.busy_seconds = 0.0
+        self.errors = {}
+        self.histogram = np.zeros(BUCKETS, dtype=np.int64)
+
+    def add(self, other):
+        self.requests += other.requests
+        self.records += other.records
+        self.busy_seconds += other.busy_seconds
+        # Copied in one C call, the owning thread may be adding a key
+        for name, count in dict(other.errors).items():
+            self.errors[name] = self.errors.get(name, 0) + count
+        self.histogram += other.histogram
+
+
+_local = threading.local()
+# (thread, {vendor: Series}) of the recording threads
+_recorders = []
+# {vendor: Series} of the threads that ended
+_retired = {}
+_registry_lock = threading.Lock()
+_exit_flush = False
+_flush_lock = threading.Lock()
+_flushed = {}
+_next_flush = 0.0
+
+
+def _series(vendor):
+    recorder = getattr(_local, 'recorder', None)
+    if recorder is None:
+        global _exit_flush
+        recorder = _local.recorder = {}
+        # Once per thread, not per request
+        with _registry_lock:
+            if not _exit_flush:
+                atexit.register(flush)
+                _exit_flush = True
+            _recorders.append((threading.current_thread(), recorder))
+    series = recorder.get(vendor)
+    if series is None:
+        series = recorder[vendor] = Series()
+    return series
+
+
+def record(vendor, seconds, records=0, error=None):
+    """ Record a sync request of a vendor that took seconds, with the readings it brought or its error """
+    series = _series(vendor)
+    series.requests += 1
+    series.records += records
+    series.busy_seconds += seconds
+    series.histogram[bucket_of(seconds * 10 ** 6)] += 1
+    if error is not None:
+        name = type(error).__name__
+        series.errors[name] = series.errors.get(name, 0) + 1
+    if time.monotonic() >= _next_flush:
+        maybe_flush()
+
+
+def totals():
+    """ {vendor: Series} summed over all threads """
+    result = {}
+    with _registry_lock:
+        live = []
+        for thread, recorder in _recorders:
+            if thread.is_alive():
+                live.append((thread, recorder))
+            else:
+                # Its thread no longer writes, the counters move to the shared total once
+                for vendor, series in recorder.items():
+                    _retired.setdefault(vendor, Series()).add(series)
+        _recorders[:] = live
+        for vendor, series in _retired.items():
+            result.setdefault(vendor, Series()).add(series)
+        recorders = [recorder for _, recorder in live]
+    for recorder in recorders:
+        for vendor, series in list(recorder.items()):
+            result.setdefault(vendor, Series()).add(series)
+    return result
+
+
+def maybe_flush():
+    """ Flush unless another thread is flushing """
+    if _flush_lock.acquire(blocking=False):
+        try:
+            _flush()
+        finally:
+            _flush_lock.release()
+
+
+def flush():
+    with _flush_lock:
+        _flush()
+
+
+def _flush():
+    from django.utils import timezone
+    from .models import SyncMetric
+
+    global _flushed, _next_flush
+    _next_flush = time.monotonic() + FLUSH_INTERVAL
+    current = totals()
+    rows = []
+    for vendor, series in current.items():
+        previous = _flushed.get(vendor, Series())
+        requests = series.requests - previous.requests
+        if not requests:
+            continue
+        errors = {
+            name: count - previous.errors.get(name, 0)
+            for name, count in series.errors.items() if count > previous.errors.get(name, 0)
+        }
+        histogram = series.histogram - previous.histogram
+        rows.append(SyncMetric(
+            vendor=vendor,
+            recorded_at=timezone.now(),
+            requests=requests,
+            errors=sum(errors.values()),
+            errors_by_type=errors,
+            records=series.records - previous.records,
+            busy_seconds=series.busy_seconds - previous.busy_seconds,
+            latency_histogram={str(index): int(histogram[index]) for index in np.flatnonzero(histogram)},
+        ))
+    if not rows:
+        return
+    try:
+        SyncMetric.objects.bulk_create(rows)
+    except Exception:
+        # Telemetry never fails a sync, the growth is written with the next flush
+        logger.exception('Sync metrics flush failed')
+        return
+    _flushed = current
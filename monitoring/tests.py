@@ -1,3 +1,204 @@
-from django.test import TestCase
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from core.constants import SyncStatus
+from crm.models import Customer
+from solar.models import Site
+from . import anomalies
+from .fleet import Node, check_fetch_log
+from .models import AnomalyRun
+
+
+@skipUnless(connection.vendor == 'sqlite', 'the workers share a file copy of the SQLite test database')
+class FleetSyncTest(TransactionTestCase):
+    """
+    sync_worker processes with simulated fetches against a file copy of the test database, killed
+    (SIGKILL, mid-fetch and holding leases) and replaced on the way. No site is skipped or fetched
+    twice, and the nodes stay within the shared rate limit of a vendor.
+    """
+    NODES = 3
+    KILLS = 2
+    DURATION = 10.0
+    PARTITIONS = 8
+    LEASE = 1.0
+    INTERVAL = 2.0
+    LATENCY = 0.05
+    # Requests per minute of the limited vendor, its sites want more and are not checked for skips
+    RATE_LIMIT = 20
+    BOOT_TIMEOUT = 30
+
+    def setUp(self):
+        customer = Customer.objects.create(name='לקוח')
+
+        def sites(vendor, count):
+            return [
+                Site.objects.create(customer=customer, vendor=vendor, city='חיפה', latitude=32.8, longitude=35.0).pk
+                for _ in range(count)
+            ]
+
+        self.site_ids = sites('solaredge', 30)
+        self.limited_ids = sites('huawei', 10)
+
+        self.directory = tempfile.mkdtemp(prefix='sync_fleet_')
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.database = os.path.join(self.directory, 'db.sqlite3')
+        connection.ensure_connection()
+        copy = sqlite3.connect(self.database)
+        connection.connection.backup(copy)
+        copy.execute('PRAGMA journal_mode=WAL')
+        copy.close()
+        with open(os.path.join(self.directory, 'fleet_settings.py'), 'w', encoding='utf-8') as f:
+            f.write(
+                f'from {settings.SETTINGS_MODULE} import *\n'
+                f'DATABASES = {{"default": {{"ENGINE": "django.db.backends.sqlite3", "NAME": {self.database!r}, '
+                f'"OPTIONS": {{"timeout": 30, "transaction_mode": "IMMEDIATE"}}}}}}\n'
+                f'SYNC_VENDOR_RATE_LIMITS = {{"huawei": {self.RATE_LIMIT}}}\n'
+            )
+        self.log_path = os.path.join(self.directory, 'fetches.log')
+        self.workers = {}
+
+    def query(self, sql):
+        with sqlite3.connect(self.database, timeout=30) as db:
+            return db.execute(sql).fetchall()
+
+    def start_worker(self):
+        name = f'node-{len(self.workers)}'
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'fleet_settings',
+            'PYTHONPATH': os.pathsep.join([self.directory, str(settings.BASE_DIR), os.environ.get('PYTHONPATH', '')]),
+        }
+        stderr = open(os.path.join(self.directory, f'{name}.err'), 'w')
+        self.addCleanup(stderr.close)
+        self.workers[name] = subprocess.Popen(
+            [
+                sys.executable, 'manage.py', 'sync_worker', '--name', name, '--partitions', str(self.PARTITIONS),
+                '--lease', str(self.LEASE), '--interval', str(self.INTERVAL),
+                '--simulate', self.log_path, '--latency', str(self.LATENCY),
+            ],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=stderr,
+        )
+        # A test failure must not leave workers behind
+        self.addCleanup(lambda worker=self.workers[name]: worker.poll() is None and worker.kill())
+        return name
+
+    def errors(self, name):
+        with open(os.path.join(self.directory, f'{name}.err'), encoding='utf-8') as f:
+            return f.read()
+
+    def test_no_site_skipped_or_fetched_twice(self):
+        rng = random.Random(0)
+        for _ in range(self.NODES):
+            self.start_worker()
+        deadline = time.time() + self.BOOT_TIMEOUT
+        while self.query('SELECT COUNT(*) FROM monitoring_syncnode')[0][0] < self.NODES:
+            self.assertLess(time.time(), deadline, 'the workers did not start')
+            time.sleep(0.1)
+
+        # Kills are spread over the middle of the run, a replacement is started a lease later
+        start = time.time()
+        events = []
+        for number in range(self.KILLS):
+            at = self.DURATION * (number + 1) / (self.KILLS + 1)
+            events += [(at, 'kill'), (at + self.LEASE, 'start')]
+        killed = set()
+        for at, event in sorted(events):
+            time.sleep(max(start + at - time.time(), 0))
+            if event == 'kill':
+                holders = {row[0] for row in self.query('SELECT node FROM monitoring_synclease')}
+                name = rng.choice(sorted(holders & (set(self.workers) - killed)))
+                self.workers[name].kill()
+                killed.add(name)
+            else:
+                self.start_worker()
+        time.sleep(max(start + self.DURATION - time.time(), 0))
+        end = time.time()
+        stopped = sorted(set(self.workers) - killed)
+        for name in stopped:
+            self.workers[name].terminate()
+        for name in stopped:
+            self.assertEqual(self.workers[name].wait(timeout=self.BOOT_TIMEOUT), 0, self.errors(name))
+
+        # A dead node's leases are taken over after they expire and at the next heartbeat
+        grace = 2 * self.LEASE + 2
+        fetches, doubles, skipped = check_fetch_log(self.log_path, self.site_ids, start, end, self.INTERVAL, grace)
+        self.assertGreater(fetches, len(self.site_ids))
+        self.assertEqual(doubles, {})
+        self.assertEqual({site_id: gaps for site_id, gaps in skipped.items() if site_id in self.site_ids}, {})
+
+        # Nodes take requests of the shared budget of a window, never more than the limit
+        used = [row[0] for row in self.query("SELECT used FROM monitoring_vendorratewindow WHERE vendor = 'huawei'")]
+        with open(self.log_path, encoding='utf-8') as f:
+            limited_fetches = sum(1 for line in f if int(line.split()[0]) in self.limited_ids)
+        self.assertTrue(used)
+        self.assertLessEqual(max(used), self.RATE_LIMIT)
+        self.assertLessEqual(limited_fetches, sum(used))
+
+        # The nodes that stopped cleanly left, the leases of the killed ones are left to expire
+        nodes = {row[0] for row in self.query('SELECT name FROM monitoring_syncnode')}
+        lease_holders = {row[0] for row in self.query('SELECT node FROM monitoring_synclease')}
+        self.assertFalse(nodes & set(stopped))
+        self.assertFalse(lease_holders & set(stopped))
+
+
+class NodeStepTest(TransactionTestCase):
+
+    def test_site_error_does_not_stop_the_node(self):
+        customer = Customer.objects.create(name='לקוח')
+        sites = [Site.objects.create(customer=customer, city='חיפה', latitude=32.8, longitude=35.0) for _ in range(3)]
+        synced = []
+
+        def sync(site):
+            if site.pk == sites[0].pk:
+                raise NotImplementedError('no adapter')
+            synced.append(site.pk)
+
+        node = Node(sync=sync, sites=Site.active.all(), partitions=1, log=lambda message: None)
+        node.join()
+        self.assertEqual(node.step(), 3)
+        self.assertEqual(sorted(synced), [site.pk for site in sites[1:]])
+        failed = Site.objects.get(pk=sites[0].pk)
+        self.assertEqual(failed.sync_status, SyncStatus.ERROR)
+        self.assertIsNotNone(failed.last_sync_at)
+        node.leave()
+
+
+class AnomalyRunResumeTest(TestCase):
+    """ A resumed anomaly run processes the rest of the chunks it started with """
+
+    def test_resume_keeps_the_chunks(self):
+        customer = Customer.objects.create(name='לקוח')
+        sites = [Site.objects.create(customer=customer, city='חיפה', latitude=32.8, longitude=35.0) for _ in range(4)]
+        processed = []
+        crashes = [True]
+
+        def process_chunk(first_pk, last_pk, day_ordinal):
+            # The run is interrupted on its second chunk
+            if processed and crashes:
+                crashes.pop()
+                raise InterruptedError
+            processed.append((first_pk, last_pk))
+            return first_pk, []
+
+        with mock.patch.object(anomalies, 'process_chunk', process_chunk):
+            with self.assertRaises(InterruptedError):
+                anomalies.run(date(2025, 6, 1), workers=0, chunk_size=2, log=lambda message: None)
+            # Moves the boundaries of chunks computed again
+            sites[0].is_active = False
+            sites[0].save()
+            checkpoint = anomalies.run(date(2025, 6, 1), workers=0, chunk_size=3, log=lambda message: None)
+
+        self.assertEqual(processed, [(sites[0].pk, sites[1].pk), (sites[2].pk, sites[3].pk)])
+        self.assertEqual(checkpoint.completed_chunks, [sites[0].pk, sites[2].pk])
+        self.assertIsNotNone(checkpoint.finished_at)
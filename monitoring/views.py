@@ -1,3 +1,136 @@
-from django.shortcuts import render
+from datetime import timedelta
 
-# Create your views here.
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count, Max, Min, Q
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from . import telemetry
+from .models import SyncMetric
+
+
+METRICS_WINDOW = 300
+QUANTILES = [0.5, 0.95, 0.99]
+# A site is stale when its newest reading is older than this
+STALE_SECONDS = getattr(settings, 'SYNC_STALE_SECONDS', 3600)
+# Stale sites with a lag series of their own, the most lagging first - a bound on the label cardinality
+STALE_SITES_LISTED = getattr(settings, 'SYNC_METRICS_STALE_SITES', 50)
+
+
+def allowed(request):
+    """ A bearer token of settings.METRICS_TOKEN (for the scraper) or a staff user that may view the metrics """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorization = request.headers.get('Authorization', '')
+    if token and authorization.startswith('Bearer '):
+        return constant_time_compare(authorization[len('Bearer '):], token)
+    user = request.user
+    return user.is_active and user.is_staff and user.has_perm('monitoring.view_syncmetric')
+
+
+def label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Exposition:
+    """ Lines of the Prometheus text format """
+
+    def __init__(self):
+        self.lines = []
+
+    def metric(self, name, kind, description):
+        self.lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+
+    def sample(self, name, value, **labels):
+        labels = ','.join(f'{key}="{label(value)}"' for key, value in labels.items())
+        self.lines.append(f'{name}{{{labels}}} {value:g}' if labels else f'{name} {value:g}')
+
+    def render(self):
+        return '\n'.join(self.lines) + '\n'
+
+
+def vendor_totals(since):
+    """ {vendor: Series} of the metric rows of all processes since a time """
+    totals = {}
+    for row in SyncMetric.objects.filter(recorded_at__gte=since).iterator():
+        series = totals.setdefault(row.vendor, telemetry.Series())
+        series.requests += row.requests
+        series.records += row.records
+        series.busy_seconds += row.busy_seconds
+        for name, count in row.errors_by_type.items():
+            series.errors[name] = series.errors.get(name, 0) + count
+        buckets = np.fromiter(map(int, row.latency_histogram), dtype=np.int64, count=len(row.latency_histogram))
+        np.add.at(series.histogram, buckets, list(row.latency_histogram.values()))
+    return totals
+
+
+@require_GET
+def metrics(request):
+    """
+    Sync telemetry per vendor in the Prometheus text format, over the last ?window= seconds
+    (METRICS_WINDOW by default) of the flushed SyncMetric rows
+    """
+    if not allowed(request):
+        raise PermissionDenied
+    from solar.models import Site
+
+    try:
+        window = max(int(request.GET.get('window', METRICS_WINDOW)), 1)
+    except ValueError:
+        window = METRICS_WINDOW
+    now = timezone.now()
+    totals = vendor_totals(now - timedelta(seconds=window))
+    out = Exposition()
+
+    out.metric('sunpulse_sync_requests', 'gauge', f'Sync requests in the last {window} seconds')
+    for vendor, series in sorted(totals.items()):
+        out.sample('sunpulse_sync_requests', series.requests, vendor=vendor)
+
+    out.metric('sunpulse_sync_errors', 'gauge', f'Failed sync requests in the last {window} seconds by exception')
+    for vendor, series in sorted(totals.items()):
+        for name, count in sorted(series.errors.items()):
+            out.sample('sunpulse_sync_errors', count, vendor=vendor, error=name)
+
+    out.metric('sunpulse_sync_error_ratio', 'gauge', 'Failed share of the sync requests')
+    for vendor, series in sorted(totals.items()):
+        out.sample('sunpulse_sync_error_ratio', sum(series.errors.values()) / series.requests, vendor=vendor)
+
+    out.metric('sunpulse_sync_records_per_second', 'gauge', 'Readings received per second of sync requests')
+    for vendor, series in sorted(totals.items()):
+        rate = series.records / series.busy_seconds if series.busy_seconds else 0
+        out.sample('sunpulse_sync_records_per_second', rate, vendor=vendor)
+
+    out.metric('sunpulse_sync_latency_seconds', 'gauge', 'Sync request latency quantiles')
+    for vendor, series in sorted(totals.items()):
+        for q, seconds in zip(QUANTILES, telemetry.quantiles(series.histogram, QUANTILES)):
+            if seconds is not None:
+                out.sample('sunpulse_sync_latency_seconds', seconds, vendor=vendor, quantile=q)
+
+    # Lag behind real time, from the newest reading of every site
+    stale_before = now - timedelta(seconds=STALE_SECONDS)
+    lags = Site.active.exclude(vendor='').values('vendor').annotate(
+        oldest=Min('last_reading_at'),
+        newest=Max('last_reading_at'),
+        stale=Count('pk', filter=Q(last_reading_at__lt=stale_before) | Q(last_reading_at__isnull=True)),
+    ).order_by('vendor')
+    out.metric('sunpulse_sync_lag_seconds', 'gauge', 'Age of the newest reading of the most lagging site')
+    for row in lags:
+        if row['oldest'] is not None:
+            out.sample('sunpulse_sync_lag_seconds', (now - row['oldest']).total_seconds(), vendor=row['vendor'])
+    out.metric('sunpulse_sync_stale_sites', 'gauge', f'Sites without a reading in the last {STALE_SECONDS} seconds')
+    for row in lags:
+        out.sample('sunpulse_sync_stale_sites', row['stale'], vendor=row['vendor'])
+    # Per site only for the most lagging stale sites, a series per site of the fleet would not scale
+    stale_sites = Site.active.exclude(vendor='').filter(last_reading_at__lt=stale_before).order_by('last_reading_at', 'pk')
+    out.metric('sunpulse_sync_site_lag_seconds', 'gauge', f'Age of the newest reading of the {STALE_SITES_LISTED} most lagging stale sites')
+    for site_number, vendor, last_reading_at in stale_sites.values_list('site_number', 'vendor', 'last_reading_at')[:STALE_SITES_LISTED]:
+        out.sample('sunpulse_sync_site_lag_seconds', (now - last_reading_at).total_seconds(), vendor=vendor, site=site_number)
+
+    out.metric('sunpulse_sites', 'gauge', 'Active sites by vendor and sync status')
+    statuses = Site.active.values('vendor', 'sync_status').annotate(count=Count('pk')).order_by('vendor', 'sync_status')
+    for row in statuses:
+        out.sample('sunpulse_sites', row['count'], vendor=row['vendor'] or 'unknown', status=row['sync_status'])
+
+    return HttpResponse(out.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,3 +1,12 @@
 from django.contrib import admin
+from .models import MonthlyReport
 
-# Register your models here.
+
+@admin.register(MonthlyReport)
+class MonthlyReportAdmin(admin.ModelAdmin):
+    list_display = ['customer', 'month', 'document', 'generated_at']
+    list_filter = ['month']
+    search_fields = ['customer__customer_number', 'customer__name', 'customer__company_name']
+    readonly_fields = ['input_hash', 'generated_at', 'created_at', 'updated_at']
+    raw_id_fields = ['customer']
+    list_select_related = ['customer']
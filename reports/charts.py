@@ -0,0 +1,65 @@
+"""
+Daily production charts of the monthly reports, as inline SVG.
+
+A chart only depends on the production of one site in one month, so it is stored under a name
+derived from a hash of that data and reused until the data changes.
+"""
+import hashlib
+import json
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils.html import escape
+
+
+WIDTH = 600
+HEIGHT = 200
+MARGIN = 30
+
+CHART_DIR = 'reports/charts'
+
+
+def chart_name(site_id, month, days):
+    digest = hashlib.sha256(json.dumps(days, separators=(',', ':')).encode()).hexdigest()[:16]
+    return f'{CHART_DIR}/{site_id}/{month:%Y-%m}-{digest}.svg'
+
+
+def render_chart(days, days_in_month):
+    """
+    Bars of the daily production with the expected production as a line.
+    days - list of [day of month, energy kWh, expected kWh or None]
+    """
+    top = max([max(energy, expected or 0) for _, energy, expected in days] + [1])
+    slot = (WIDTH - 2 * MARGIN) / days_in_month
+    scale = (HEIGHT - 2 * MARGIN) / top
+    base = HEIGHT - MARGIN
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {WIDTH} {HEIGHT}" class="chart">',
+        f'<line x1="{MARGIN}" y1="{base}" x2="{WIDTH - MARGIN}" y2="{base}" stroke="#999"/>',
+        f'<text x="{MARGIN}" y="{MARGIN - 8}" font-size="10">{escape(f"{top:.0f} kWh")}</text>',
+    ]
+    expected_points = []
+    for day, energy, expected in days:
+        x = MARGIN + (day - 1) * slot
+        height = energy * scale
+        parts.append(
+            f'<rect x="{x + 1:.1f}" y="{base - height:.1f}" width="{slot - 2:.1f}" height="{height:.1f}" fill="#f5a623"/>'
+        )
+        if expected is not None:
+            expected_points.append(f'{x + slot / 2:.1f},{base - expected * scale:.1f}')
+    if expected_points:
+        parts.append(f'<polyline points="{" ".join(expected_points)}" fill="none" stroke="#4a90e2" stroke-width="2"/>')
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def site_chart(site_id, month, days, days_in_month, storage=default_storage):
+    """ SVG of a site month, rendered once per distinct data and then read from storage """
+    name = chart_name(site_id, month, days)
+    if storage.exists(name):
+        with storage.open(name, 'rb') as f:
+            return f.read().decode()
+    svg = render_chart(days, days_in_month)
+    storage.save(name, ContentFile(svg.encode()))
+    return svg
@@ -0,0 +1,246 @@
+"""
+Monthly customer report generation.
+
+Customers are processed in batches across a process pool. A worker loads the report data of a
+whole batch in a few queries and hashes the data of every customer; reports whose hash did not
+change since the last run are skipped, so after a late data correction only the affected
+reports are rendered again. Templates are compiled once per worker and charts are cached per
+site and month (see reports.charts).
+"""
+import calendar
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models import Count, Exists, OuterRef, Q, Subquery
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from .charts import site_chart
+
+
+# Bump when the template or the report data changes, so all reports are rendered again
+REPORT_VERSION = 1
+TEMPLATE_NAME = 'reports/monthly_report.html'
+
+_template = None
+
+
+def _get_template():
+    global _template
+    if _template is None:
+        _template = get_template(TEMPLATE_NAME)
+    return _template
+
+
+def month_range(month):
+    days = calendar.monthrange(month.year, month.month)[1]
+    return month, month + timedelta(days=days), days
+
+
+def load_report_data(customer_ids, month):
+    """
+    Report data of many customers in a handful of queries.
+    returns {customer_id: JSON serializable dict}
+    """
+    from alerts.models import Alert
+    from crm.models import Customer
+    from monitoring.models import DailyProduction
+    from solar.models import Site
+
+    start, end, _ = month_range(month)
+    data = {}
+    for customer in Customer.objects.filter(pk__in=customer_ids).only(
+        'customer_number', 'customer_type', 'name', 'company_name', 'street', 'city', 'postal_code', 'country'
+    ):
+        data[customer.pk] = {
+            'customer_number': customer.customer_number,
+            'name': customer.display_name,
+            'address': customer.full_address,
+            'month': f'{month:%Y-%m}',
+            'sites': [],
+            'alert_count': 0,
+        }
+
+    sites = {}
+    for site in Site.active.filter(customer_id__in=customer_ids).order_by('pk').values(
+        'pk', 'customer_id', 'site_number', 'name', 'installed_capacity'
+    ):
+        sites[site['pk']] = {
+            'id': site['pk'],
+            'site_number': site['site_number'],
+            'name': site['name'],
+            'capacity': str(site['installed_capacity'] or ''),
+            'days': [],
+        }
+        data[site['customer_id']]['sites'].append(sites[site['pk']])
+
+    production = DailyProduction.objects.filter(
+        site_id__in=sites, date__gte=start, date__lt=end
+    ).order_by('site_id', 'date').values_list('site_id', 'date', 'energy_kwh', 'expected_kwh')
+    for site_id, day, energy, expected in production.iterator(chunk_size=10_000):
+        sites[site_id]['days'].append([day.day, round(energy, 2), None if expected is None else round(expected, 2)])
+
+    alerts = Alert.objects.filter(
+        customer_id__in=customer_ids, created_at__date__gte=start, created_at__date__lt=end
+    ).values('customer_id').annotate(count=Count('pk')).order_by()
+    for row in alerts:
+        data[row['customer_id']]['alert_count'] = row['count']
+
+    for report in data.values():
+        for site in report['sites']:
+            site['energy_kwh'] = round(sum(day[1] for day in site['days']), 1)
+            site['expected_kwh'] = round(sum(day[2] or 0 for day in site['days']), 1)
+        report['energy_kwh'] = round(sum(site['energy_kwh'] for site in report['sites']), 1)
+        report['expected_kwh'] = round(sum(site['expected_kwh'] for site in report['sites']), 1)
+    return data
+
+
+def input_hash(report_data):
+    payload = json.dumps([REPORT_VERSION, report_data], sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def render_report(report_data, month):
+    """ returns (content bytes, file extension) - PDF when weasyprint is installed and enabled, HTML otherwise """
+    _, _, days_in_month = month_range(month)
+    sites = [
+        (site, mark_safe(site_chart(site['id'], month, site['days'], days_in_month)))
+        for site in report_data['sites']
+    ]
+    html = _get_template().render({'report': report_data, 'month': month, 'sites': sites})
+    if getattr(settings, 'REPORTS_PDF', False):
+        try:
+            # Imported on use, loading weasyprint takes longer than rendering a report
+            import weasyprint
+        except ImportError:
+            pass
+        else:
+            return weasyprint.HTML(string=html).write_pdf(), 'pdf'
+    return html.encode(), 'html'
+
+
+def delete_documents(storage, names):
+    for name in names:
+        storage.delete(name)
+
+
+def generate_batch(customer_ids, month_ordinal, force=False):
+    """
+    Render the reports of a batch of customers whose data changed.
+    returns (generated, skipped)
+    """
+    from .models import MonthlyReport
+
+    month = date.fromordinal(month_ordinal)
+    data = load_report_data(customer_ids, month)
+    existing = {
+        report.customer_id: report
+        for report in MonthlyReport.objects.filter(customer_id__in=customer_ids, month=month)
+    }
+
+    generated = []
+    # Documents replaced by the new ones, deleted once the rows point to the new ones
+    replaced = []
+    for customer_id, report_data in data.items():
+        digest = input_hash(report_data)
+        report = existing.get(customer_id)
+        if report and report.document and report.input_hash == digest and not force:
+            continue
+
+        content, extension = render_report(report_data, month)
+        if report is None:
+            report = MonthlyReport(customer_id=customer_id, month=month)
+        elif report.document:
+            replaced.append(report.document.name)
+        report.document.save(
+            f'{month:%Y}/{month:%m}/{report_data["customer_number"]}.{extension}', ContentFile(content), save=False
+        )
+        report.input_hash = digest
+        report.generated_at = timezone.now()
+        generated.append(report)
+
+    # A storage that overwrites may have stored a new document under the old name
+    replaced = set(replaced) - {report.document.name for report in generated}
+    storage = MonthlyReport._meta.get_field('document').storage
+    with transaction.atomic():
+        MonthlyReport.objects.bulk_create(
+            generated,
+            update_conflicts=True,
+            unique_fields=['customer', 'month'],
+            update_fields=['input_hash', 'document', 'generated_at', 'updated_at'],
+        )
+        transaction.on_commit(lambda: delete_documents(storage, replaced))
+    return len(generated), len(data) - len(generated)
+
+
+def report_customer_ids(month, changed_only=False):
+    """
+    Customers that get a report for the month - those with active sites.
+    changed_only narrows them to customers without a report or with production updated after it,
+    a cheap way to pick up late data corrections without hashing the whole fleet.
+    """
+    from crm.models import Customer
+    from monitoring.models import DailyProduction
+    from solar.models import Site
+    from .models import MonthlyReport
+
+    customers = Customer.objects.filter(Exists(Site.active.filter(customer=OuterRef('pk'))))
+    if changed_only:
+        start, end, _ = month_range(month)
+        generated_at = MonthlyReport.objects.filter(customer=OuterRef('pk'), month=month).values('generated_at')[:1]
+        corrected = DailyProduction.objects.filter(
+            site__customer=OuterRef('pk'),
+            date__gte=start,
+            date__lt=end,
+            updated_at__gt=OuterRef('report_generated_at'),
+        )
+        customers = customers.annotate(report_generated_at=Subquery(generated_at)).filter(
+            Q(report_generated_at__isnull=True) | Exists(corrected)
+        )
+    return list(customers.order_by('pk').values_list('pk', flat=True))
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+
+    # Workers are spawned, set Django up in each of them
+    if not apps.ready:
+        django.setup()
+
+
+def run(month, workers=4, batch_size=200, customer_ids=None, changed_only=False, force=False, log=print):
+    """
+    Generate the reports of a month.
+    workers=0 renders in the current process.
+    returns (generated, skipped)
+    """
+    if customer_ids is None:
+        customer_ids = report_customer_ids(month, changed_only=changed_only)
+    batches = [customer_ids[i:i + batch_size] for i in range(0, len(customer_ids), batch_size)]
+    log(f'{len(customer_ids)} customers in {len(batches)} batches')
+
+    generated = skipped = 0
+    if workers == 0:
+        results = (generate_batch(batch, month.toordinal(), force) for batch in batches)
+        for batch_generated, batch_skipped in results:
+            generated += batch_generated
+            skipped += batch_skipped
+        return generated, skipped
+
+    # Workers open their own connections, never share the parent's
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'), initializer=_init_worker) as pool:
+        futures = [pool.submit(generate_batch, batch, month.toordinal(), force) for batch in batches]
+        for future in as_completed(futures):
+            batch_generated, batch_skipped = future.result()
+            generated += batch_generated
+            skipped += batch_skipped
+            log(f'{generated} generated, {skipped} unchanged')
+    return generated, skipped
@@ -0,0 +1,39 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Generate the monthly customer production reports, skipping reports whose data did not change'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='YYYY-MM (default: last month)')
+        parser.add_argument('--workers', type=int, default=4, help='Worker processes, 0 to render in this process')
+        parser.add_argument('--batch-size', type=int, default=200, help='Customers per batch')
+        parser.add_argument('--customer', type=int, action='append', dest='customers', help='Only these customer ids')
+        parser.add_argument('--changed', action='store_true', help='Only customers with production updated since their report')
+        parser.add_argument('--force', action='store_true', help='Render even when the data did not change')
+
+    def handle(self, *args, **options):
+        from reports import generation
+
+        if options['month']:
+            try:
+                month = date.fromisoformat(f'{options["month"]}-01')
+            except ValueError:
+                raise CommandError('--month must be YYYY-MM')
+        else:
+            month = (timezone.localdate().replace(day=1) - timedelta(days=1)).replace(day=1)
+
+        generated, skipped = generation.run(
+            month,
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            customer_ids=options['customers'],
+            changed_only=options['changed'],
+            force=options['force'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(f'{generated} reports generated, {skipped} unchanged')
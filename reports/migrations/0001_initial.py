@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('crm', '0004_installerscorecard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('month', models.DateField(verbose_name='חודש')),
+                ('input_hash', models.CharField(max_length=64, verbose_name='חתימת נתונים')),
+                ('document', models.FileField(blank=True, upload_to='reports', verbose_name='מסמך')),
+                ('generated_at', models.DateTimeField(verbose_name='הופק בתאריך')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_reports', to='crm.customer', verbose_name='לקוח')),
+            ],
+            options={
+                'verbose_name': 'דוח חודשי',
+                'verbose_name_plural': 'דוחות חודשיים',
+                'ordering': ['-month'],
+                'constraints': [models.UniqueConstraint(fields=('customer', 'month'), name='monthly_report_unique')],
+            },
+        ),
+    ]
@@ -1,3 +1,31 @@
 from django.db import models
+from core.models import BaseModel
 
-# Create your models here.
+
+class MonthlyReport(BaseModel):
+    """
+    Monthly production report of a customer.
+    input_hash identifies the data the document was rendered from, an unchanged hash means
+    the document is up to date and is not rendered again.
+    """
+    customer = models.ForeignKey(
+        'crm.Customer',
+        on_delete=models.CASCADE,
+        related_name='monthly_reports',
+        verbose_name='לקוח'
+    )
+    month = models.DateField(verbose_name='חודש')
+    input_hash = models.CharField(max_length=64, verbose_name='חתימת נתונים')
+    document = models.FileField(upload_to='reports', blank=True, verbose_name='מסמך')
+    generated_at = models.DateTimeField(verbose_name='הופק בתאריך')
+
+    class Meta:
+        verbose_name = 'דוח חודשי'
+        verbose_name_plural = 'דוחות חודשיים'
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'month'], name='monthly_report_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.customer_id} | {self.month:%m/%Y}'
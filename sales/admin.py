@@ -1,9 +1,31 @@
 from django.contrib import admin
-from .models import Lead, Contract
+from django.urls import reverse
+from django.utils.html import format_html
+from accounts.scoping import ScopedAdminMixin
+from core.bulk import admin_action
+from core.exports import CSVExportMixin
+from core.pagination import KeysetPaginationMixin
+from . import bulk  # noqa: F401 - registers the bulk actions
+from .models import Lead, Contract, Invoice, Salesperson, Tariff
+
+
+class ExpiredListFilter(admin.SimpleListFilter):
+    title = 'פג תוקף'
+    parameter_name = 'expired'
+
+    def lookups(self, request, model_admin):
+        return [('yes', 'כן'), ('no', 'לא')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.expired()
+        if self.value() == 'no':
+            return queryset.not_expired()
+        return queryset
 
 
 @admin.register(Lead)
-class LeadAdmin(admin.ModelAdmin):
+class LeadAdmin(ScopedAdminMixin, KeysetPaginationMixin, CSVExportMixin, admin.ModelAdmin):
     list_display = [
         'lead_number', 
         'contact_name', 
@@ -17,7 +39,7 @@ class LeadAdmin(admin.ModelAdmin):
     list_filter = ['status', 'lead_source', 'assigned_to', 'country', 'is_active']
     search_fields = ['lead_number', 'contact_name', 'email', 'phone', 'city']
     readonly_fields = ['lead_number', 'created_at', 'updated_at']
-    raw_id_fields = ['customer', 'assigned_to']
+    raw_id_fields = ['customer', 'assigned_to', 'referred_by_installer']
     
     fieldsets = (
         ('פרטי ליד', {
@@ -33,7 +55,7 @@ class LeadAdmin(admin.ModelAdmin):
             'fields': ('estimated_system_size',)
         }),
         ('שיוך', {
-            'fields': ('assigned_to', 'customer')
+            'fields': ('assigned_to', 'customer', 'referred_by_installer')
         }),
         ('נוסף', {
             'fields': ('notes', 'created_at', 'updated_at'),
@@ -41,21 +63,21 @@ class LeadAdmin(admin.ModelAdmin):
         }),
     )
     
-    actions = ['mark_as_contacted', 'mark_as_lost']
-    
-    @admin.action(description='סמן כ"נוצר קשר"')
-    def mark_as_contacted(self, request, queryset):
-        from core.constants import LeadStatus
-        queryset.update(status=LeadStatus.CONTACTED)
-    
-    @admin.action(description='סמן כ"אבוד"')
-    def mark_as_lost(self, request, queryset):
-        from core.constants import LeadStatus
-        queryset.update(status=LeadStatus.LOST)
+    actions = [
+        admin_action('sales.lead.mark_as_contacted'),
+        admin_action('sales.lead.mark_as_lost'),
+        admin_action('sales.lead.route_leads'),
+        admin_action('sales.lead.deactivate_leads'),
+        'export_csv',
+    ]
+    export_fields = [
+        'lead_number', 'lead_source', 'status', 'contact_name', 'email', 'phone', 'city', 'country',
+        'estimated_system_size', 'assigned_to__username', 'created_at',
+    ]
 
 
 @admin.register(Contract)
-class ContractAdmin(admin.ModelAdmin):
+class ContractAdmin(ScopedAdminMixin, KeysetPaginationMixin, CSVExportMixin, admin.ModelAdmin):
     list_display = [
         'contract_number',
         'customer',
@@ -66,10 +88,11 @@ class ContractAdmin(admin.ModelAdmin):
         'value',
         'is_expired'
     ]
-    list_filter = ['contract_type', 'status', 'is_active']
-    search_fields = ['contract_number', 'customer__customer_number', 'customer__company_name']
-    readonly_fields = ['contract_number', 'created_at', 'updated_at', 'is_expired']
-    raw_id_fields = ['customer']
+    list_filter = ['contract_type', 'status', ExpiredListFilter, 'is_active']
+    search_fields = ['contract_number', 'customer__customer_number', 'customer__company_name', 'document_text']
+    readonly_fields = ['contract_number', 'created_at', 'updated_at', 'is_expired', 'renewal_reminder_sent_at', 'document_download']
+    raw_id_fields = ['customer', 'renewed_from']
+    list_select_related = ['customer']
     date_hierarchy = 'start_date'
     
     fieldsets = (
@@ -82,8 +105,11 @@ class ContractAdmin(admin.ModelAdmin):
         ('תנאים', {
             'fields': ('start_date', 'end_date', 'value', 'payment_terms')
         }),
+        ('חידוש', {
+            'fields': ('renewed_from', 'renewal_reminder_sent_at')
+        }),
         ('מסמכים', {
-            'fields': ('document',)
+            'fields': ('document', 'document_download')
         }),
         ('נוסף', {
             'fields': ('notes', 'created_at', 'updated_at'),
@@ -91,7 +117,62 @@ class ContractAdmin(admin.ModelAdmin):
         }),
     )
     
+    actions = [
+        admin_action('sales.contract.create_renewals'),
+        admin_action('sales.contract.deactivate_contracts'),
+        'export_csv',
+    ]
+    export_fields = [
+        'contract_number', 'contract_type', 'status', 'customer__customer_number', 'customer__customer_type',
+        'start_date', 'end_date', 'value', 'created_at',
+    ]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_expiry()
+
+    @admin.display(boolean=True, description='פג תוקף', ordering='expired')
     def is_expired(self, obj):
-        return obj.is_expired
-        is_expired.boolean = True
-        is_expired.short_description = 'פג תוקף'
\ No newline at end of file
+        # Annotated in SQL on the changelist, the model property is used on the change form
+        return getattr(obj, 'expired', obj.is_expired)
+
+    @admin.display(description='הורדת מסמך')
+    def document_download(self, obj):
+        if not obj.document:
+            return '-'
+        return format_html('<a href="{}">הורד</a>', reverse('sales:contract_document', args=[obj.pk]))
+
+
+@admin.register(Salesperson)
+class SalespersonAdmin(ScopedAdminMixin, admin.ModelAdmin):
+    list_display = ['user', 'weight', 'capacity', 'cities', 'postal_prefixes', 'lead_sources', 'is_active']
+    list_filter = ['is_active']
+    search_fields = ['user__username', 'user__first_name', 'user__last_name']
+    raw_id_fields = ['user']
+
+
+@admin.register(Tariff)
+class TariffAdmin(ScopedAdminMixin, admin.ModelAdmin):
+    list_display = ['name', 'contract_type', 'valid_from', 'monthly_fee', 'per_kwp_fee', 'per_kwh_fee']
+    list_filter = ['contract_type']
+
+
+@admin.register(Invoice)
+class InvoiceAdmin(ScopedAdminMixin, CSVExportMixin, admin.ModelAdmin):
+    list_display = [
+        'invoice_number', 'contract', 'customer', 'period', 'days_billed', 'base_amount', 'capacity_amount',
+        'production_amount', 'total', 'issued_at',
+    ]
+    list_filter = ['period', 'tariff', 'issued_at']
+    search_fields = ['invoice_number', 'contract__contract_number', 'customer__customer_number']
+    list_select_related = ['contract__customer', 'customer']
+    raw_id_fields = ['contract', 'customer', 'tariff']
+    readonly_fields = [
+        'invoice_number', 'contract', 'customer', 'tariff', 'period', 'days_billed', 'base_amount', 'capacity_kwp',
+        'capacity_amount', 'production_kwh', 'production_amount', 'total', 'issued_at', 'created_at', 'updated_at',
+    ]
+    date_hierarchy = 'period'
+    actions = [admin_action('sales.invoice.issue_invoices'), 'export_csv']
+    export_fields = [
+        'invoice_number', 'contract__contract_number', 'customer__customer_number', 'period', 'days_billed',
+        'base_amount', 'capacity_kwp', 'capacity_amount', 'production_kwh', 'production_amount', 'total', 'issued_at',
+    ]
@@ -0,0 +1,245 @@
+"""
+Monthly billing of monitoring and maintenance contracts.
+
+A period is billed in one pass over arrays - the contracts in force in the month, the tariffs,
+the installed capacity and the production of the customers' sites are each loaded with a single
+query, and the charges of all contracts are computed together in numpy. Invoices are upserted
+on (contract, period), so a period can be billed again; issued invoices are left as they are.
+
+Charges of a contract for a month, prorated by the days of the month it is in force:
+    base        the value spread by day over the contract term, or the tariff monthly fee when
+                the contract has no value or no end date
+    capacity    per_kwp_fee for every installed kWp of the customer's active sites
+    production  per_kwh_fee for every kWh the customer's sites produced on the days in force
+"""
+import calendar
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Sum
+from core.constants import ContractType
+from core.utils import generate_unique_numbers
+from .models import RENEWABLE_CONTRACT_STATUSES, Contract, Invoice, Tariff
+
+
+BILLED_TYPES = [ContractType.MONITORING, ContractType.MAINTENANCE]
+BATCH_SIZE = 1000
+IN_CHUNK_SIZE = 5000
+
+# Key of a (customer, day of the month) pair
+DAY_SLOTS = 32
+
+
+def period_bounds(period):
+    """ First and last day of the month of period """
+    first = period.replace(day=1)
+    return first, first.replace(day=calendar.monthrange(first.year, first.month)[1])
+
+
+def lookup(keys, values, query, default=0.0):
+    """ values of the sorted keys at query (numpy arrays), default where a key is missing """
+    if not len(keys):
+        return np.full(len(query), default, dtype=np.float64)
+    position = np.minimum(np.searchsorted(keys, query), len(keys) - 1)
+    return np.where(keys[position] == query, values[position], default)
+
+
+def current_tariffs(first):
+    """ {contract type: Tariff} valid at the start of the period """
+    tariffs = {}
+    for tariff in Tariff.objects.filter(contract_type__in=BILLED_TYPES, valid_from__lte=first).order_by('valid_from'):
+        tariffs[tariff.contract_type] = tariff
+    return tariffs
+
+
+def billable_contracts(first, last):
+    """ Contracts in force on a day of the period, without an issued invoice for it """
+    return Contract.objects.filter(
+        contract_type__in=BILLED_TYPES,
+        status__in=RENEWABLE_CONTRACT_STATUSES,
+        is_active=True,
+        start_date__lte=last,
+    ).filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=first)
+    ).exclude(
+        Exists(Invoice.objects.filter(contract=OuterRef('pk'), period=first, issued_at__isnull=False))
+    )
+
+
+def customer_capacity():
+    """ (customer ids, installed kWp) of the active sites, sorted """
+    from solar.models import Site
+
+    rows = (
+        Site.objects.filter(is_active=True, installed_capacity__isnull=False)
+        .values('customer_id').annotate(kwp=Sum('installed_capacity')).order_by('customer_id')
+        .values_list('customer_id', 'kwp')
+    )
+    rows = list(rows)
+    return (
+        np.array([row[0] for row in rows], dtype=np.int64),
+        np.array([float(row[1]) for row in rows], dtype=np.float64),
+    )
+
+
+def customer_production(first, last):
+    """ (customer ids, kWh) of the whole period, sorted """
+    from monitoring.models import DailyProduction
+
+    rows = list(
+        DailyProduction.objects.filter(date__gte=first, date__lte=last)
+        .values('site__customer_id').annotate(kwh=Sum('energy_kwh')).order_by('site__customer_id')
+        .values_list('site__customer_id', 'kwh')
+    )
+    return np.array([row[0] for row in rows], dtype=np.int64), np.array([row[1] for row in rows], dtype=np.float64)
+
+
+def daily_production(first, last, customer_ids):
+    """ (sorted (customer, day) keys, cumulative kWh with a leading 0) of some customers """
+    from monitoring.models import DailyProduction
+
+    rows = []
+    for start in range(0, len(customer_ids), IN_CHUNK_SIZE):
+        rows += DailyProduction.objects.filter(
+            date__gte=first, date__lte=last, site__customer_id__in=customer_ids[start:start + IN_CHUNK_SIZE],
+        ).values('site__customer_id', 'date').annotate(kwh=Sum('energy_kwh')).order_by().values_list(
+            'site__customer_id', 'date', 'kwh'
+        )
+    keys = np.array([customer * DAY_SLOTS + (day - first).days for customer, day, _ in rows], dtype=np.int64)
+    kwh = np.array([row[2] for row in rows], dtype=np.float64)
+    order = np.argsort(keys)
+    return keys[order], np.concatenate([[0.0], np.cumsum(kwh[order])])
+
+
+def compute(contracts, first, last, tariffs):
+    """
+    Charges of contracts (rows of id, customer, type, start, end, value) for the period.
+    returns a dict of arrays, one element per contract
+    """
+    types = list(tariffs)
+    contract_id = np.array([row[0] for row in contracts], dtype=np.int64)
+    customer_id = np.array([row[1] for row in contracts], dtype=np.int64)
+    type_index = np.array([types.index(row[2]) for row in contracts], dtype=np.int64)
+    start = np.array([row[3].toordinal() for row in contracts], dtype=np.int64)
+    end = np.array([row[4].toordinal() if row[4] else -1 for row in contracts], dtype=np.int64)
+    value = np.array([float(row[5]) if row[5] is not None else np.nan for row in contracts], dtype=np.float64)
+
+    def fee(name):
+        return np.array([float(getattr(tariffs[t], name)) for t in types], dtype=np.float64)[type_index]
+
+    first_day, last_day = first.toordinal(), last.toordinal()
+    month_days = last_day - first_day + 1
+    open_ended = end < 0
+    covered_from = np.maximum(start, first_day)
+    covered_to = np.where(open_ended, last_day, np.minimum(end, last_day))
+    days = covered_to - covered_from + 1
+    fraction = days / month_days
+
+    spread = ~np.isnan(value) & ~open_ended
+    term_days = np.where(spread, end - start + 1, 1)
+    base = np.where(spread, np.nan_to_num(value) * days / term_days, fee('monthly_fee') * fraction)
+
+    capacity_customers, capacity_kwp = customer_capacity()
+    kwp = lookup(capacity_customers, capacity_kwp, customer_id)
+    capacity = fee('per_kwp_fee') * kwp * fraction
+
+    production_customers, production_kwh = customer_production(first, last)
+    kwh = lookup(production_customers, production_kwh, customer_id)
+    partial = np.flatnonzero(days < month_days)
+    if len(partial):
+        # Production of the days in force only, from running totals per customer and day
+        keys, running = daily_production(first, last, np.unique(customer_id[partial]).tolist())
+        low = customer_id[partial] * DAY_SLOTS + (covered_from[partial] - first_day)
+        high = customer_id[partial] * DAY_SLOTS + (covered_to[partial] - first_day)
+        kwh[partial] = running[np.searchsorted(keys, high, 'right')] - running[np.searchsorted(keys, low, 'left')]
+    production = fee('per_kwh_fee') * kwh
+
+    base, capacity, production = np.round(base, 2), np.round(capacity, 2), np.round(production, 2)
+    return {
+        'contract_id': contract_id,
+        'customer_id': customer_id,
+        'type_index': type_index,
+        'days': days,
+        'base': base,
+        'kwp': kwp,
+        'capacity': capacity,
+        'kwh': kwh,
+        'production': production,
+        'total': np.round(base + capacity + production, 2),
+    }
+
+
+def money(value):
+    return Decimal(f'{value:.2f}')
+
+
+def bill(period, log=print):
+    """
+    Compute and upsert the invoices of a month (any day of it).
+    returns (invoices written, stale invoices deleted)
+    """
+    first, last = period_bounds(period)
+    tariffs = current_tariffs(first)
+    contracts = billable_contracts(first, last)
+    without_tariff = contracts.exclude(contract_type__in=list(tariffs)).count()
+    if without_tariff:
+        log(f'{without_tariff} contracts have no tariff for {first:%Y-%m} and are not billed')
+    rows = list(
+        contracts.filter(contract_type__in=list(tariffs)).order_by('pk')
+        .values_list('pk', 'customer_id', 'contract_type', 'start_date', 'end_date', 'value')
+    )
+
+    charges = compute(rows, first, last, tariffs) if rows else None
+    billed = set(charges['contract_id'].tolist()) if rows else set()
+    existing = dict(Invoice.objects.filter(period=first).values_list('contract_id', 'invoice_number'))
+    new_count = len(billed - set(existing))
+
+    with transaction.atomic():
+        # Invoices of contracts no longer billed for the period, e.g. cancelled since the last run
+        stale = [
+            contract_id for contract_id in existing
+            if contract_id not in billed
+        ]
+        deleted = 0
+        for start in range(0, len(stale), IN_CHUNK_SIZE):
+            deleted += Invoice.objects.filter(
+                period=first, issued_at__isnull=True, contract_id__in=stale[start:start + IN_CHUNK_SIZE]
+            ).delete()[0]
+        if not rows:
+            return 0, deleted
+
+        numbers = iter(generate_unique_numbers('INV', Invoice, 'invoice_number', new_count))
+        tariff_ids = [tariffs[t].pk for t in tariffs]
+        invoices = [
+            Invoice(
+                invoice_number=existing.get(contract_id) or next(numbers),
+                contract_id=contract_id,
+                customer_id=customer_id,
+                tariff_id=tariff_ids[type_index],
+                period=first,
+                days_billed=days,
+                base_amount=money(base),
+                capacity_kwp=kwp,
+                capacity_amount=money(capacity),
+                production_kwh=kwh,
+                production_amount=money(production),
+                total=money(total),
+            )
+            for contract_id, customer_id, type_index, days, base, kwp, capacity, kwh, production, total in zip(
+                *(charges[name].tolist() for name in (
+                    'contract_id', 'customer_id', 'type_index', 'days', 'base', 'kwp', 'capacity', 'kwh', 'production', 'total'
+                ))
+            )
+        ]
+        Invoice.objects.bulk_create(
+            invoices,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['contract', 'period'],
+            update_fields=[
+                'customer', 'tariff', 'days_billed', 'base_amount', 'capacity_kwp', 'capacity_amount',
+                'production_kwh', 'production_amount', 'total', 'updated_at',
+            ],
+        )
+    return len(invoices), deleted
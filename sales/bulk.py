@@ -0,0 +1,61 @@
+from django.utils import timezone
+from core import bulk
+from core.constants import LeadStatus
+from crm.scorecards import Deltas, lead_deltas, record_many
+
+
+def set_lead_status(queryset, status):
+    """ Update the status of leads, with the conversions on the installer scorecards kept in step """
+    deltas = Deltas()
+    referred = queryset.filter(referred_by_installer__isnull=False).exclude(status=status)
+    for installer_id, old_status, created_at in referred.values_list('referred_by_installer_id', 'status', 'created_at'):
+        lead_deltas(deltas, (installer_id, old_status == LeadStatus.WON), created_at, -1)
+        lead_deltas(deltas, (installer_id, status == LeadStatus.WON), created_at, 1)
+    changed = queryset.exclude(status=status).update(status=status, updated_at=timezone.now())
+    record_many(deltas)
+    return changed
+
+
+@bulk.register('sales.Lead', 'סמן כ"נוצר קשר"')
+def mark_as_contacted(queryset):
+    return set_lead_status(queryset, LeadStatus.CONTACTED)
+
+
+@bulk.register('sales.Lead', 'סמן כ"אבוד"')
+def mark_as_lost(queryset):
+    return set_lead_status(queryset, LeadStatus.LOST)
+
+
+@bulk.register('sales.Lead', 'שייך לידים לאנשי מכירות')
+def route_leads(queryset):
+    from .routing import assign
+
+    leads = list(queryset.filter(assigned_to__isnull=True).only('pk', 'status', 'is_active', 'lead_source', 'city', 'postal_code'))
+    assign(leads)
+    leads = [lead for lead in leads if lead.assigned_to_id is not None]
+    for lead in leads:
+        lead.updated_at = timezone.now()
+    queryset.model.objects.bulk_update(leads, ['assigned_to', 'updated_at'])
+    return len(leads)
+
+
+@bulk.register('sales.Lead', 'השבת לידים')
+def deactivate_leads(queryset):
+    return queryset.filter(is_active=True).update(is_active=False, updated_at=timezone.now())
+
+
+@bulk.register('sales.Contract', 'צור טיוטת חידוש', chunk_size=200)
+def create_renewals(queryset):
+    # Numbers of a chunk are allocated at once by generate_unique_numbers
+    return len(queryset.create_renewals())
+
+
+@bulk.register('sales.Contract', 'השבת חוזים')
+def deactivate_contracts(queryset):
+    return queryset.filter(is_active=True).update(is_active=False, updated_at=timezone.now())
+
+
+@bulk.register('sales.Invoice', 'הנפק חשבוניות')
+def issue_invoices(queryset):
+    # Issued invoices are not recomputed by billing again
+    return queryset.filter(issued_at__isnull=True).update(issued_at=timezone.now(), updated_at=timezone.now())
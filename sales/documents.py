@@ -0,0 +1,18 @@
+def extract_text(field_file):
+    """
+    Extract searchable text from a contract document.
+    PDF text needs the optional pypdf package, other files are read as UTF-8 text.
+    Pages are read one at a time so large documents are not loaded as a whole.
+    """
+    name = field_file.name.lower()
+    with field_file.storage.open(field_file.name, 'rb') as f:
+        if name.endswith('.pdf'):
+            try:
+                import pypdf
+            except ImportError:
+                return ''
+            reader = pypdf.PdfReader(f)
+            return '\n'.join(page.extract_text() or '' for page in reader.pages)
+        if name.endswith('.txt'):
+            return f.read().decode('utf-8', errors='ignore')
+    return ''
@@ -0,0 +1,25 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Compute the monthly invoices of the monitoring and maintenance contracts (run monthly, safe to run again)'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period', type=lambda value: date.fromisoformat(f'{value}-01'), help='Month to bill, YYYY-MM (default: last month)'
+        )
+
+    def handle(self, *args, **options):
+        from django.utils import timezone
+        from sales.billing import bill
+
+        period = options['period'] or (timezone.localdate().replace(day=1) - timedelta(days=1))
+        start = time.perf_counter()
+        written, deleted = bill(period, log=self.stdout.write)
+        self.stdout.write(
+            f'{written} invoices written, {deleted} stale removed for {period:%Y-%m} in {time.perf_counter() - start:.1f}s'
+        )
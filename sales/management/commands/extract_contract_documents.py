@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sales.models import Contract
+
+
+class Command(BaseCommand):
+    help = 'Extract searchable text from new contract documents (run periodically in the background)'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        from sales.documents import extract_text
+
+        pending = Contract.objects.filter(document_processed_at__isnull=True).exclude(document='')
+        processed = 0
+
+        while True:
+            batch = list(pending.order_by('pk')[:options['batch_size']])
+            if not batch:
+                break
+
+            # Deduplicated documents share a hash, reuse text extracted for an earlier copy
+            known = dict(
+                Contract.objects.filter(
+                    document_sha256__in={c.document_sha256 for c in batch},
+                    document_processed_at__isnull=False,
+                ).values_list('document_sha256', 'document_text')
+            )
+
+            now = timezone.now()
+            for contract in batch:
+                if contract.document_sha256 not in known:
+                    known[contract.document_sha256] = extract_text(contract.document)
+                contract.document_text = known[contract.document_sha256]
+                contract.document_processed_at = now
+
+            Contract.objects.bulk_update(batch, ['document_text', 'document_processed_at'])
+            processed += len(batch)
+
+        self.stdout.write(f'{processed} contract documents processed')
@@ -0,0 +1,50 @@
+from django.core.mail import send_mass_mail
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.labels import display_rows
+from sales.models import Contract
+
+
+REMINDER_SUBJECT = 'תזכורת לחידוש חוזה {contract_type} {number}'
+REMINDER_BODY = (
+    'שלום {name},\n\n'
+    'חוזה {contract_type} {number} מסתיים בתאריך {end_date:%d/%m/%Y}.\n'
+    'נציגנו ייצרו עמך קשר לחידוש ההתקשרות.\n'
+)
+
+
+class Command(BaseCommand):
+    help = 'Create renewal drafts and send reminders for contracts that expire soon (run daily)'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Days ahead to look for expiring contracts')
+        parser.add_argument('--no-email', action='store_true', help='Create drafts without sending reminders')
+
+    def handle(self, *args, **options):
+        expiring = Contract.active.expiring_within(options['days'])
+
+        renewals = expiring.create_renewals()
+        self.stdout.write(f'{len(renewals)} renewal drafts created')
+
+        if options['no_email']:
+            return
+
+        pending = expiring.filter(renewal_reminder_sent_at__isnull=True).exclude(customer__email='')
+        fields = ('pk', 'contract_number', 'contract_type', 'end_date', 'customer__email', 'customer__name', 'customer__company_name')
+        rows = list(display_rows(pending.values_list(*fields), Contract, fields))
+        messages = [
+            (
+                REMINDER_SUBJECT.format(contract_type=contract_type, number=number),
+                REMINDER_BODY.format(
+                    name=name or company_name, contract_type=contract_type, number=number, end_date=end_date
+                ),
+                None,
+                [email],
+            )
+            for _, number, contract_type, end_date, email, name, company_name in rows
+        ]
+        sent = send_mass_mail(messages, fail_silently=False) if messages else 0
+
+        Contract.objects.filter(pk__in=[row[0] for row in rows]).update(renewal_reminder_sent_at=timezone.now())
+        self.stdout.write(f'{sent} renewal reminders sent')
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0002_alter_contact_options_remove_contact_name_and_more'),
+        ('sales', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='renewal_reminder_sent_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='תזכורת חידוש נשלחה'),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='renewed_from',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='renewals', to='sales.contract', verbose_name='חידוש של חוזה'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['status', 'end_date'], name='contract_status_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['end_date'], name='contract_end_date_idx'),
+        ),
+    ]
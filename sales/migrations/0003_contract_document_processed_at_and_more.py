@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:21
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0002_contract_renewal_reminder_sent_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='document_processed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='document_sha256',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='document_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='גודל מסמך'),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='document_text',
+            field=models.TextField(blank=True, editable=False, verbose_name='תוכן מסמך'),
+        ),
+        migrations.AlterField(
+            model_name='contract',
+            name='document',
+            field=models.FileField(blank=True, storage=core.storage.ContentAddressedStorage(), upload_to='contracts/', verbose_name='מסמך חוזה'),
+        ),
+    ]
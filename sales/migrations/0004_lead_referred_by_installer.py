@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0004_installerscorecard'),
+        ('sales', '0003_contract_document_processed_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='referred_by_installer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='referred_leads', to='crm.installer', verbose_name='הופנה ע"י מתקין'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0005_customer_customer_created_idx'),
+        ('sales', '0004_lead_referred_by_installer'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['created_at', 'id'], name='contract_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['created_at', 'id'], name='lead_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0005_contract_contract_created_idx_lead_lead_created_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lead',
+            name='status',
+            field=models.CharField(choices=[('new', 'חדש'), ('contacted', 'נוצר קשר'), ('quote', 'הצעת מחיר'), ('won', 'הומר'), ('lost', 'אבוד')], default='new', max_length=20, verbose_name='סטטוס'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 6.0.1 on 2026-10-19 17:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0006_alter_customer_id_number'),
+        ('sales', '0006_alter_lead_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tariff',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('contract_type', models.CharField(choices=[('monitoring', 'ניטור'), ('leads', 'לידים'), ('maintenance', 'תחזוקה')], max_length=20, verbose_name='סוג חוזה')),
+                ('name', models.CharField(max_length=100, verbose_name='שם')),
+                ('valid_from', models.DateField(verbose_name='בתוקף מ')),
+                ('monthly_fee', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='דמי מנוי חודשיים')),
+                ('per_kwp_fee', models.DecimalField(decimal_places=4, default=0, max_digits=10, verbose_name='תעריף לקילוואט מותקן')),
+                ('per_kwh_fee', models.DecimalField(decimal_places=4, default=0, max_digits=10, verbose_name='תעריף לקוט"ש מיוצר')),
+            ],
+            options={
+                'verbose_name': 'תעריף',
+                'verbose_name_plural': 'תעריפים',
+                'ordering': ['contract_type', '-valid_from'],
+                'constraints': [models.UniqueConstraint(fields=('contract_type', 'valid_from'), name='tariff_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Invoice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('invoice_number', models.CharField(editable=False, max_length=20, unique=True, verbose_name='מספר חשבונית')),
+                ('period', models.DateField(verbose_name='תקופה')),
+                ('days_billed', models.PositiveSmallIntegerField(verbose_name='ימים לחיוב')),
+                ('base_amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='חיוב בסיס')),
+                ('capacity_kwp', models.FloatField(default=0, verbose_name='הספק מותקן (kWp)')),
+                ('capacity_amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='חיוב לפי הספק')),
+                ('production_kwh', models.FloatField(default=0, verbose_name='ייצור (kWh)')),
+                ('production_amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='חיוב לפי ייצור')),
+                ('total', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='סה"כ')),
+                ('issued_at', models.DateTimeField(blank=True, null=True, verbose_name='הונפקה')),
+                ('contract', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='invoices', to='sales.contract', verbose_name='חוזה')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='invoices', to='crm.customer', verbose_name='לקוח')),
+                ('tariff', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='invoices', to='sales.tariff', verbose_name='תעריף')),
+            ],
+            options={
+                'verbose_name': 'חשבונית',
+                'verbose_name_plural': 'חשבוניות',
+                'ordering': ['-period', 'invoice_number'],
+                'indexes': [models.Index(fields=['period', 'customer'], name='invoice_period_customer_idx')],
+                'constraints': [models.UniqueConstraint(fields=('contract', 'period'), name='invoice_contract_period_unique')],
+            },
+        ),
+    ]
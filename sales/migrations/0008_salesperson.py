@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-19 17:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0007_tariff_invoice'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Salesperson',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('weight', models.PositiveSmallIntegerField(default=1, verbose_name='משקל')),
+                ('capacity', models.PositiveIntegerField(blank=True, help_text='ריק - ללא הגבלה', null=True, verbose_name='מקסימום לידים פתוחים')),
+                ('cities', models.JSONField(blank=True, default=list, verbose_name='ערים')),
+                ('postal_prefixes', models.JSONField(blank=True, default=list, verbose_name='קידומות מיקוד')),
+                ('lead_sources', models.JSONField(blank=True, default=list, verbose_name='מקורות ליד')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='salesperson', to=settings.AUTH_USER_MODEL, verbose_name='משתמש')),
+            ],
+            options={
+                'verbose_name': 'איש מכירות',
+                'verbose_name_plural': 'אנשי מכירות',
+                'ordering': ['user__username'],
+            },
+        ),
+    ]
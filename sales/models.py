@@ -1,9 +1,13 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import models, transaction
 from django.conf import settings
-from core.models import ActiveModel, AddressMixin
+from django.utils import timezone
+from core.models import ActiveModel, ActiveManager, AddressMixin, BaseModel, ChangeFeedQuerySet
 from core.constants import LeadStatus, ContractType, ContractStatus, LeadSource
+from core.storage import ContentAddressedStorage
 from core.validators import phone_validator
-from core.utils import generate_unique_number
+from core.utils import generate_unique_number, generate_unique_numbers
 
 
 class Lead(ActiveModel, AddressMixin):
@@ -64,12 +68,27 @@ class Lead(ActiveModel, AddressMixin):
         related_name='leads',
         verbose_name='לקוח (לאחר המרה)'
     )
+    referred_by_installer = models.ForeignKey(
+        'crm.Installer',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='referred_leads',
+        verbose_name='הופנה ע"י מתקין'
+    )
     notes = models.TextField(blank=True, verbose_name='הערות')
 
+    objects = ChangeFeedQuerySet.as_manager()
+    active = ActiveManager.from_queryset(ChangeFeedQuerySet)()
+
     class Meta:
         verbose_name = 'ליד'
         verbose_name_plural = 'לידים'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the changelist (core.pagination)
+            models.Index(fields=['created_at', 'id'], name='lead_created_idx'),
+        ]
 
     def __str__(self):
         return f'{self.lead_number} | {self.contact_name}'
@@ -77,6 +96,9 @@ class Lead(ActiveModel, AddressMixin):
     def save(self, *args, **kwargs):
         if not self.lead_number:
             self.lead_number = generate_unique_number('LED', Lead, 'lead_number')
+        if self._state.adding and self.assigned_to_id is None and getattr(settings, 'LEAD_AUTO_ASSIGN', True):
+            from .routing import assign
+            assign([self])
         super().save(*args, **kwargs)
 
 
@@ -89,7 +111,14 @@ class Lead(ActiveModel, AddressMixin):
         
         if self.customer:
             return self.customer
-        
+
+        existing = Customer.find_match(name=self.contact_name, phone=self.phone, email=self.email)
+        if existing:
+            self.customer = existing
+            self.status = LeadStatus.WON
+            self.save()
+            return existing
+
         # יצירת לקוח
         customer = Customer.objects.create(
             name=self.contact_name,
@@ -123,6 +152,124 @@ class Lead(ActiveModel, AddressMixin):
         return customer
 
 
+class Salesperson(ActiveModel):
+    """
+    Routing profile of a user that leads are assigned to (sales.routing) - regions, sources and capacity
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='salesperson',
+        verbose_name='משתמש'
+    )
+    weight = models.PositiveSmallIntegerField(default=1, verbose_name='משקל')
+    capacity = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='מקסימום לידים פתוחים',
+        help_text='ריק - ללא הגבלה'
+    )
+    # Empty lists match every lead
+    cities = models.JSONField(default=list, blank=True, verbose_name='ערים')
+    postal_prefixes = models.JSONField(default=list, blank=True, verbose_name='קידומות מיקוד')
+    lead_sources = models.JSONField(default=list, blank=True, verbose_name='מקורות ליד')
+
+    class Meta:
+        verbose_name = 'איש מכירות'
+        verbose_name_plural = 'אנשי מכירות'
+        ordering = ['user__username']
+
+    def __str__(self):
+        return str(self.user)
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+
+        for field in ('cities', 'postal_prefixes', 'lead_sources'):
+            value = getattr(self, field)
+            if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                raise ValidationError({field: 'יש להזין רשימה של ערכים'})
+        unknown = set(self.lead_sources) - set(LeadSource.values)
+        if unknown:
+            raise ValidationError({'lead_sources': f'מקור ליד לא מוכר: {", ".join(sorted(unknown))}'})
+
+    def save(self, *args, **kwargs):
+        from .routing import invalidate
+
+        super().save(*args, **kwargs)
+        invalidate()
+
+
+# Contracts that are in force and can be renewed
+RENEWABLE_CONTRACT_STATUSES = [ContractStatus.APPROVED]
+
+
+class ContractQuerySet(ChangeFeedQuerySet):
+
+    def with_expiry(self, today=None):
+        """ Annotate is_expired in SQL so it can be filtered and sorted on """
+        today = today or timezone.localdate()
+        return self.annotate(
+            expired=models.Case(
+                models.When(end_date__lt=today, then=models.Value(True)),
+                default=models.Value(False),
+                output_field=models.BooleanField(),
+            )
+        )
+
+    def expired(self, today=None):
+        return self.filter(end_date__lt=today or timezone.localdate())
+
+    def not_expired(self, today=None):
+        return self.filter(models.Q(end_date__isnull=True) | models.Q(end_date__gte=today or timezone.localdate()))
+
+    def expiring_within(self, days, today=None):
+        """
+        Contracts in force that end in the next days.
+        Served by contract_status_end_idx as a range scan on end_date.
+        """
+        today = today or timezone.localdate()
+        return self.filter(
+            status__in=RENEWABLE_CONTRACT_STATUSES,
+            end_date__gte=today,
+            end_date__lte=today + timedelta(days=days),
+        )
+
+    def without_renewal(self):
+        return self.filter(renewals__isnull=True)
+
+    def create_renewals(self):
+        """
+        Create a REVISE draft for every contract in the queryset that is in force and was not
+        renewed yet - drafts, sent, lost and REVISE contracts are skipped.
+        The draft continues the day after the original ends, for the same duration.
+        returns the created contracts
+        """
+        originals = list(
+            self.without_renewal().filter(status__in=RENEWABLE_CONTRACT_STATUSES, end_date__isnull=False).order_by('pk')
+        )
+        if not originals:
+            return []
+
+        with transaction.atomic():
+            numbers = generate_unique_numbers('CON', Contract, 'contract_number', len(originals))
+            renewals = []
+            for number, original in zip(numbers, originals):
+                start_date = original.end_date + timedelta(days=1)
+                renewals.append(Contract(
+                    contract_number=number,
+                    contract_type=original.contract_type,
+                    status=ContractStatus.REVISE,
+                    customer_id=original.customer_id,
+                    start_date=start_date,
+                    end_date=start_date + (original.end_date - original.start_date),
+                    value=original.value,
+                    payment_terms=original.payment_terms,
+                    renewed_from=original,
+                ))
+            return Contract.objects.bulk_create(renewals)
+
+
 class Contract(ActiveModel):
     """
     contract made with a potential customer or lead
@@ -165,19 +312,44 @@ class Contract(ActiveModel):
     )
     payment_terms = models.TextField(blank=True, verbose_name='תנאי תשלום')
 
+    # Renewal
+    renewed_from = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='renewals',
+        verbose_name='חידוש של חוזה'
+    )
+    renewal_reminder_sent_at = models.DateTimeField(null=True, blank=True, verbose_name='תזכורת חידוש נשלחה')
+
     # Files
     document = models.FileField(
         upload_to='contracts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         verbose_name='מסמך חוזה'
     )
+    document_sha256 = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
+    document_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False, verbose_name='גודל מסמך')
+    document_text = models.TextField(blank=True, editable=False, verbose_name='תוכן מסמך')
+    document_processed_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     notes = models.TextField(blank=True, verbose_name='הערות')
 
+    objects = ContractQuerySet.as_manager()
+    active = ActiveManager.from_queryset(ContractQuerySet)()
+
     class Meta:
         verbose_name = 'חוזה'
         verbose_name_plural = 'חוזים'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'end_date'], name='contract_status_end_idx'),
+            models.Index(fields=['end_date'], name='contract_end_date_idx'),
+            # Keyset pagination of the changelist (core.pagination)
+            models.Index(fields=['created_at', 'id'], name='contract_created_idx'),
+        ]
 
     def __str__(self):
         return f'{self.contract_number} | {self.customer}'
@@ -185,17 +357,93 @@ class Contract(ActiveModel):
     def save(self, *args, **kwargs):
         if not self.contract_number:
             self.contract_number = generate_unique_number('CON', Contract, 'contract_number')
+        self._update_document_info()
         super().save(*args, **kwargs)
 
+    def _update_document_info(self):
+        """ Store the document in storage first so its content hash is known before the row is written """
+        if not self.document:
+            self.document_sha256 = ''
+            self.document_size = None
+            return
+
+        if not self.document._committed:
+            self.document.save(self.document.name, self.document.file, save=False)
+
+        digest = ContentAddressedStorage.digest_from_name(self.document.name)
+        if digest != self.document_sha256:
+            self.document_sha256 = digest
+            self.document_size = self.document.size
+            self.document_text = ''
+            self.document_processed_at = None
+
     @property
     def is_expired(self):
         if not self.end_date:
             return False
-        from django.utils import timezone
-        return self.end_date < timezone.now().date()
+        return self.end_date < timezone.localdate()
 
     @property
     def duration_days(self):
         if not self.end_date:
             return None
-        return (self.end_date - self.start_date).days
\ No newline at end of file
+        return (self.end_date - self.start_date).days
+
+
+class Tariff(BaseModel):
+    """
+    Monthly fees of a contract type from valid_from on, the latest one valid at the start of a
+    billing period applies (sales.billing)
+    """
+    contract_type = models.CharField(max_length=20, choices=ContractType.choices, verbose_name='סוג חוזה')
+    name = models.CharField(max_length=100, verbose_name='שם')
+    valid_from = models.DateField(verbose_name='בתוקף מ')
+    # Contracts without a value pay the monthly fee
+    monthly_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='דמי מנוי חודשיים')
+    per_kwp_fee = models.DecimalField(max_digits=10, decimal_places=4, default=0, verbose_name='תעריף לקילוואט מותקן')
+    per_kwh_fee = models.DecimalField(max_digits=10, decimal_places=4, default=0, verbose_name='תעריף לקוט"ש מיוצר')
+
+    class Meta:
+        verbose_name = 'תעריף'
+        verbose_name_plural = 'תעריפים'
+        ordering = ['contract_type', '-valid_from']
+        constraints = [
+            models.UniqueConstraint(fields=['contract_type', 'valid_from'], name='tariff_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.get_contract_type_display()}, {self.valid_from})'
+
+
+class Invoice(BaseModel):
+    """
+    Monthly charge of a contract, computed by the bill_contracts command (sales.billing).
+    Billing a period again recomputes its invoices until they are issued.
+    """
+    invoice_number = models.CharField(max_length=20, unique=True, editable=False, verbose_name='מספר חשבונית')
+    contract = models.ForeignKey(Contract, on_delete=models.PROTECT, related_name='invoices', verbose_name='חוזה')
+    customer = models.ForeignKey('crm.Customer', on_delete=models.PROTECT, related_name='invoices', verbose_name='לקוח')
+    tariff = models.ForeignKey(Tariff, on_delete=models.PROTECT, related_name='invoices', verbose_name='תעריף')
+    period = models.DateField(verbose_name='תקופה')
+    days_billed = models.PositiveSmallIntegerField(verbose_name='ימים לחיוב')
+    base_amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='חיוב בסיס')
+    capacity_kwp = models.FloatField(default=0, verbose_name='הספק מותקן (kWp)')
+    capacity_amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='חיוב לפי הספק')
+    production_kwh = models.FloatField(default=0, verbose_name='ייצור (kWh)')
+    production_amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='חיוב לפי ייצור')
+    total = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='סה"כ')
+    issued_at = models.DateTimeField(null=True, blank=True, verbose_name='הונפקה')
+
+    class Meta:
+        verbose_name = 'חשבונית'
+        verbose_name_plural = 'חשבוניות'
+        ordering = ['-period', 'invoice_number']
+        constraints = [
+            models.UniqueConstraint(fields=['contract', 'period'], name='invoice_contract_period_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'customer'], name='invoice_period_customer_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.invoice_number} | {self.period:%Y-%m} | {self.total}'
@@ -0,0 +1,166 @@
+"""
+Automatic assignment of leads to salespeople.
+
+A lead goes to the salespeople of the most specific pool that has room - its postal code
+prefixes (longest first), then its city, then everyone - for its lead source first and then for
+any source. Inside a pool the pick is weighted round-robin on the open-lead load: the least
+load / weight, and among equals the one assigned to longest ago. Salespeople at capacity are
+skipped.
+
+The pools are heaps over an in-memory load index, so an assignment is O(log n) with no query.
+Loads only grow between reconciliations, so a heap entry that is out of date is an
+underestimate, and it is refreshed when it reaches the top. The index is rebuilt from the
+database (one grouped COUNT) every RECONCILE_INTERVAL seconds. The rebuild picks up closed and
+reassigned leads, profile changes and the assignments of other processes.
+"""
+import heapq
+import itertools
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count
+from core.constants import LeadStatus
+
+
+OPEN_STATUSES = [LeadStatus.NEW, LeadStatus.CONTACTED, LeadStatus.QUOTE]
+RECONCILE_INTERVAL = getattr(settings, 'LEAD_ROUTING_RECONCILE_INTERVAL', 60)
+
+# Pool key part of salespeople without a region or source preference
+ANY = ''
+
+
+def city_key(city):
+    return 'city:' + ' '.join(city.split()).casefold()
+
+
+def postal_digits(postal_code):
+    return ''.join(c for c in postal_code if c.isdigit())
+
+
+class Candidate:
+    """ A salesperson in the load index """
+    __slots__ = ('user_id', 'weight', 'capacity', 'load', 'turn')
+
+    def __init__(self, user_id, weight, capacity, load, turn):
+        self.user_id = user_id
+        self.weight = max(weight, 1)
+        self.capacity = capacity
+        self.load = load
+        self.turn = turn
+
+    @property
+    def full(self):
+        return self.capacity is not None and self.load >= self.capacity
+
+    def entry(self):
+        return (self.load / self.weight, self.turn, self.user_id)
+
+
+class LoadIndex:
+    """ Open-lead load of the salespeople and their pools, {(region, source): heap of entries} """
+
+    def __init__(self):
+        self.candidates = {}
+        self.pools = {}
+        self.prefix_lengths = []
+        self.turns = itertools.count()
+        self.reconciled_at = None
+        self.lock = threading.Lock()
+
+    def stale(self):
+        return self.reconciled_at is None or time.monotonic() - self.reconciled_at >= RECONCILE_INTERVAL
+
+    def reconcile(self):
+        """ Rebuild from the salesperson profiles and the open leads in the database """
+        from .models import Lead, Salesperson
+
+        loads = dict(
+            Lead.active.filter(status__in=OPEN_STATUSES, assigned_to__isnull=False)
+            .values('assigned_to').annotate(count=Count('pk')).order_by().values_list('assigned_to', 'count')
+        )
+        candidates = {}
+        pools = {}
+        prefix_lengths = set()
+        profiles = Salesperson.active.filter(user__is_active=True).values_list(
+            'user_id', 'weight', 'capacity', 'cities', 'postal_prefixes', 'lead_sources'
+        ).order_by('pk')
+        for user_id, weight, capacity, cities, postal_prefixes, lead_sources in profiles:
+            candidate = candidates[user_id] = Candidate(user_id, weight, capacity, loads.get(user_id, 0), next(self.turns))
+            prefixes = [postal_digits(prefix) for prefix in postal_prefixes or []]
+            prefix_lengths.update(len(prefix) for prefix in prefixes if prefix)
+            regions = ['zip:' + prefix for prefix in prefixes if prefix] + [city_key(city) for city in cities or [] if city.strip()]
+            for region in regions or [ANY]:
+                for source in lead_sources or [ANY]:
+                    pools.setdefault((region, source), []).append(candidate.entry())
+        for pool in pools.values():
+            heapq.heapify(pool)
+        self.candidates, self.pools = candidates, pools
+        self.prefix_lengths = sorted(prefix_lengths, reverse=True)
+        self.reconciled_at = time.monotonic()
+
+    def pool_keys(self, lead):
+        """ Pools of a lead, most specific first """
+        regions = []
+        digits = postal_digits(lead.postal_code or '')
+        regions += ['zip:' + digits[:length] for length in self.prefix_lengths if length <= len(digits)]
+        if lead.city and lead.city.strip():
+            regions.append(city_key(lead.city))
+        regions.append(ANY)
+        sources = [lead.lead_source, ANY] if lead.lead_source else [ANY]
+        return [(region, source) for region in regions for source in sources]
+
+    def pick(self, pool):
+        """ The next candidate of a pool, its entry at the top of the heap; None when all are full """
+        while pool:
+            *key, user_id = pool[0]
+            candidate = self.candidates[user_id]
+            if candidate.full:
+                # Left out of the pool until the next reconciliation
+                heapq.heappop(pool)
+                continue
+            entry = candidate.entry()
+            if tuple(key) != entry[:2]:
+                heapq.heapreplace(pool, entry)
+                continue
+            return candidate
+        return None
+
+    def assign(self, lead):
+        """ Set assigned_to of a lead, returns the user id or None when nobody has room """
+        for key in self.pool_keys(lead):
+            pool = self.pools.get(key)
+            if not pool:
+                continue
+            candidate = self.pick(pool)
+            if candidate is None:
+                continue
+            candidate.load += 1
+            candidate.turn = next(self.turns)
+            heapq.heapreplace(pool, candidate.entry())
+            lead.assigned_to_id = candidate.user_id
+            return candidate.user_id
+        return None
+
+
+index = LoadIndex()
+
+
+def assign(leads):
+    """
+    Assign the unassigned open leads of an iterable (unsaved or not - nothing is written).
+    returns the number of leads assigned
+    """
+    assigned = 0
+    with index.lock:
+        if index.stale():
+            index.reconcile()
+        for lead in leads:
+            if lead.assigned_to_id is None and lead.is_active and lead.status in OPEN_STATUSES:
+                assigned += index.assign(lead) is not None
+    return assigned
+
+
+def invalidate():
+    """ Rebuild the index on the next assignment, e.g. after salesperson profiles changed """
+    index.reconciled_at = None
@@ -1,3 +1,51 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import date
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from accounts.models import Profile
+from core.constants import UserRole
+from crm.models import Customer, Installer
+from solar.models import Site
+from .models import Contract
+
+
+class ContractDocumentTest(TestCase):
+    """ Installer users download the contracts of their own customers only """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+        installer = Installer.objects.create(company_name='מתקין')
+        other_installer = Installer.objects.create(company_name='מתקין אחר')
+        self.own = self.contract_of(installer, 'לקוח')
+        self.other = self.contract_of(other_installer, 'לקוח אחר')
+
+        self.user = get_user_model().objects.create_user('installer', password='password', is_staff=True)
+        Profile.objects.create(user=self.user, role=UserRole.ANALYST, installer=installer)
+        self.client.force_login(self.user)
+
+    @staticmethod
+    def contract_of(installer, name):
+        customer = Customer.objects.create(name=name)
+        Site.objects.create(customer=customer, installer=installer, city='חיפה', latitude=32.8, longitude=35.0)
+        contract = Contract(customer=customer, start_date=date(2024, 1, 1), value=1000)
+        contract.document = ContentFile(f'%PDF {name}'.encode(), name='contract.pdf')
+        contract.save()
+        return contract
+
+    def download(self, contract):
+        return self.client.get(reverse('sales:contract_document', args=[contract.pk]))
+
+    def test_own_customer_contract(self):
+        response = self.download(self.own)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), '%PDF לקוח'.encode())
+
+    def test_other_customer_contract_is_not_found(self):
+        self.assertEqual(self.download(self.other).status_code, 404)
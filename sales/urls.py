@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'sales'
+
+urlpatterns = [
+    path('contracts/<int:pk>/document/', views.contract_document, name='contract_document'),
+]
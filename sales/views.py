@@ -1,3 +1,23 @@
-from django.shortcuts import render
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import PermissionDenied
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from accounts.scoping import scope_queryset
+from core.responses import file_download_response
+from .models import Contract
 
-# Create your views here.
+
+@staff_member_required
+def contract_document(request, pk):
+    """ Download a contract document, streamed and with range support """
+    if not request.user.has_perm('sales.view_contract'):
+        raise PermissionDenied
+
+    # Installer users only reach the contracts of their customers, others get a 404 like a missing one
+    contract = get_object_or_404(scope_queryset(Contract.objects.all(), request.user), pk=pk)
+    if not contract.document:
+        raise Http404
+
+    extension = contract.document.name.rsplit('.', 1)[-1] if '.' in contract.document.name else 'bin'
+    content_type = 'application/pdf' if extension == 'pdf' else 'application/octet-stream'
+    return file_download_response(request, contract.document, f'{contract.contract_number}.{extension}', content_type)
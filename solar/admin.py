@@ -1,3 +1,36 @@
 from django.contrib import admin
+from accounts.scoping import ScopedAdminMixin
+from .models import Site
 
-# Register your models here.
+
+@admin.register(Site)
+class SiteAdmin(ScopedAdminMixin, admin.ModelAdmin):
+    list_display = ['site_number', 'name', 'customer', 'installer', 'installed_capacity', 'city', 'sync_status', 'is_active']
+    list_filter = ['sync_status', 'is_active', 'installer']
+    search_fields = ['site_number', 'name', 'customer__customer_number', 'customer__name', 'customer__company_name']
+    readonly_fields = ['site_number', 'last_sync_at', 'last_reading_at', 'created_at', 'updated_at']
+    raw_id_fields = ['customer', 'installer']
+    # installer is nullable, the automatic select_related of the changelist skips it
+    list_select_related = ['customer', 'installer']
+
+    fieldsets = (
+        ('פרטי מערכת', {
+            'fields': ('site_number', 'name', 'is_active')
+        }),
+        ('קשרים', {
+            'fields': ('customer', 'installer')
+        }),
+        ('נתונים טכניים', {
+            'fields': ('installed_capacity', 'installation_date', 'tilt', 'azimuth')
+        }),
+        ('כתובת', {
+            'fields': ('street', 'city', 'postal_code', 'country', 'latitude', 'longitude')
+        }),
+        ('סנכרון', {
+            'fields': ('vendor', 'sync_status', 'last_sync_at', 'last_reading_at')
+        }),
+        ('נוסף', {
+            'fields': ('notes', 'created_at', 'updated_at'),
+            'classes': ('collapse',),
+        }),
+    )
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class SolarConfig(AppConfig):
     name = 'solar'
+
+    def ready(self):
+        from . import signals
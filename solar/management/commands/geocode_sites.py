@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from solar.models import Site
+
+
+class Command(BaseCommand):
+    help = 'Fill site coordinates from their address using the offline gazetteer'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Geocode sites that already have coordinates as well')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        sites = Site.objects.all() if options['all'] else Site.objects.filter(latitude__isnull=True)
+        batch = []
+        found = 0
+
+        for site in sites.iterator(chunk_size=options['batch_size']):
+            if site.geocode():
+                site.update_geohash()
+                batch.append(site)
+                found += 1
+            if len(batch) >= options['batch_size']:
+                Site.objects.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+                batch = []
+        Site.objects.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+
+        self.stdout.write(f'{found} sites geocoded')
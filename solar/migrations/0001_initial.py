@@ -0,0 +1,44 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:16
+
+import django.db.models.deletion
+import django_countries.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('crm', '0002_alter_contact_options_remove_contact_name_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Site',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('street', models.CharField(blank=True, max_length=200, verbose_name='רחוב')),
+                ('city', models.CharField(blank=True, max_length=100, verbose_name='עיר')),
+                ('postal_code', models.CharField(blank=True, max_length=10, verbose_name='מיקוד')),
+                ('country', django_countries.fields.CountryField(default='IL', max_length=2, verbose_name='מדינה')),
+                ('site_number', models.CharField(editable=False, max_length=20, unique=True, verbose_name='מספר מערכת')),
+                ('name', models.CharField(blank=True, max_length=200, verbose_name='שם מערכת')),
+                ('installed_capacity', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='הספק מותקן (kWp)')),
+                ('installation_date', models.DateField(blank=True, null=True, verbose_name='תאריך התקנה')),
+                ('sync_status', models.CharField(choices=[('ok', 'תקין'), ('error', 'שגיאה'), ('pending', 'ממתין')], default='pending', max_length=20, verbose_name='סטטוס סנכרון')),
+                ('last_sync_at', models.DateTimeField(blank=True, null=True, verbose_name='סנכרון אחרון')),
+                ('notes', models.TextField(blank=True, verbose_name='הערות')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='sites', to='crm.customer', verbose_name='לקוח')),
+                ('installer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sites', to='crm.installer', verbose_name='מתקין')),
+            ],
+            options={
+                'verbose_name': 'מערכת',
+                'verbose_name_plural': 'מערכות',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solar', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='site',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='site',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='קו רוחב'),
+        ),
+        migrations.AddField(
+            model_name='site',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='קו אורך'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solar', '0002_site_geohash_site_latitude_site_longitude'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='site',
+            name='azimuth',
+            field=models.FloatField(default=180, verbose_name='אזימוט (מעלות, 180 = דרום)'),
+        ),
+        migrations.AddField(
+            model_name='site',
+            name='tilt',
+            field=models.FloatField(default=20, verbose_name='זווית הטיה (מעלות)'),
+        ),
+    ]
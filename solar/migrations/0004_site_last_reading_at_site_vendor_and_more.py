@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-19 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0006_alter_customer_id_number'),
+        ('solar', '0003_site_azimuth_site_tilt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='site',
+            name='last_reading_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='קריאה אחרונה'),
+        ),
+        migrations.AddField(
+            model_name='site',
+            name='vendor',
+            field=models.CharField(blank=True, max_length=30, verbose_name='יצרן'),
+        ),
+        migrations.AddIndex(
+            model_name='site',
+            index=models.Index(fields=['vendor', 'last_reading_at'], name='site_vendor_reading_idx'),
+        ),
+    ]
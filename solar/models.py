@@ -1,3 +1,136 @@
 from django.db import models
+from core.geohash import bounding_box, covering_prefixes, distance_km
+from core.models import ActiveModel, AddressMixin, GeoLocationMixin
+from core.constants import SyncStatus
+from core.utils import generate_unique_number
 
-# Create your models here.
+
+# The address, then the coordinates found for it (Site.save)
+LOCATION_FIELDS = ('street', 'city', 'postal_code', 'country', 'latitude', 'longitude')
+
+
+class SiteQuerySet(models.QuerySet):
+
+    def near(self, latitude, longitude, radius_km):
+        """
+        Candidate sites around a point - index range scans on geohash, narrowed by the bounding box.
+        May include sites slightly outside the radius, use within_radius for the exact result.
+        """
+        geohash_q = models.Q()
+        for prefix in covering_prefixes(latitude, longitude, radius_km):
+            # A range instead of startswith, so the geohash index is used on every database
+            geohash_q |= models.Q(geohash__gte=prefix, geohash__lt=prefix + '~')
+
+        min_lat, min_lon, max_lat, max_lon = bounding_box(latitude, longitude, radius_km)
+        return self.filter(
+            geohash_q,
+            latitude__range=(min_lat, max_lat),
+            longitude__range=(min_lon, max_lon),
+        )
+
+    def within_radius(self, latitude, longitude, radius_km):
+        """ return a list of (site, distance in km) inside the radius, nearest first """
+        results = []
+        for site in self.near(latitude, longitude, radius_km).order_by():
+            distance = distance_km(latitude, longitude, site.latitude, site.longitude)
+            if distance <= radius_km:
+                results.append((site, distance))
+        return sorted(results, key=lambda result: result[1])
+
+
+class Site(ActiveModel, AddressMixin, GeoLocationMixin):
+    """
+    Solar system installed at a customer location
+    """
+    site_number = models.CharField(
+        max_length=20,
+        unique=True,
+        editable=False,
+        verbose_name='מספר מערכת'
+    )
+    name = models.CharField(max_length=200, blank=True, verbose_name='שם מערכת')
+
+    # Relations
+    customer = models.ForeignKey(
+        'crm.Customer',
+        on_delete=models.PROTECT,
+        related_name='sites',
+        verbose_name='לקוח'
+    )
+    installer = models.ForeignKey(
+        'crm.Installer',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='sites',
+        verbose_name='מתקין'
+    )
+
+    # System Information
+    installed_capacity = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name='הספק מותקן (kWp)'
+    )
+    installation_date = models.DateField(null=True, blank=True, verbose_name='תאריך התקנה')
+    tilt = models.FloatField(default=20, verbose_name='זווית הטיה (מעלות)')
+    azimuth = models.FloatField(default=180, verbose_name='אזימוט (מעלות, 180 = דרום)')
+
+    # Sync with manufacturer API
+    sync_status = models.CharField(
+        max_length=20,
+        choices=SyncStatus.choices,
+        default=SyncStatus.PENDING,
+        verbose_name='סטטוס סנכרון'
+    )
+    last_sync_at = models.DateTimeField(null=True, blank=True, verbose_name='סנכרון אחרון')
+    # Key of monitoring.adapters.ADAPTERS
+    vendor = models.CharField(max_length=30, blank=True, verbose_name='יצרן')
+    last_reading_at = models.DateTimeField(null=True, blank=True, verbose_name='קריאה אחרונה')
+
+    notes = models.TextField(blank=True, verbose_name='הערות')
+
+    objects = SiteQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'מערכת'
+        verbose_name_plural = 'מערכות'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['vendor', 'last_reading_at'], name='site_vendor_reading_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.site_number} | {self.name or self.customer}'
+
+    def save(self, *args, **kwargs):
+        if not self.site_number:
+            self.site_number = generate_unique_number('SYS', Site, 'site_number')
+        old, new = getattr(self, '_location_state', None), self.location_state()
+        if self.latitude is None or self.longitude is None:
+            self.geocode()
+        elif old and new and old[:4] != new[:4] and old[4:] == new[4:]:
+            # The address changed and the coordinates were not set with it, they are of the old address
+            if not self.geocode():
+                self.latitude = self.longitude = None
+        self.update_geohash()
+        super().save(*args, **kwargs)
+        self._location_state = self.location_state()
+
+    def location_state(self):
+        """ (street, city, postal code, country, latitude, longitude), None when one of them is deferred """
+        values = tuple(self.__dict__.get(field, self) for field in LOCATION_FIELDS)
+        return None if self in values else values
+
+    def geocode(self):
+        """ Set the coordinates from the address, returns whether the address was found """
+        from core.geocoding import geocode
+
+        result = geocode(self.street, self.city, self.postal_code, self.country.code)
+        if result is None:
+            return False
+        self.latitude = result.latitude
+        self.longitude = result.longitude
+        return True
@@ -0,0 +1,9 @@
+from django.db.models.signals import post_init
+from django.dispatch import receiver
+
+
+# Address and coordinates as loaded, Site.save geocodes again when the address changed
+
+@receiver(post_init, sender='solar.Site')
+def site_loaded(sender, instance, **kwargs):
+    instance._location_state = instance.location_state()
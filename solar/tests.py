@@ -1,3 +1,45 @@
 from django.test import TestCase
+from crm.models import Customer
+from .models import Site
 
-# Create your tests here.
+
+class SiteGeocodeTest(TestCase):
+    """ Site coordinates follow the address unless they are set by hand """
+
+    def setUp(self):
+        self.site = Site.objects.create(customer=Customer.objects.create(name='לקוח'), city='חיפה')
+
+    def reload(self):
+        return Site.objects.get(pk=self.site.pk)
+
+    def test_new_site_is_geocoded(self):
+        self.assertEqual((self.site.latitude, self.site.longitude), (32.7940, 34.9896))
+        self.assertTrue(self.site.geohash)
+
+    def test_address_change_geocodes_again(self):
+        site = self.reload()
+        site.city = 'תל אביב'
+        site.save()
+        site = self.reload()
+        self.assertEqual((site.latitude, site.longitude), (32.0853, 34.7818))
+        self.assertEqual([found for found, _ in Site.objects.within_radius(32.0853, 34.7818, 5)], [site])
+        self.assertFalse(Site.objects.near(32.7940, 34.9896, 5).exists())
+
+    def test_address_not_found_clears_the_coordinates(self):
+        site = self.reload()
+        site.city = 'עיר שאינה קיימת'
+        site.save()
+        site = self.reload()
+        self.assertIsNone(site.latitude)
+        self.assertEqual(site.geohash, '')
+
+    def test_coordinates_set_by_hand_are_kept(self):
+        site = self.reload()
+        site.city = 'תל אביב'
+        site.latitude, site.longitude = 32.1, 34.8
+        site.save()
+        site = self.reload()
+        site.notes = 'גג דרומי'
+        site.save()
+        site = self.reload()
+        self.assertEqual((site.latitude, site.longitude), (32.1, 34.8))
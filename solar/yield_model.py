@@ -0,0 +1,187 @@
+"""
+Expected production of sites under clear sky.
+
+Sun position and clear-sky irradiance only depend on the location and the time, so they are
+computed once per region (geohash cell) and year and stored on disk as a (days, 5, 288) table
+that is memory-mapped on use. A site then only needs a (5,) x (5, 288) product for its
+tilt / azimuth and a multiplication by its capacity, vectorized over all sites of a region.
+"""
+import math
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from core.geohash import decode, encode
+
+
+INTERVALS_PER_DAY = 288
+INTERVAL_MINUTES = 24 * 60 // INTERVALS_PER_DAY
+REGION_PRECISION = 4
+
+# Share of the module rating delivered as AC power (inverter, wiring, temperature, soiling)
+PERFORMANCE_RATIO = 0.8
+ALBEDO = 0.2
+DIFFUSE_FRACTION = 0.12
+
+# Table rows: beam on a horizontal plane split into vertical / north-south / east-west components
+# of the sun direction (all times DNI), then diffuse and global horizontal irradiance.
+_VERTICAL, _NORTH, _EAST, _DHI, _GHI = range(5)
+
+_tables = {}
+
+
+def table_dir():
+    return Path(getattr(settings, 'YIELD_TABLE_DIR', settings.BASE_DIR / 'var' / 'irradiance'))
+
+
+def region_of(latitude, longitude):
+    return encode(latitude, longitude, REGION_PRECISION)
+
+
+def compute_year_table(latitude, longitude, year):
+    """
+    Clear-sky irradiance components for every 5 minute interval (UTC) of a year.
+    Sun position from the NOAA approximations, GHI from the Haurwitz clear-sky model.
+    returns float32 array of shape (days, 5, 288)
+    """
+    days = 366 if (year % 4 == 0 and year % 100 != 0) or year % 400 == 0 else 365
+    day_of_year = np.arange(1, days + 1, dtype=np.float64)[:, None]
+    minutes = (np.arange(INTERVALS_PER_DAY, dtype=np.float64) * INTERVAL_MINUTES + INTERVAL_MINUTES / 2)[None, :]
+
+    gamma = 2 * np.pi / days * (day_of_year - 1 + (minutes / 60 - 12) / 24)
+    equation_of_time = 229.18 * (
+        0.000075 + 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+        - 0.014615 * np.cos(2 * gamma) - 0.040849 * np.sin(2 * gamma)
+    )
+    declination = (
+        0.006918 - 0.399912 * np.cos(gamma) + 0.070257 * np.sin(gamma)
+        - 0.006758 * np.cos(2 * gamma) + 0.000907 * np.sin(2 * gamma)
+        - 0.002697 * np.cos(3 * gamma) + 0.00148 * np.sin(3 * gamma)
+    )
+    true_solar_minutes = minutes + equation_of_time + 4 * longitude
+    hour_angle = np.radians(true_solar_minutes / 4 - 180)
+
+    lat = math.radians(latitude)
+    cos_zenith = np.sin(lat) * np.sin(declination) + np.cos(lat) * np.cos(declination) * np.cos(hour_angle)
+    cos_zenith = np.clip(cos_zenith, -1, 1)
+
+    # Sun direction unit vector: east / north / up components
+    east = -np.cos(declination) * np.sin(hour_angle)
+    north = np.cos(lat) * np.sin(declination) - np.sin(lat) * np.cos(declination) * np.cos(hour_angle)
+
+    daylight = cos_zenith > 0.01
+    safe_cos = np.where(daylight, cos_zenith, 1)
+    ghi = np.where(daylight, 1098 * cos_zenith * np.exp(-0.059 / safe_cos), 0)
+    dhi = ghi * DIFFUSE_FRACTION
+    dni = np.where(daylight, (ghi - dhi) / safe_cos, 0)
+
+    table = np.empty((days, 5, INTERVALS_PER_DAY), dtype=np.float32)
+    table[:, _VERTICAL] = dni * np.where(daylight, cos_zenith, 0)
+    table[:, _NORTH] = dni * np.where(daylight, north, 0)
+    table[:, _EAST] = dni * np.where(daylight, east, 0)
+    table[:, _DHI] = dhi
+    table[:, _GHI] = ghi
+    return table
+
+
+def get_year_table(region, year):
+    """ Memory-mapped irradiance table of a region, computed and written to disk on first use """
+    key = (region, year)
+    if key not in _tables:
+        path = table_dir() / f'{region}_{year}.npy'
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_suffix('.tmp.npy')
+            np.save(temp_path, compute_year_table(*decode(region), year))
+            temp_path.replace(path)
+        _tables[key] = np.load(path, mmap_mode='r')
+    return _tables[key]
+
+
+def _orientation_coefficients(tilt, azimuth):
+    """
+    Per-site weights of the table rows, so that plane-of-array irradiance = weights @ table.
+    azimuth in degrees clockwise from north (180 = south facing)
+    """
+    tilt = np.radians(tilt)
+    azimuth = np.radians(azimuth)
+    cos_tilt = np.cos(tilt)
+    sin_tilt = np.sin(tilt)
+
+    weights = np.empty((len(tilt), 5), dtype=np.float32)
+    weights[:, _VERTICAL] = cos_tilt
+    weights[:, _NORTH] = sin_tilt * np.cos(azimuth)
+    weights[:, _EAST] = sin_tilt * np.sin(azimuth)
+    weights[:, _DHI] = (1 + cos_tilt) / 2
+    weights[:, _GHI] = ALBEDO * (1 - cos_tilt) / 2
+    return weights
+
+
+def expected_power(latitude, longitude, tilt, azimuth, capacity, day):
+    """
+    Expected AC power (kW) of many sites for every 5 minute interval of a day.
+    All arguments but day are equal length arrays.
+    returns float32 array of shape (sites, 288)
+    """
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    capacity = np.asarray(capacity, dtype=np.float32)
+    weights = _orientation_coefficients(np.asarray(tilt, dtype=np.float64), np.asarray(azimuth, dtype=np.float64))
+
+    regions = np.array([region_of(lat, lon) for lat, lon in zip(latitude, longitude)])
+    power = np.empty((len(latitude), INTERVALS_PER_DAY), dtype=np.float32)
+    day_index = day.timetuple().tm_yday - 1
+
+    for region in np.unique(regions):
+        members = np.flatnonzero(regions == region)
+        table = get_year_table(str(region), day.year)[day_index]
+        direct = weights[members, :3] @ table[:3]
+        # The sun is behind the panel when the beam component is negative
+        irradiance = np.maximum(direct, 0) + weights[members, 3:] @ table[3:]
+        power[members] = irradiance * (capacity[members, None] * PERFORMANCE_RATIO / 1000)
+    return power
+
+
+def site_arrays(queryset):
+    """
+    Load what the model needs for a site queryset in one query.
+    Capacity is the installed capacity or, before installation, the estimated size of the customer lead.
+    Sites without coordinates or capacity are skipped.
+    returns dict of numpy arrays: site_id, latitude, longitude, tilt, azimuth, capacity
+    """
+    from sales.models import Lead
+
+    estimated_size = Lead.objects.filter(
+        customer=OuterRef('customer'), estimated_system_size__isnull=False
+    ).order_by('-created_at').values('estimated_system_size')[:1]
+
+    rows = list(
+        queryset.filter(latitude__isnull=False, longitude__isnull=False)
+        .annotate(capacity=Coalesce('installed_capacity', Subquery(estimated_size)))
+        .filter(capacity__isnull=False)
+        .order_by('pk')
+        .values_list('pk', 'latitude', 'longitude', 'tilt', 'azimuth', 'capacity')
+    )
+    columns = list(zip(*rows)) or [[]] * 6
+    return {
+        'site_id': np.array(columns[0], dtype=np.int64),
+        'latitude': np.array(columns[1], dtype=np.float64),
+        'longitude': np.array(columns[2], dtype=np.float64),
+        'tilt': np.array(columns[3], dtype=np.float64),
+        'azimuth': np.array(columns[4], dtype=np.float64),
+        'capacity': np.array(columns[5], dtype=np.float32),
+    }
+
+
+def expected_daily_energy(queryset, day):
+    """ returns {site_id: expected kWh} for a day """
+    sites = site_arrays(queryset)
+    if not len(sites['site_id']):
+        return {}
+    power = expected_power(
+        sites['latitude'], sites['longitude'], sites['tilt'], sites['azimuth'], sites['capacity'], day
+    )
+    energy = power.sum(axis=1) * INTERVAL_MINUTES / 60
+    return dict(zip(sites['site_id'].tolist(), energy.tolist()))
@@ -0,0 +1,58 @@
+from django.contrib import admin
+from accounts.scoping import ScopedAdminMixin
+from core.constants import TicketStatus
+from .models import Ticket
+
+
+@admin.register(Ticket)
+class TicketAdmin(ScopedAdminMixin, admin.ModelAdmin):
+    list_display = [
+        'ticket_number',
+        'title',
+        'customer',
+        'site',
+        'priority',
+        'status',
+        'assigned_to',
+        'sla_due_at',
+        'sla_breached',
+    ]
+    list_filter = ['status', 'priority', 'sla_breached', 'assigned_to', 'is_active']
+    search_fields = ['ticket_number', 'title', 'customer__customer_number', 'site__site_number']
+    readonly_fields = ['ticket_number', 'sla_due_at', 'sla_breached', 'resolved_at', 'closed_at', 'created_at', 'updated_at']
+    raw_id_fields = ['customer', 'installer', 'site', 'alert', 'assigned_to']
+    list_select_related = ['customer', 'site', 'assigned_to']
+
+    fieldsets = (
+        ('פרטי קריאה', {
+            'fields': ('ticket_number', 'title', 'description', 'priority', 'status', 'is_active')
+        }),
+        ('קשרים', {
+            'fields': ('customer', 'installer', 'site', 'alert', 'assigned_to')
+        }),
+        ('SLA', {
+            'fields': ('sla_due_at', 'sla_breached', 'resolved_at', 'closed_at')
+        }),
+        ('נוסף', {
+            'fields': ('created_at', 'updated_at'),
+            'classes': ('collapse',),
+        }),
+    )
+
+    actions = ['mark_in_progress', 'mark_resolved', 'mark_closed']
+
+    def _transition(self, request, queryset, status):
+        updated = queryset.transition(status)
+        self.message_user(request, f'{updated} קריאות עודכנו')
+
+    @admin.action(description='סמן כ"בטיפול"')
+    def mark_in_progress(self, request, queryset):
+        self._transition(request, queryset, TicketStatus.IN_PROGRESS)
+
+    @admin.action(description='סמן כ"נפתר"')
+    def mark_resolved(self, request, queryset):
+        self._transition(request, queryset, TicketStatus.RESOLVED)
+
+    @admin.action(description='סמן כ"נסגר"')
+    def mark_closed(self, request, queryset):
+        self._transition(request, queryset, TicketStatus.CLOSED)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from tickets.models import Ticket
+
+
+class Command(BaseCommand):
+    help = 'Flag open tickets that passed their SLA deadline (run periodically from cron)'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        breached = Ticket.objects.mark_sla_breached(batch_size=options['batch_size'])
+        self.stdout.write(f'{breached} tickets breached their SLA')
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('alerts', '0001_initial'),
+        ('crm', '0002_alter_contact_options_remove_contact_name_and_more'),
+        ('solar', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ticket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('ticket_number', models.CharField(editable=False, max_length=20, unique=True, verbose_name='מספר קריאה')),
+                ('title', models.CharField(max_length=200, verbose_name='כותרת')),
+                ('description', models.TextField(blank=True, verbose_name='תיאור')),
+                ('priority', models.CharField(choices=[('low', 'נמוכה'), ('medium', 'בינונית'), ('high', 'גבוהה'), ('critical', 'קריטי')], default='medium', max_length=20, verbose_name='עדיפות')),
+                ('status', models.CharField(choices=[('open', 'פתוח'), ('in_progress', 'בטיפול'), ('waiting', 'ממתין'), ('resolved', 'נפתר'), ('closed', 'נסגר')], default='open', max_length=20, verbose_name='סטטוס')),
+                ('is_open', models.BooleanField(default=True, editable=False, verbose_name='פתוח')),
+                ('sla_due_at', models.DateTimeField(blank=True, verbose_name='יעד SLA')),
+                ('sla_breached', models.BooleanField(default=False, verbose_name='חריגת SLA')),
+                ('resolved_at', models.DateTimeField(blank=True, null=True, verbose_name='נפתר בתאריך')),
+                ('closed_at', models.DateTimeField(blank=True, null=True, verbose_name='נסגר בתאריך')),
+                ('alert', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tickets', to='alerts.alert', verbose_name='התראה')),
+                ('assigned_to', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assigned_tickets', to=settings.AUTH_USER_MODEL, verbose_name='מטפל')),
+                ('customer', models.ForeignKey(blank=True, on_delete=django.db.models.deletion.PROTECT, related_name='tickets', to='crm.customer', verbose_name='לקוח')),
+                ('installer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tickets', to='crm.installer', verbose_name='מתקין')),
+                ('site', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tickets', to='solar.site', verbose_name='מערכת')),
+            ],
+            options={
+                'verbose_name': 'קריאת שירות',
+                'verbose_name_plural': 'קריאות שירות',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(condition=models.Q(('is_open', True)), fields=['assigned_to', 'sla_due_at'], name='ticket_work_queue_idx'), models.Index(condition=models.Q(('is_open', True), ('sla_breached', False)), fields=['sla_due_at'], name='ticket_sla_pending_idx'), models.Index(fields=['customer', 'status'], name='ticket_customer_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,287 @@
+"""
+Delta sync of the field technician app.
+
+A technician works offline on their open tickets, the customers of those tickets (with their
+addresses), the customers' contacts and open alerts. A sync returns only what changed since the
+previous one. The client keeps an opaque token from every sync. The token is signed, and holds
+the change feed position (core.changefeed) and the ids of the records the client was sent.
+
+On the next sync the records changed since the position are read from the feed, and only those
+are loaded. The scope is recomputed from the technician's open tickets (an index range scan of
+ticket_work_queue_idx) and compared with the ids of the token. Records that came into scope are
+sent in full. Records of the token that left it, were soft deleted, closed or deleted are sent
+as tombstones (ids in "deleted"), changes of records the client never had are ignored. So the cost of a sync follows the changes and the technician's own tickets,
+not the size of the tables. Tokens older than TOKEN_MAX_AGE (compaction may have dropped
+tombstones since) or invalid tokens get a full snapshot with "reset".
+
+Rows are sent as lists under the field names of their entity:
+    {"token": ..., "more": false, "reset": false,
+     "tickets": {"fields": [...], "rows": [[...], ...], "deleted": [ids]}, "customers": ..., ...}
+
+Technicians upload updates of their tickets and contacts in batches. An update carries the
+values the client started from, and is a conflict when the server has a different value since
+(see apply_changes).
+"""
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from core import changefeed
+
+
+TOKEN_SALT = 'tickets.mobile'
+TOKEN_MAX_AGE = getattr(settings, 'MOBILE_SYNC_TOKEN_MAX_AGE', 30 * 24 * 3600)
+# Feed events read by a sync, the client asks again while "more"
+EVENT_LIMIT = getattr(settings, 'MOBILE_SYNC_EVENT_LIMIT', 20_000)
+UPLOAD_LIMIT = 500
+
+FIELDS = {
+    'tickets': [
+        'id', 'ticket_number', 'title', 'description', 'priority', 'status', 'customer_id', 'site_id',
+        'alert_id', 'sla_due_at', 'sla_breached', 'updated_at',
+    ],
+    'customers': [
+        'id', 'customer_number', 'name', 'company_name', 'phone', 'mobile', 'email', 'street', 'city',
+        'postal_code', 'country', 'updated_at',
+    ],
+    'contacts': ['id', 'customer_id', 'first_name', 'last_name', 'role', 'email', 'phone', 'is_primary', 'updated_at'],
+    'alerts': [
+        'id', 'site_id', 'customer_id', 'kind', 'title', 'description', 'priority', 'status', 'created_at', 'updated_at',
+    ],
+}
+
+ENTITIES = {
+    'tickets.ticket': 'tickets',
+    'crm.customer': 'customers',
+    'crm.contact': 'contacts',
+    'alerts.alert': 'alerts',
+}
+
+# Fields a technician may change, by entity of the upload
+UPLOAD_FIELDS = {
+    'tickets': ['status', 'description'],
+    'contacts': ['first_name', 'last_name', 'role', 'email', 'phone'],
+}
+
+
+def models():
+    from alerts.models import Alert
+    from crm.models import Contact, Customer
+    from .models import Ticket
+
+    return {'tickets': Ticket, 'customers': Customer, 'contacts': Contact, 'alerts': Alert}
+
+
+def open_alerts(queryset):
+    from alerts.models import OPEN_ALERT_STATUSES
+
+    return queryset.filter(is_active=True, status__in=OPEN_ALERT_STATUSES)
+
+
+# Tokens
+
+TOKEN_KEYS = {'tickets': 't', 'customers': 'c', 'contacts': 'n', 'alerts': 'a'}
+
+
+def make_token(position, sent):
+    """ sent - {entity key: ids the client has} """
+    data = {'p': position, **{TOKEN_KEYS[key]: sorted(ids) for key, ids in sent.items()}}
+    return signing.dumps(data, salt=TOKEN_SALT, compress=True)
+
+
+def read_token(token):
+    """ (position, {entity key: ids}), None for a missing, invalid or expired token """
+    if not token:
+        return None
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT, max_age=TOKEN_MAX_AGE)
+        return int(data['p']), {key: set(data[name]) for key, name in TOKEN_KEYS.items()}
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+# Download
+
+def scope(user):
+    """ (open ticket ids, their customer ids) of a technician """
+    from .models import Ticket
+
+    rows = list(Ticket.active.work_queue(user).values_list('pk', 'customer_id'))
+    return {pk for pk, _ in rows}, {customer_id for _, customer_id in rows}
+
+
+def changed_ids(position):
+    """ ({entity key: ids of records changed after position}, new position, more) """
+    changed = {key: set() for key in FIELDS}
+    read = 0
+    while read < EVENT_LIMIT:
+        events, next_position = changefeed.read(position, min(changefeed.BATCH_SIZE, EVENT_LIMIT - read), list(ENTITIES))
+        if next_position == position:
+            return changed, position, False
+        read += len(events)
+        for event in events:
+            changed[ENTITIES[event.entity]].add(event.object_id)
+        position = next_position
+    return changed, position, True
+
+
+def rows(queryset, key):
+    return [list(row) for row in queryset.values_list(*FIELDS[key]).order_by('pk')]
+
+
+def section(key, upserts=(), deleted=()):
+    return {'fields': FIELDS[key], 'rows': list(upserts), 'deleted': sorted(deleted)}
+
+
+def delta(user, token=None):
+    """ The sync payload of a technician since a token (a full snapshot without a valid one) """
+    model = models()
+    Ticket, Customer, Contact, Alert = model['tickets'], model['customers'], model['contacts'], model['alerts']
+
+    state = read_token(token)
+    reset = state is None
+    if reset:
+        # Taken before the rows are read, with no transaction in flight below it. Changes made
+        # meanwhile come again with the next sync.
+        position = changefeed.settled_position()
+        old = {key: set() for key in FIELDS}
+        changed, more = {key: set() for key in FIELDS}, False
+    else:
+        old_position, old = state
+        changed, position, more = changed_ids(old_position)
+    old_tickets, old_customers = old['tickets'], old['customers']
+
+    tickets, customers = scope(user)
+    new_customers = customers - old_customers
+    gone_customers = old_customers - customers
+
+    payload = {'reset': reset, 'more': more}
+    payload['tickets'] = section(
+        'tickets',
+        rows(Ticket.objects.filter(pk__in=(tickets - old_tickets) | (changed['tickets'] & tickets)), 'tickets'),
+        old_tickets - tickets,
+    )
+    payload['customers'] = section(
+        'customers',
+        rows(Customer.objects.filter(pk__in=new_customers | (changed['customers'] & customers)), 'customers'),
+        gone_customers,
+    )
+
+    # Contacts and alerts follow their customer. A changed one is sent when it is in scope. One the
+    # client has is a tombstone when it changed out of scope - deleted, soft deleted, closed or
+    # moved to a customer out of scope - or its customer left the scope.
+    sent = {'tickets': tickets, 'customers': customers}
+    for key, model_class, visible in [
+        ('contacts', Contact, lambda queryset: queryset.filter(is_active=True)),
+        ('alerts', Alert, open_alerts),
+    ]:
+        in_scope = visible(model_class.objects.filter(customer_id__in=customers))
+        upserts = rows(in_scope.filter(customer_id__in=new_customers), key)
+        upserted = {row[0] for row in upserts}
+        upserts += [row for row in rows(in_scope.filter(pk__in=changed[key]), key) if row[0] not in upserted]
+        upserted |= {row[0] for row in upserts}
+
+        stale = old[key] & changed[key]
+        if gone_customers:
+            stale |= set(model_class.objects.filter(pk__in=old[key], customer_id__in=gone_customers).values_list('pk', flat=True))
+        deleted = stale - upserted
+        payload[key] = section(key, upserts, deleted)
+        sent[key] = (old[key] - deleted) | upserted
+
+    payload['token'] = make_token(position, sent)
+    return payload
+
+
+# Upload
+
+class Rejected(Exception):
+    pass
+
+
+def upload_target(user, key, pk):
+    """ A record the technician may change, locked for the update """
+    if isinstance(pk, str) and pk.isascii() and pk.isdigit():
+        pk = int(pk)
+    if isinstance(pk, bool) or not isinstance(pk, int) or not 0 < pk < 2 ** 63:
+        raise Rejected('מזהה רשומה לא תקין')
+    model = models()[key]
+    queryset = model.objects.select_for_update().filter(pk=pk, is_active=True)
+    if key == 'tickets':
+        queryset = queryset.filter(assigned_to=user)
+    else:
+        _, customers = scope(user)
+        queryset = queryset.filter(customer_id__in=customers)
+    obj = queryset.first()
+    if obj is None:
+        raise Rejected('הרשומה לא נמצאה או אינה משויכת אליך')
+    return obj
+
+
+def apply_change(user, change):
+    """
+    Apply an update {"entity": "tickets", "id": ..., "fields": {name: [old value, new value]}}.
+    It is a conflict when a field has neither value on the server - someone else changed it since
+    the client read it. Fields the client did not touch may have changed meanwhile.
+    returns (result, current row)
+    """
+    from .models import ALLOWED_TRANSITIONS
+
+    key = change.get('entity')
+    fields = change.get('fields')
+    if key not in UPLOAD_FIELDS or not isinstance(fields, dict) or not fields:
+        raise Rejected('עדכון לא תקין')
+    unknown = set(fields) - set(UPLOAD_FIELDS[key])
+    if unknown:
+        raise Rejected(f'שדות שאינם ניתנים לעדכון: {", ".join(sorted(unknown))}')
+
+    obj = upload_target(user, key, change.get('id'))
+    updates = {}
+    for name, values in fields.items():
+        if not isinstance(values, list) or len(values) != 2:
+            raise Rejected(f'{name}: נדרשים ערך קודם וערך חדש')
+        old, new = values
+        current = getattr(obj, name)
+        if current == new:
+            continue
+        if current != old:
+            return 'conflict', obj
+        updates[name] = new
+    if not updates:
+        return 'applied', obj
+
+    if 'status' in updates and updates['status'] not in ALLOWED_TRANSITIONS.get(obj.status, []):
+        raise Rejected(f'לא ניתן לעבור מסטטוס {obj.status} לסטטוס {updates["status"]}')
+    for name, value in updates.items():
+        setattr(obj, name, value)
+    try:
+        obj.full_clean()
+    except ValidationError as e:
+        raise Rejected('; '.join(e.messages))
+    # Through save(), for the derived fields, scorecards and change feed
+    obj.save()
+    return 'applied', obj
+
+
+def apply_changes(user, changes):
+    """
+    Apply a batch of technician updates, each on its own - a rejected or conflicting update
+    does not hold back the others. Conflicts and applied updates return the current row.
+    returns a result per change
+    """
+    results = []
+    for change in changes:
+        if not isinstance(change, dict):
+            results.append({'result': 'rejected', 'error': 'עדכון לא תקין'})
+            continue
+        key = change.get('entity')
+        result = {'entity': key, 'id': change.get('id')}
+        try:
+            with transaction.atomic():
+                outcome, obj = apply_change(user, change)
+            result['result'] = outcome
+            result['row'] = rows(type(obj).objects.filter(pk=obj.pk), key)[0]
+        except Rejected as e:
+            result['result'] = 'rejected'
+            result['error'] = str(e)
+        results.append(result)
+    return results
@@ -0,0 +1,234 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+from core.models import ActiveModel, ActiveManager, ChangeFeedQuerySet
+from core.constants import TicketStatus, AlertPriority
+from core.utils import generate_unique_number
+
+
+OPEN_TICKET_STATUSES = [TicketStatus.OPEN, TicketStatus.IN_PROGRESS, TicketStatus.WAITING]
+
+# Hours until a ticket breaches its SLA, by priority
+SLA_HOURS = {
+    AlertPriority.CRITICAL: 4,
+    AlertPriority.HIGH: 24,
+    AlertPriority.MEDIUM: 72,
+    AlertPriority.LOW: 168,
+}
+
+# Statuses a ticket may move to from each status
+ALLOWED_TRANSITIONS = {
+    TicketStatus.OPEN: [TicketStatus.IN_PROGRESS, TicketStatus.WAITING, TicketStatus.RESOLVED, TicketStatus.CLOSED],
+    TicketStatus.IN_PROGRESS: [TicketStatus.WAITING, TicketStatus.RESOLVED, TicketStatus.CLOSED],
+    TicketStatus.WAITING: [TicketStatus.IN_PROGRESS, TicketStatus.RESOLVED, TicketStatus.CLOSED],
+    TicketStatus.RESOLVED: [TicketStatus.IN_PROGRESS, TicketStatus.CLOSED],
+    TicketStatus.CLOSED: [],
+}
+
+
+class TicketQuerySet(ChangeFeedQuerySet):
+
+    def open(self):
+        return self.filter(is_open=True)
+
+    def work_queue(self, user):
+        """
+        Open tickets of a user ordered by SLA deadline.
+        Served by ticket_work_queue_idx as an index range scan.
+        """
+        return self.open().filter(assigned_to=user).order_by('sla_due_at')
+
+    def transition(self, status):
+        """
+        Move every ticket in the queryset to status with a single UPDATE.
+        Tickets that are not allowed to move to status are left untouched.
+        returns the number of updated tickets
+        """
+        now = timezone.now()
+        sources = [source for source, targets in ALLOWED_TRANSITIONS.items() if status in targets]
+        changes = {'status': status, 'is_open': status in OPEN_TICKET_STATUSES, 'updated_at': now}
+
+        if status == TicketStatus.RESOLVED:
+            changes['resolved_at'] = now
+        elif status == TicketStatus.CLOSED:
+            changes['closed_at'] = now
+        else:
+            changes['resolved_at'] = None
+
+        tickets = self.filter(status__in=sources)
+        if 'resolved_at' not in changes:
+            return tickets.update(**changes)
+
+        # Resolutions feed the installer scorecards, which signals don't see on a bulk update.
+        # A ticket counts once, at its resolved_at - the one it had is taken back
+        from crm.scorecards import record_resolved_tickets
+
+        rows = list(tickets.values_list('pk', 'installer_id', 'created_at', 'resolved_at'))
+        resolved = [(installer_id, created_at, now) for _, installer_id, created_at, _ in rows]
+        reopened = [(installer_id, created_at, resolved_at) for _, installer_id, created_at, resolved_at in rows if resolved_at]
+        with transaction.atomic():
+            updated = Ticket.objects.filter(pk__in=[row[0] for row in rows]).update(**changes)
+            record_resolved_tickets(resolved if status == TicketStatus.RESOLVED else [], reopened)
+        return updated
+
+    def mark_sla_breached(self, now=None, batch_size=1000):
+        """
+        Flag open tickets whose SLA deadline has passed.
+        Only walks ticket_sla_pending_idx (open, not yet breached), so the cost
+        is proportional to the number of new breaches and not to the table size.
+        """
+        now = now or timezone.now()
+        pending = self.open().filter(sla_breached=False, sla_due_at__lt=now).order_by('sla_due_at')
+
+        total = 0
+        while True:
+            ids = list(pending.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            total += Ticket.objects.filter(pk__in=ids).update(sla_breached=True, updated_at=now)
+        return total
+
+
+class Ticket(ActiveModel):
+    """
+    Maintenance ticket for a customer site, optionally opened from an alert
+    """
+    ticket_number = models.CharField(
+        max_length=20,
+        unique=True,
+        editable=False,
+        verbose_name='מספר קריאה'
+    )
+    title = models.CharField(max_length=200, verbose_name='כותרת')
+    description = models.TextField(blank=True, verbose_name='תיאור')
+    priority = models.CharField(
+        max_length=20,
+        choices=AlertPriority.choices,
+        default=AlertPriority.MEDIUM,
+        verbose_name='עדיפות'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=TicketStatus.choices,
+        default=TicketStatus.OPEN,
+        verbose_name='סטטוס'
+    )
+
+    # Relations
+    customer = models.ForeignKey(
+        'crm.Customer',
+        on_delete=models.PROTECT,
+        blank=True,
+        related_name='tickets',
+        verbose_name='לקוח'
+    )
+    installer = models.ForeignKey(
+        'crm.Installer',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='tickets',
+        verbose_name='מתקין'
+    )
+    site = models.ForeignKey(
+        'solar.Site',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='tickets',
+        verbose_name='מערכת'
+    )
+    alert = models.ForeignKey(
+        'alerts.Alert',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='tickets',
+        verbose_name='התראה'
+    )
+    assigned_to = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='assigned_tickets',
+        verbose_name='מטפל'
+    )
+
+    # Derived from status. Boolean index conditions stay usable with bound query parameters
+    is_open = models.BooleanField(default=True, editable=False, verbose_name='פתוח')
+
+    # SLA
+    sla_due_at = models.DateTimeField(blank=True, verbose_name='יעד SLA')
+    sla_breached = models.BooleanField(default=False, verbose_name='חריגת SLA')
+    resolved_at = models.DateTimeField(null=True, blank=True, verbose_name='נפתר בתאריך')
+    closed_at = models.DateTimeField(null=True, blank=True, verbose_name='נסגר בתאריך')
+
+    objects = TicketQuerySet.as_manager()
+    active = ActiveManager.from_queryset(TicketQuerySet)()
+
+    class Meta:
+        verbose_name = 'קריאת שירות'
+        verbose_name_plural = 'קריאות שירות'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['assigned_to', 'sla_due_at'],
+                condition=models.Q(is_open=True),
+                name='ticket_work_queue_idx',
+            ),
+            models.Index(
+                fields=['sla_due_at'],
+                condition=models.Q(is_open=True, sla_breached=False),
+                name='ticket_sla_pending_idx',
+            ),
+            models.Index(fields=['customer', 'status'], name='ticket_customer_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.ticket_number} | {self.title}'
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+
+        if not self.site_id and not self.customer_id:
+            raise ValidationError('חובה לשייך את הקריאה למערכת או ללקוח')
+
+    def save(self, *args, **kwargs):
+        if not self.ticket_number:
+            self.ticket_number = generate_unique_number('TKT', Ticket, 'ticket_number')
+        if not self.sla_due_at:
+            self.sla_due_at = self.calculate_sla_due_at()
+        self.is_open = self.status in OPEN_TICKET_STATUSES
+        if self.is_open:
+            # Reopened, resolving again sets a new resolved_at
+            self.resolved_at = None
+        elif self.status == TicketStatus.RESOLVED and not self.resolved_at:
+            self.resolved_at = timezone.now()
+        elif self.status == TicketStatus.CLOSED and not self.closed_at:
+            self.closed_at = timezone.now()
+        if self.site_id:
+            if not self.customer_id:
+                self.customer_id = self.site.customer_id
+            if not self.installer_id:
+                self.installer_id = self.site.installer_id
+        super().save(*args, **kwargs)
+
+    def calculate_sla_due_at(self):
+        opened_at = self.created_at or timezone.now()
+        return opened_at + timedelta(hours=SLA_HOURS[self.priority])
+
+    @classmethod
+    def open_from_alert(cls, alert, **kwargs):
+        """ Open a ticket for an alert with the alert priority and site """
+        return cls.objects.create(
+            title=alert.title,
+            description=alert.description,
+            priority=alert.priority,
+            site=alert.site,
+            customer_id=alert.customer_id,
+            alert=alert,
+            **kwargs
+        )
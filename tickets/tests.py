@@ -0,0 +1,114 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from alerts.models import Alert
+from core import changefeed
+from core.constants import AlertStatus, TicketStatus
+from crm.models import Contact, Customer
+from solar.models import Site
+from .models import Ticket
+
+
+class MobileSyncTest(TestCase):
+    """ Delta sync and uploads of the field technician app (tickets.mobile) """
+
+    def setUp(self):
+        # Every event is settled, the sync reads up to the newest one
+        self.enterContext(mock.patch.object(changefeed, 'GAP_TIMEOUT', timedelta(0)))
+        self.user = get_user_model().objects.create_user('technician', password='password')
+        self.client.force_login(self.user)
+        self.mine = self.customer_with('לקוח', self.user)
+        self.other = self.customer_with('לקוח אחר', None)
+
+    @staticmethod
+    def customer_with(name, technician):
+        customer = Customer.objects.create(name=name)
+        site = Site.objects.create(customer=customer, city='חיפה', latitude=32.8, longitude=35.0)
+        customer.contact = Contact.objects.create(customer=customer, first_name='איש', last_name='קשר')
+        customer.alert = Alert.objects.create(site=site, customer=customer, title='התראה')
+        customer.ticket = Ticket.objects.create(customer=customer, site=site, title='קריאה', assigned_to=technician)
+        return customer
+
+    def sync(self, token=None):
+        response = self.client.get(reverse('tickets:mobile_sync'), {'token': token} if token else {})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def upload(self, *changes):
+        response = self.client.post(reverse('tickets:mobile_upload'), json.dumps({'changes': changes}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    @staticmethod
+    def ids(payload, key):
+        return [row[0] for row in payload[key]['rows']]
+
+    def test_reset(self):
+        for token in (None, 'invalid'):
+            payload = self.sync(token)
+            self.assertTrue(payload['reset'])
+            self.assertEqual(self.ids(payload, 'tickets'), [self.mine.ticket.pk])
+            self.assertEqual(self.ids(payload, 'customers'), [self.mine.pk])
+            self.assertEqual(self.ids(payload, 'contacts'), [self.mine.contact.pk])
+            self.assertEqual(self.ids(payload, 'alerts'), [self.mine.alert.pk])
+
+    def test_delta_sends_only_the_changes(self):
+        token = self.sync()['token']
+        self.mine.contact.phone = '0501234567'
+        self.mine.contact.save()
+        payload = self.sync(token)
+        self.assertFalse(payload['reset'])
+        self.assertEqual(self.ids(payload, 'contacts'), [self.mine.contact.pk])
+        for key in ('tickets', 'customers', 'alerts'):
+            self.assertEqual(payload[key]['rows'], [])
+        self.assertEqual(self.sync(payload['token'])['contacts']['rows'], [])
+
+    def test_tombstones_of_records_the_client_has(self):
+        token = self.sync()['token']
+        self.mine.contact.is_active = False
+        self.mine.contact.save()
+        self.mine.alert.status = AlertStatus.RESOLVED
+        self.mine.alert.save()
+        # Changes out of the technician's scope are not sent at all
+        self.other.contact.delete()
+        self.other.alert.status = AlertStatus.CLOSED
+        self.other.alert.save()
+        payload = self.sync(token)
+        self.assertEqual(payload['contacts']['deleted'], [self.mine.contact.pk])
+        self.assertEqual(payload['alerts']['deleted'], [self.mine.alert.pk])
+
+    def test_tombstones_of_a_customer_leaving_the_scope(self):
+        token = self.sync()['token']
+        self.mine.ticket.status = TicketStatus.CLOSED
+        self.mine.ticket.save()
+        payload = self.sync(token)
+        self.assertEqual(payload['tickets']['deleted'], [self.mine.ticket.pk])
+        self.assertEqual(payload['customers']['deleted'], [self.mine.pk])
+        self.assertEqual(payload['contacts']['deleted'], [self.mine.contact.pk])
+        self.assertEqual(payload['alerts']['deleted'], [self.mine.alert.pk])
+
+    def test_upload_applies_and_detects_conflicts(self):
+        contact = self.mine.contact
+        applied, conflict = self.upload(
+            {'entity': 'contacts', 'id': contact.pk, 'fields': {'phone': ['', '0501234567']}},
+            {'entity': 'contacts', 'id': str(contact.pk), 'fields': {'email': ['old@example.com', 'new@example.com']}},
+        )
+        self.assertEqual(applied['result'], 'applied')
+        self.assertEqual(conflict['result'], 'conflict')
+        contact.refresh_from_db()
+        self.assertEqual((contact.phone, contact.email), ('0501234567', ''))
+
+    def test_rejected_uploads_do_not_hold_back_the_others(self):
+        results = self.upload(
+            {'entity': 'contacts', 'id': self.other.contact.pk, 'fields': {'phone': ['', '0501234567']}},
+            {'entity': 'contacts', 'id': '1e3', 'fields': {'phone': ['', '0501234567']}},
+            {'entity': 'contacts', 'id': self.mine.contact.pk, 'fields': {'customer_id': [self.mine.pk, self.other.pk]}},
+            {'entity': 'tickets', 'id': self.mine.ticket.pk, 'fields': {'status': [TicketStatus.OPEN, TicketStatus.IN_PROGRESS]}},
+        )
+        self.assertEqual([result['result'] for result in results], ['rejected', 'rejected', 'rejected', 'applied'])
+        self.mine.ticket.refresh_from_db()
+        self.assertEqual(self.mine.ticket.status, TicketStatus.IN_PROGRESS)
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'tickets'
+
+urlpatterns = [
+    path('mobile/sync/', views.mobile_sync, name='mobile_sync'),
+    path('mobile/upload/', views.mobile_upload, name='mobile_upload'),
+]
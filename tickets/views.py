@@ -0,0 +1,67 @@
+import gzip
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_GET, require_POST
+from .mobile import UPLOAD_LIMIT, apply_changes, delta
+
+
+# Largest upload after decompression
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+
+
+def compact_response(request, payload):
+    """ Compact JSON, gzipped when the client accepts it """
+    content = json.dumps(payload, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+    response = HttpResponse(content_type='application/json')
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        content = gzip.compress(content, compresslevel=6)
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    response.content = content
+    return response
+
+
+def error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+@require_GET
+@ensure_csrf_cookie
+def mobile_sync(request):
+    """
+    Changes of the technician's tickets, customers, contacts and open alerts since ?token=
+    (tickets.mobile), a full snapshot without a token
+    """
+    if not request.user.is_authenticated:
+        return error('Authentication required', 401)
+    return compact_response(request, delta(request.user, request.GET.get('token')))
+
+
+@require_POST
+def mobile_upload(request):
+    """ A batch of technician updates {"changes": [...]}, optionally gzipped (Content-Encoding) """
+    if not request.user.is_authenticated:
+        return error('Authentication required', 401)
+    body = request.body
+    if request.headers.get('Content-Encoding') == 'gzip':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, MAX_UPLOAD_BYTES)
+        except zlib.error:
+            return error('Invalid gzip body', 400)
+        if decompressor.unconsumed_tail:
+            return error('Upload too large', 413)
+    try:
+        changes = json.loads(body)['changes']
+    except (ValueError, KeyError, TypeError):
+        return error('Expected {"changes": [...]}', 400)
+    if not isinstance(changes, list):
+        return error('Expected {"changes": [...]}', 400)
+    if len(changes) > UPLOAD_LIMIT:
+        return error(f'Up to {UPLOAD_LIMIT} changes per upload', 413)
+    return compact_response(request, {'results': apply_changes(request.user, changes)})